@@ -0,0 +1,71 @@
+import json
+import os
+import stat
+import tempfile
+
+
+def _file_mode(path):
+    """
+    Permissions for the file written to `path`: those of the file it replaces, or
+    what a plain open() would create (0o666 less the umask).
+    """
+    if os.path.exists(path):
+        return stat.S_IMODE(os.stat(path).st_mode)
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+def _atomic_replace(path, write_func, mode):
+    """
+    Writes to a temporary file next to `path` and renames it into place, so
+    readers never see a half-written file. mkstemp creates the temporary file as
+    0600, so it is given the target's permissions (see _file_mode) before the rename.
+    """
+    directory = os.path.dirname(path) or '.'
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(path) + '.', suffix='.tmp')
+    try:
+        open_kwargs = {} if 'b' in mode else {'newline': ''}
+        with os.fdopen(fd, mode, **open_kwargs) as handle:
+            write_func(handle)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.chmod(tmp_path, _file_mode(path))
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def atomic_write_csv(df, path, **to_csv_kwargs):
+    """
+    Atomically writes a DataFrame to CSV (temp file + rename).
+    """
+    _atomic_replace(path, lambda handle: df.to_csv(handle, **to_csv_kwargs), 'w')
+
+
+def atomic_write_json(obj, path):
+    """
+    Atomically writes a JSON document (temp file + rename).
+    """
+    _atomic_replace(path, lambda handle: json.dump(obj, handle, indent=2, sort_keys=True), 'w')
+
+
+def atomic_write_bytes(data, path):
+    """
+    Atomically writes raw bytes (temp file + rename).
+    """
+    _atomic_replace(path, lambda handle: handle.write(data), 'wb')
+
+
+def atomic_write_npy(array, path):
+    """
+    Atomically writes a NumPy array in .npy format (temp file + rename), readable
+    with np.load(path, mmap_mode='r').
+    """
+    import numpy as np
+    _atomic_replace(path, lambda handle: np.save(handle, array), 'wb')
@@ -0,0 +1,194 @@
+import pandas as pd
+import numpy as np
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import monte_carlo_simulation as mc
+from dsa_analysis import compute_analysis
+from historical_forecasts import OUTTURN, ingest_forecasts, load_forecasts, vintage_table, list_vintages
+from atomic_io import atomic_write_csv
+from plotting import load_pyplot
+from instrumentation import instrument, stage, mark_failed
+
+# File paths
+backtest_output_path = 'data/processed/backtest_results.csv'
+coverage_output_path = 'data/processed/backtest_coverage.csv'
+plots_dir = 'plots'
+
+
+def _with_psnd(wide_df):
+    """Adds PSND (£m) and returns the obr_data.csv columns."""
+    df = wide_df.copy()
+    df['PSND'] = df['PSND (% of GDP)'] * df['Nominal GDP'] * 10
+    return df.reset_index()[['Year', 'Nominal GDP', 'PSND', 'PSNB', 'Debt Interest']]
+
+
+def outturn_analysis(forecasts_df):
+    """Realised data (as available at the last forecast) run through the DSA analysis."""
+    return compute_analysis(_with_psnd(vintage_table(forecasts_df, OUTTURN)))
+
+
+def vintage_analysis(forecasts_df, vintage):
+    """
+    Reconstructs the DSA input of a past vintage: outturns up to its jump-off year and
+    the vintage's own figures from then on. The jump-off year is the first year the
+    vintage publishes every input for; later years are its forecast.
+    Returns (analysis DataFrame, jump-off year, forecast years).
+    """
+    own = vintage_table(forecasts_df, vintage).dropna()
+    jump_off = int(own.index.min())
+    history = vintage_table(forecasts_df, OUTTURN)
+    frame = pd.concat([history[history.index < jump_off], own])
+    return compute_analysis(_with_psnd(frame)), jump_off, [int(year) for year in own.index[1:]]
+
+
+@instrument('backtest_vintage')
+def backtest_vintage(vintage, df, shock_params, forecast_years, n_sims, seed_seq):
+    """
+    Runs the deterministic and Monte Carlo DSA of one vintage. Returns one row per
+    forecast year with the vintage's own debt ratio forecast and the fan chart
+    percentiles of the simulated debt ratio.
+    """
+    rng = np.random.default_rng(seed_seq)
+    shocks = mc.draw_shocks(shock_params, len(forecast_years), n_sims, rng)
+    paths = mc.simulate_paths(df, shocks, forecast_years)
+    result = mc.summarize_percentiles(paths['Debt-to-GDP Ratio (%)'], forecast_years)
+    result.insert(0, 'Forecast (%)', df.set_index('Year').loc[forecast_years, 'Debt-to-GDP Ratio (%)'].values)
+    result.insert(0, 'Horizon', np.asarray(forecast_years) - (forecast_years[0] - 1))
+    result = result.rename_axis('Year').reset_index()
+    result.insert(0, 'Vintage', vintage)
+    return result
+
+
+def _backtest_job(job):
+    """Unpacks one vintage job (runs in a worker process)."""
+    return backtest_vintage(*job)
+
+
+def run_vintages(jobs, max_workers=None):
+    """
+    Backtests every vintage, in parallel across processes. max_workers=1 runs them
+    in this process.
+    """
+    if max_workers == 1 or len(jobs) <= 1:
+        return [_backtest_job(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(_backtest_job, jobs))
+
+
+def summarize_coverage(results_df):
+    """
+    Share of realised outturns inside the 90% (P5-P95) and 50% (P25-P75) bands, and the
+    deterministic and median forecast errors (outturn less forecast, ppt), by horizon.
+    """
+    scored = results_df.dropna(subset=['Outturn (%)']).copy()
+    scored['In 90% Band'] = scored['Outturn (%)'].between(scored['P5'], scored['P95'])
+    scored['In 50% Band'] = scored['Outturn (%)'].between(scored['P25'], scored['P75'])
+    scored['Forecast Error'] = scored['Outturn (%)'] - scored['Forecast (%)']
+    scored['Median Error'] = scored['Outturn (%)'] - scored['P50 (Median)']
+    grouped = scored.groupby('Horizon')
+    return pd.DataFrame({
+        'Observations': grouped.size(),
+        '90% Band Coverage': grouped['In 90% Band'].mean(),
+        '50% Band Coverage': grouped['In 50% Band'].mean(),
+        'Mean Forecast Error (ppt)': grouped['Forecast Error'].mean(),
+        'RMSE Forecast (ppt)': np.sqrt(grouped['Forecast Error'].apply(lambda e: np.mean(np.square(e)))),
+        'Mean Median Error (ppt)': grouped['Median Error'].mean(),
+    }).reset_index()
+
+
+def run_backtest(n_sims=10000, seed=None, max_workers=None, refresh=False, render=True):
+    """
+    Backtests the DSA against past OBR forecast vintages: each vintage is re-run
+    deterministically and by Monte Carlo from its own jump-off point, and the fan
+    chart bands are scored against the realised debt ratio.
+    """
+    try:
+        forecasts_df = ingest_forecasts() if refresh else load_forecasts()
+        outturn_df = outturn_analysis(forecasts_df)
+        realised = outturn_df.set_index('Year')['Debt-to-GDP Ratio (%)'].dropna()
+        print(f"Loaded {forecasts_df['Vintage'].nunique() - 1} forecast vintages.")
+
+        # --- 1. Reconstruct Vintages ---
+        # Shocks are calibrated on the outturns before each jump-off year, so vintages
+        # sharing a jump-off year share one calibration.
+        calibrations = {}
+        jobs = []
+        vintages = list_vintages(forecasts_df)
+        seeds = np.random.SeedSequence(seed).spawn(len(vintages))
+        for vintage, seed_seq in zip(vintages, seeds):
+            df, jump_off, forecast_years = vintage_analysis(forecasts_df, vintage)
+            if not any(year in realised.index for year in forecast_years):
+                continue
+            if jump_off not in calibrations:
+                calibrations[jump_off] = mc.calibrate_shocks(outturn_df, last_history_year=jump_off - 1)
+            shock_params = calibrations[jump_off]
+            if not all(np.isfinite(value) for value in shock_params.values()):
+                print(f"Skipping {vintage}: too little history before {jump_off} to calibrate shocks.")
+                continue
+            jobs.append((vintage, df, shock_params, forecast_years, n_sims, seed_seq))
+
+        # --- 2. Deterministic and Monte Carlo DSA per Vintage ---
+        with stage('backtest_batch', paths=n_sims * len(jobs)):
+            results_df = pd.concat(run_vintages(jobs, max_workers=max_workers), ignore_index=True)
+        results_df['Outturn (%)'] = results_df['Year'].map(realised)
+        print(f"Backtested {len(jobs)} vintages ({n_sims:,} paths each, {len(calibrations)} calibrations).")
+
+        # --- 3. Coverage against Outturns ---
+        coverage_df = summarize_coverage(results_df)
+        print("\nFan chart coverage of the realised Debt-to-GDP ratio by forecast horizon:")
+        print(coverage_df.round(3).to_string(index=False))
+
+        if render:
+            visualize_backtest_coverage(coverage_df)
+
+        atomic_write_csv(results_df, backtest_output_path, index=False)
+        atomic_write_csv(coverage_df, coverage_output_path, index=False)
+        print(f"Backtest results saved to {backtest_output_path} and {coverage_output_path}")
+
+    except Exception as e:
+        print(f"An error occurred during the backtest: {e}")
+        mark_failed(e)
+
+
+@instrument('plot_render[backtest_coverage]')
+def visualize_backtest_coverage(coverage_df):
+    """
+    Generates a bar chart of the empirical fan chart coverage by forecast horizon,
+    against the nominal coverage of each band.
+    """
+    plt, sns = load_pyplot()
+
+    plt.figure(figsize=(12, 8))
+    sns.set_theme(style="whitegrid")
+
+    positions = np.arange(len(coverage_df))
+    plt.bar(positions - 0.2, coverage_df['90% Band Coverage'] * 100, width=0.4, color='b', alpha=0.4, label='90% Band (P5-P95)')
+    plt.bar(positions + 0.2, coverage_df['50% Band Coverage'] * 100, width=0.4, color='b', alpha=0.8, label='50% Band (P25-P75)')
+    plt.axhline(y=90, color='r', linestyle='--', label='Nominal 90%')
+    plt.axhline(y=50, color='r', linestyle=':', label='Nominal 50%')
+
+    plt.title('Backtest: Share of Realised Debt-to-GDP Outturns inside the Fan Chart', fontsize=16)
+    plt.xlabel('Forecast Horizon (years after jump-off)', fontsize=12)
+    plt.ylabel('Coverage (%)', fontsize=12)
+    plt.xticks(positions, [f"{h} (n={n})" for h, n in zip(coverage_df['Horizon'], coverage_df['Observations'])])
+    plt.ylim(0, 100)
+    plt.legend()
+
+    plot_path = os.path.join(plots_dir, 'backtest_coverage.png')
+    plt.savefig(plot_path)
+    print(f"Backtest coverage plot saved to {plot_path}")
+    plt.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Backtest the DSA fan charts against past OBR forecast vintages.')
+    parser.add_argument('--sims', type=int, default=10000, help='Number of simulated paths per vintage.')
+    parser.add_argument('--seed', type=int, default=None, help='Random seed for reproducible runs.')
+    parser.add_argument('--workers', type=int, default=None, help='Number of worker processes (1 = no parallelism).')
+    parser.add_argument('--refresh', action='store_true', help='Re-parse the historical forecasts workbook.')
+    parser.add_argument('--no-plots', action='store_true', help='Compute only; do not import matplotlib.')
+    args = parser.parse_args()
+    run_backtest(n_sims=args.sims, seed=args.seed, max_workers=args.workers, refresh=args.refresh,
+                 render=not args.no_plots)
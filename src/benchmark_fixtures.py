@@ -0,0 +1,62 @@
+import pandas as pd
+import numpy as np
+
+from dsa_analysis import compute_analysis
+
+# Synthetic data with the same schema as the pipeline outputs, so benchmarks run
+# offline without the raw OBR workbooks.
+SYNTHETIC_YEARS = range(2008, 2030)
+SYNTHETIC_SHEET = 'B.1'
+SYNTHETIC_KEYWORD = 'Synthetic nominal GDP'
+
+
+def synthetic_obr_data(seed=0):
+    """
+    Returns a deterministic obr_data.csv-like frame (GDP in £ billions, the rest in £ millions).
+    """
+    rng = np.random.default_rng(seed)
+    years = np.array(SYNTHETIC_YEARS)
+    n = len(years)
+
+    gdp = 1600 * np.cumprod(1 + 0.035 + rng.normal(0, 0.02, n))
+    debt_ratio = np.linspace(0.50, 0.96, n) + rng.normal(0, 0.01, n)
+    psnd = debt_ratio * gdp * 1000
+    implied_rate = 0.03 + rng.normal(0, 0.005, n)
+    interest = implied_rate * np.concatenate([[psnd[0]], psnd[:-1]])
+    psnb = np.concatenate([[0.03 * gdp[0] * 1000], np.diff(psnd)])
+
+    return pd.DataFrame({'Year': years, 'Nominal GDP': gdp, 'PSND': psnd, 'PSNB': psnb, 'Debt Interest': interest})
+
+
+def synthetic_analysis_frame(seed=0):
+    """Returns a dsa_analysis_results.csv-like frame built from synthetic data."""
+    return compute_analysis(synthetic_obr_data(seed))
+
+
+def synthetic_gilt_yields():
+    """Returns a baseline issuance gilt yield (fraction) for every synthetic year."""
+    return pd.Series(np.linspace(0.04, 0.05, len(SYNTHETIC_YEARS)), index=list(SYNTHETIC_YEARS))
+
+
+def write_synthetic_workbook(path, n_rows=200, n_cols=30, seed=0):
+    """
+    Writes an OBR-style worksheet: title rows, a header row containing the keyword,
+    fiscal-year labels in the first column and filler columns around the series.
+    Returns a robust_data_extraction-style config entry for the series.
+    """
+    rng = np.random.default_rng(seed)
+    title_rows = [['Table B.1: Synthetic economy forecast'] + [None] * (n_cols - 1),
+                  [None] * n_cols,
+                  [SYNTHETIC_KEYWORD] + [f'Column {i}' for i in range(1, n_cols)]]
+    start_year = 2029 - n_rows + 1
+    data_rows = [[f'{year}-{str(year + 1)[-2:]}'] + list(rng.normal(2000, 300, n_cols - 1).round(1))
+                 for year in range(start_year, start_year + n_rows)]
+    pd.DataFrame(title_rows + data_rows).to_excel(path, sheet_name=SYNTHETIC_SHEET, header=False, index=False)
+
+    return {
+        'file': path,
+        'sheet': SYNTHETIC_SHEET,
+        'header_keyword': SYNTHETIC_KEYWORD,
+        'column_index': 1,
+        'data_column_name': 'Nominal GDP'
+    }
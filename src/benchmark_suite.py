@@ -0,0 +1,202 @@
+import numpy as np
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import benchmark_fixtures
+import debt_decomposition
+import monte_carlo_simulation
+import path_store
+import robust_data_extraction
+import stress_tests
+import term_structure
+from atomic_io import atomic_write_json
+
+# --- Configuration ---
+BENCHMARK_DIR = 'benchmarks'
+RESULTS_DIR = os.path.join(BENCHMARK_DIR, 'results')
+BASELINE_PATH = os.path.join(BENCHMARK_DIR, 'baseline.json')
+DEFAULT_THRESHOLD = 0.20 # fail if throughput drops more than 20% below the baseline
+SEED = 12345
+
+MC_PATH_SIZES = [10_000, 100_000, 1_000_000]
+STRESS_SCENARIO_SIZES = [1, 100, 10_000]
+
+
+def _best_time(func, repeats):
+    """Returns the fastest of `repeats` timed calls."""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def bench_monte_carlo(df, n_sims, repeats, rate_model='normal', precision='float64'):
+    shock_params = monte_carlo_simulation.calibrate_shocks(df)
+    n_years = len(monte_carlo_simulation.FORECAST_YEARS)
+    rates = None
+    if rate_model != 'normal':
+        rates = term_structure.TermStructure(rate_model, params=term_structure.RATE_MODELS[rate_model],
+                                             baseline_yields=benchmark_fixtures.synthetic_gilt_yields())
+
+    def run():
+        rng = np.random.default_rng(SEED)
+        shocks = monte_carlo_simulation.draw_shocks(shock_params, n_years, n_sims, rng, rates=rates,
+                                                    dtype=path_store.shock_dtype(precision))
+        paths = monte_carlo_simulation.simulate_paths(df, shocks, rates=rates, precision=precision)
+        monte_carlo_simulation.summarize_percentiles(paths['Debt-to-GDP Ratio (%)'])
+
+    return n_sims, 'paths', _best_time(run, repeats)
+
+
+def bench_stress_scenarios(df, n_scenarios, repeats):
+    rng = np.random.default_rng(SEED)
+    ir_shocks = rng.uniform(-0.01, 0.03, n_scenarios)
+    growth_shocks = rng.uniform(-0.03, 0.01, n_scenarios)
+
+    def run():
+        stress_tests.project_scenarios(df, ir_shock=ir_shocks, growth_shock=growth_shocks)
+
+    return n_scenarios, 'scenarios', _best_time(run, repeats)
+
+
+def bench_perform_shocks(df, repeats):
+    def run():
+        stress_tests.perform_interest_rate_shock(df.copy())
+        stress_tests.perform_gdp_growth_shock(df.copy())
+
+    return 2, 'scenarios', _best_time(run, repeats)
+
+
+def bench_debt_decomposition(df, tmp_dir, repeats):
+    """Times the run_debt_decomposition stage (CSV in and out, no rendering) on `df`."""
+    paths = (debt_decomposition.analysis_file_path, debt_decomposition.decomposition_output_path)
+    debt_decomposition.analysis_file_path = os.path.join(tmp_dir, 'dsa_analysis_results.csv')
+    debt_decomposition.decomposition_output_path = os.path.join(tmp_dir, 'debt_decomposition_results.csv')
+    df.to_csv(debt_decomposition.analysis_file_path, index=False)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            seconds = _best_time(lambda: debt_decomposition.run_debt_decomposition(render=False), repeats)
+    finally:
+        debt_decomposition.analysis_file_path, debt_decomposition.decomposition_output_path = paths
+    return len(df), 'rows', seconds
+
+
+def bench_extraction(config, warm, repeats):
+    def run():
+        if not warm:
+            robust_data_extraction._read_sheet_cached.cache_clear()
+        robust_data_extraction.extract_series('synthetic', {'synthetic': config})
+
+    if warm:
+        run() # populate the parsed-sheet cache
+    return 1, 'extractions', _best_time(run, repeats)
+
+
+def run_benchmarks(quick=False, repeats=3):
+    """
+    Runs every benchmark on synthetic fixtures and returns {name: result}.
+    """
+    logging.getLogger().setLevel(logging.WARNING)
+    df = benchmark_fixtures.synthetic_analysis_frame(SEED)
+    mc_sizes = MC_PATH_SIZES[:-1] if quick else MC_PATH_SIZES
+    stress_sizes = STRESS_SCENARIO_SIZES[:-1] if quick else STRESS_SCENARIO_SIZES
+
+    cases = {}
+    for n_sims in mc_sizes:
+        cases[f'monte_carlo[{n_sims}]'] = lambda n=n_sims: bench_monte_carlo(df, n, repeats)
+        cases[f'monte_carlo_vasicek[{n_sims}]'] = lambda n=n_sims: bench_monte_carlo(df, n, repeats, 'vasicek')
+        cases[f'monte_carlo_bp32[{n_sims}]'] = lambda n=n_sims: bench_monte_carlo(df, n, repeats, precision='bp32')
+    for n_scenarios in stress_sizes:
+        cases[f'stress_scenarios[{n_scenarios}]'] = lambda n=n_scenarios: bench_stress_scenarios(df, n, repeats)
+    cases['perform_shocks'] = lambda: bench_perform_shocks(df, repeats)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        config = benchmark_fixtures.write_synthetic_workbook(os.path.join(tmp_dir, 'synthetic.xlsx'))
+        cases['debt_decomposition'] = lambda: bench_debt_decomposition(df, tmp_dir, repeats)
+        cases['extract_series[cold]'] = lambda: bench_extraction(config, False, repeats)
+        cases['extract_series[warm]'] = lambda: bench_extraction(config, True, repeats)
+
+        for name, case in cases.items():
+            units, unit_name, seconds = case()
+            results[name] = {
+                'units': units,
+                'unit': unit_name,
+                'seconds': seconds,
+                'throughput': units / seconds,
+            }
+            print(f"{name:<28} {seconds * 1000:>10.2f} ms {units / seconds:>16,.0f} {unit_name}/s")
+    return results
+
+
+def compare_to_baseline(results, baseline, threshold):
+    """
+    Returns (regressions, missing): the benchmarks whose throughput fell more than
+    `threshold` below the baseline, and those the baseline has no entry for (new or
+    renamed cases, which cannot be checked).
+    """
+    regressions, missing = [], []
+    for name, result in results.items():
+        if name not in baseline:
+            missing.append(name)
+            continue
+        ratio = result['throughput'] / baseline[name]['throughput']
+        if ratio < 1 - threshold:
+            regressions.append((name, ratio))
+    return regressions, missing
+
+
+def main(quick=False, repeats=3, threshold=DEFAULT_THRESHOLD, save_baseline=False):
+    """Runs the suite, stores the results and checks them against the saved baseline."""
+    results = run_benchmarks(quick=quick, repeats=repeats)
+
+    record = {
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'results': results,
+    }
+    stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    atomic_write_json(record, os.path.join(RESULTS_DIR, f'{stamp}.json'))
+
+    if save_baseline:
+        atomic_write_json(record, BASELINE_PATH)
+        print(f"Baseline saved to {BASELINE_PATH}")
+        return True
+
+    if not os.path.exists(BASELINE_PATH):
+        print(f"FAIL: no baseline at {BASELINE_PATH} to compare against; run with --save-baseline to create one.")
+        return False
+
+    with open(BASELINE_PATH) as handle:
+        baseline = json.load(handle)['results']
+    regressions, missing = compare_to_baseline(results, baseline, threshold)
+    for name, ratio in regressions:
+        print(f"REGRESSION: {name} throughput is {ratio:.0%} of baseline (threshold {1 - threshold:.0%})")
+    for name in missing:
+        print(f"MISSING: {name} has no baseline entry; run with --save-baseline to add it.")
+    if not regressions and not missing:
+        print(f"No regressions beyond {threshold:.0%} against {BASELINE_PATH}")
+    return not regressions and not missing
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark every compute stage on synthetic data.')
+    parser.add_argument('--quick', action='store_true', help='Skip the largest workload sizes.')
+    parser.add_argument('--repeats', type=int, default=3, help='Timed repetitions per benchmark (best is kept).')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='Allowed fractional throughput drop against the baseline.')
+    parser.add_argument('--save-baseline', action='store_true', help='Store this run as the new baseline.')
+    args = parser.parse_args()
+    sys.exit(0 if main(args.quick, args.repeats, args.threshold, args.save_baseline) else 1)
@@ -0,0 +1,112 @@
+import pandas as pd
+import numpy as np
+import hashlib
+import io
+import json
+import os
+
+from atomic_io import atomic_write_bytes
+
+
+def data_hash(df, params=None):
+    """
+    Hash of a job's input data (a DataFrame and an optional dict of parameters) for its
+    checkpoint config, so a checkpoint is not resumed on different data.
+    """
+    sha = hashlib.sha256(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+    sha.update(json.dumps(params, sort_keys=True, default=lambda value: np.asarray(value).tolist()).encode('utf-8'))
+    return sha.hexdigest()
+
+
+def save_checkpoint(path, config, entropy, **arrays):
+    """
+    Writes a checkpoint as a single .npz file, atomically (temp file + rename), so a
+    job killed mid-write leaves the previous checkpoint intact. `config` identifies
+    the job and `entropy` is the root SeedSequence entropy the job draws from.
+    """
+    buffer = io.BytesIO()
+    np.savez(buffer, config=np.array(json.dumps(config, sort_keys=True)), entropy=np.array(str(entropy)), **arrays)
+    atomic_write_bytes(buffer.getvalue(), path)
+
+
+def resume(path, config, seed=None):
+    """
+    Returns (root SeedSequence, saved arrays) for a job. The arrays are None, and the
+    job starts from scratch, unless `path` holds an unfinished checkpoint of the same
+    config; a resumed job reuses the saved entropy so even unseeded runs continue the
+    same streams. A checkpoint whose 'done' array is all set is of a finished run and
+    is not resumed, so running the job again draws new paths.
+    """
+    if path and os.path.exists(path):
+        with np.load(path) as saved:
+            if str(saved['config']) != json.dumps(config, sort_keys=True):
+                print(f"Ignoring checkpoint {path}: it belongs to a different run configuration.")
+            elif 'done' in saved.files and saved['done'].all():
+                print(f"Ignoring checkpoint {path}: its run already finished.")
+            else:
+                arrays = {name: saved[name] for name in saved.files if name not in ('config', 'entropy')}
+                return np.random.SeedSequence(int(saved['entropy'])), arrays
+    return np.random.SeedSequence(seed), None
+
+
+class HistogramSketch:
+    """
+    Mergeable fixed-bin quantile sketch with moments, per forecast year.
+
+    Counts are integers and the bins are fixed in advance, so the sketch does not
+    depend on how paths are split into batches, and its state is a few arrays that
+    checkpoint cheaply. Quantiles are exact to within one bin width; values outside
+    [low, high) are counted at the nearest edge.
+    """
+
+    def __init__(self, n_years, low, high, bin_width, thresholds=()):
+        self.low, self.high, self.bin_width = low, high, bin_width
+        self.n_bins = int(round((high - low) / bin_width))
+        self.thresholds = list(thresholds)
+        self.counts = np.zeros((n_years, self.n_bins), dtype=np.int64)
+        self.total = np.zeros(n_years, dtype=np.int64)
+        self.sum = np.zeros(n_years)
+        self.sum_sq = np.zeros(n_years)
+        self.exceed = np.zeros((n_years, len(self.thresholds)), dtype=np.int64)
+
+    def update(self, values):
+        """Adds a batch of results of shape (n_years, n_paths)."""
+        bins = np.clip(((values - self.low) / self.bin_width).astype(np.int64), 0, self.n_bins - 1)
+        for i in range(values.shape[0]):
+            self.counts[i] += np.bincount(bins[i], minlength=self.n_bins)
+        self.total += values.shape[1]
+        self.sum += values.sum(axis=1)
+        self.sum_sq += np.square(values).sum(axis=1)
+        for j, threshold in enumerate(self.thresholds):
+            self.exceed[:, j] += np.count_nonzero(values > threshold, axis=1)
+
+    def quantiles(self, percentiles):
+        """Percentiles per year, shape (n_years, len(percentiles)), interpolated within bins."""
+        cdf = np.cumsum(self.counts, axis=1)
+        result = np.empty((self.counts.shape[0], len(percentiles)))
+        for i in range(self.counts.shape[0]):
+            ranks = np.asarray(percentiles) / 100 * self.total[i]
+            bins = np.minimum(np.searchsorted(cdf[i], ranks, side='left'), self.n_bins - 1)
+            below = np.where(bins > 0, cdf[i][bins - 1], 0)
+            fraction = (ranks - below) / np.maximum(self.counts[i][bins], 1)
+            result[i] = self.low + (bins + fraction) * self.bin_width
+        return result
+
+    def mean(self):
+        return self.sum / self.total
+
+    def std(self):
+        return np.sqrt(np.maximum(self.sum_sq / self.total - np.square(self.mean()), 0.0))
+
+    def exceedance(self):
+        """Share of paths above each threshold, shape (n_years, len(thresholds))."""
+        return self.exceed / self.total[:, None]
+
+    def state(self, prefix):
+        """The sketch's arrays, keyed for save_checkpoint."""
+        return {f'{prefix}_{name}': getattr(self, name) for name in ('counts', 'total', 'sum', 'sum_sq', 'exceed')}
+
+    def restore(self, arrays, prefix):
+        """Loads the arrays saved by state()."""
+        for name in ('counts', 'total', 'sum', 'sum_sq', 'exceed'):
+            setattr(self, name, arrays[f'{prefix}_{name}'].copy())
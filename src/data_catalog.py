@@ -0,0 +1,337 @@
+import pandas as pd
+import numpy as np
+import argparse
+import functools
+import glob
+import hashlib
+import json
+import os
+import pickle
+import re
+
+from atomic_io import atomic_write_bytes, atomic_write_json
+from instrumentation import instrument, stage
+
+# --- Configuration ---
+DATA_PATH = 'data/raw'
+CATALOG_DIR = 'data/processed/data_catalog'
+INDEX_PATH = os.path.join(CATALOG_DIR, 'index.json')
+SHEET_CACHE_DIR = os.path.join(CATALOG_DIR, 'sheets')
+WORKBOOK_PATTERNS = ['*.xlsx', '*.xls']
+INDEX_VERSION = 1
+# Empty columns that end a table (stray cells far to the right are not part of it)
+MAX_COLUMN_GAP = 5
+UNIT_PREFIXES = ('£', 'per cent', 'percent')
+
+
+def _is_number(cell):
+    return isinstance(cell, (int, float)) and not isinstance(cell, bool) and pd.notna(cell)
+
+
+def _is_year_header(cells):
+    """Rows of increasing calendar years (2024, 2025, ...) head tables rather than hold data."""
+    numbers = [cell for cell in cells if _is_number(cell)]
+    return (len(numbers) >= 2 and all(float(cell).is_integer() and 1900 <= cell <= 2100 for cell in numbers)
+            and numbers == sorted(numbers))
+
+
+def _is_data_row(cells):
+    """A row whose values (after the first, label cell) are at least half numeric."""
+    values = cells[1:]
+    numbers = sum(_is_number(cell) for cell in values)
+    return numbers >= 1 and numbers * 2 >= len(values) and not _is_year_header(cells)
+
+
+def _is_title(cells):
+    """Single-cell lines naming a table ('6.1 Breakdown of ...') rather than its units ('£ billion')."""
+    if len(cells) != 1 or not isinstance(cells[0], str):
+        return False
+    text = cells[0].strip()
+    if len(text) > 200 or text.lower().startswith(UNIT_PREFIXES):
+        return False
+    return (re.match(r'^\d+(\.\d+)*[a-z]?\s', text) is not None or len(text.split()) > 3)
+
+
+def _table(filled, title, header_rows, data_rows):
+    columns = filled[header_rows + data_rows].any(axis=0).nonzero()[0]
+    gaps = np.flatnonzero(np.diff(columns) > MAX_COLUMN_GAP + 1)
+    if gaps.size:
+        columns = columns[:gaps[0] + 1]
+    return {'title': title, 'header_rows': header_rows, 'first_row': data_rows[0], 'last_row': data_rows[-1],
+            'first_col': int(columns[0]), 'last_col': int(columns[-1]), 'n_rows': len(data_rows),
+            'n_cols': int(columns[-1] - columns[0] + 1)}
+
+
+def detect_tables(sheet_df):
+    """
+    Detects the tables of a worksheet read without headers. A table is a run of data
+    rows (see _is_data_row); blank and single-cell rows (section labels) inside it are
+    skipped and footnotes after it left out. The multi-cell rows before its first data
+    row are its header, and the nearest title line above the header (else the sheet's
+    first) its title. Sheets
+    without numeric rows (text databases) are one table under their first wide row.
+    Returns dicts with the title, header and data rows (0-based sheet rows) and span.
+    """
+    filled = sheet_df.notna().values
+    rows = [[cell for cell in row if pd.notna(cell)] for row in sheet_df.itertuples(index=False)]
+    is_data = [len(cells) >= 2 and _is_data_row(cells) for cells in rows]
+
+    if not any(is_data):
+        widest = max((len(cells) for cells in rows), default=0)
+        header = next((i for i, cells in enumerate(rows) if len(cells) >= max(2, widest / 2)), None)
+        if header is None:
+            return []
+        data_rows = [i for i in range(header + 1, len(rows)) if len(rows[i]) >= 2]
+        if not data_rows:
+            return []
+        title = next((rows[i][0].strip() for i in reversed(range(header)) if _is_title(rows[i])), None)
+        return [_table(filled, title, [header], data_rows)]
+
+    sheet_title = next((cells[0].strip() for cells in rows if _is_title(cells)), None)
+    tables, current, leading = [], None, []
+    for i, cells in enumerate(rows):
+        if is_data[i]:
+            if current is None:
+                header_rows = [j for j in leading if len(rows[j]) >= 2]
+                above = [j for j in leading if j < (header_rows[0] if header_rows else i)]
+                title = next((rows[j][0].strip() for j in reversed(above) if _is_title(rows[j])), sheet_title)
+                current = {'title': title, 'header_rows': header_rows, 'data_rows': []}
+                tables.append(current)
+            current['data_rows'].append(i)
+            leading = []
+        elif cells:
+            # A multi-cell row that is not data heads the next table
+            if len(cells) >= 2:
+                current = None
+            leading.append(i)
+    return [_table(filled, table['title'], table['header_rows'], table['data_rows']) for table in tables]
+
+
+def table_columns(sheet_df, table):
+    """Column labels of a detected table: its header cells joined per column."""
+    labels = []
+    for j in range(table['first_col'], table['last_col'] + 1):
+        parts = [str(sheet_df.iat[i, j]).strip() for i in table['header_rows'] if pd.notna(sheet_df.iat[i, j])]
+        labels.append(' '.join(part for part in parts if part) or f'column_{j}')
+    return labels
+
+
+@functools.lru_cache(maxsize=64)
+def _fingerprint_cached(path, mtime, size):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as handle:
+        for block in iter(lambda: handle.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def fingerprint(path):
+    """SHA-1 of a workbook, so the index survives checkouts that reset modification times."""
+    return _fingerprint_cached(path, os.path.getmtime(path), os.path.getsize(path))
+
+
+def _sheet_cache_path(digest, position):
+    return os.path.join(SHEET_CACHE_DIR, digest[:16], f'sheet_{position:03d}.pkl')
+
+
+def list_workbook_files(data_path=DATA_PATH):
+    """Workbooks under data_path (recursively), as paths relative to it."""
+    paths = {os.path.relpath(path, data_path)
+             for pattern in WORKBOOK_PATTERNS
+             for path in glob.glob(os.path.join(data_path, '**', pattern), recursive=True)}
+    return sorted(paths)
+
+
+def cache_sheets(path, digest):
+    """Parses every sheet of a workbook once and stores each in the sheet cache. Returns {name: sheet}."""
+    sheets = pd.read_excel(path, sheet_name=None, header=None)
+    for position, sheet_df in enumerate(sheets.values()):
+        atomic_write_bytes(pickle.dumps(sheet_df, protocol=pickle.HIGHEST_PROTOCOL), _sheet_cache_path(digest, position))
+    return sheets
+
+
+def index_workbook(path, digest):
+    """
+    Parses and caches a workbook (cache_sheets) and returns its index entry: sheet
+    names, dimensions and detected tables.
+    """
+    entry = {'sha1': digest, 'sheets': []}
+    for position, (name, sheet_df) in enumerate(cache_sheets(path, digest).items()):
+        tables = detect_tables(sheet_df)
+        for n, table in enumerate(tables):
+            table['id'] = f'{name}#{n}'
+            table['columns'] = table_columns(sheet_df, table)
+        entry['sheets'].append({'name': str(name), 'position': position, 'n_rows': int(sheet_df.shape[0]),
+                                'n_cols': int(sheet_df.shape[1]), 'tables': tables})
+    return entry
+
+
+@instrument('catalog_index')
+def build_index(data_path=DATA_PATH, refresh=False):
+    """
+    Brings the metadata index up to date with the workbooks in data_path: new or
+    changed workbooks (by SHA-1) are parsed, as are any that failed to parse before;
+    unchanged ones keep their entry and removed ones are dropped. refresh=True
+    re-parses everything. Returns the index.
+    """
+    index = {'version': INDEX_VERSION, 'workbooks': {}}
+    if os.path.exists(INDEX_PATH) and not refresh:
+        with open(INDEX_PATH) as handle:
+            saved = json.load(handle)
+        if saved.get('version') == INDEX_VERSION:
+            index = saved
+
+    workbooks = {}
+    for name in list_workbook_files(data_path):
+        path = os.path.join(data_path, name)
+        digest = fingerprint(path)
+        entry = index['workbooks'].get(name)
+        if entry is None or entry['sha1'] != digest or 'error' in entry:
+            with stage('catalog_workbook'):
+                try:
+                    entry = index_workbook(path, digest)
+                except ImportError as e:
+                    # e.g. legacy .xls files without xlrd installed
+                    entry = {'sha1': digest, 'sheets': [], 'error': str(e)}
+            if 'error' in entry:
+                print(f"Could not index {name}: {entry['error']}")
+            else:
+                print(f"Indexed {name}: {len(entry['sheets'])} sheets, "
+                      f"{sum(len(sheet['tables']) for sheet in entry['sheets'])} tables")
+        workbooks[name] = entry
+    index['workbooks'] = workbooks
+    atomic_write_json(index, INDEX_PATH)
+    _load_index_cached.cache_clear()
+    return index
+
+
+@functools.lru_cache(maxsize=1)
+def _load_index_cached(mtime):
+    with open(INDEX_PATH) as handle:
+        return json.load(handle)
+
+
+def load_index():
+    """The metadata index, built first if it does not exist yet (run with --refresh after the raw data changes)."""
+    if not os.path.exists(INDEX_PATH):
+        build_index()
+    return _load_index_cached(os.path.getmtime(INDEX_PATH))
+
+
+def resolve_workbook(workbook):
+    """The indexed workbook named `workbook`, or the only one whose name starts with (or else contains) it."""
+    names = list(load_index()['workbooks'])
+    if workbook in names:
+        return workbook
+    matches = ([name for name in names if name.lower().startswith(workbook.lower())]
+               or [name for name in names if workbook.lower() in name.lower()])
+    if len(matches) != 1:
+        raise KeyError(f"'{workbook}' matches {len(matches)} workbooks" + (f": {', '.join(matches)}" if matches else ''))
+    return matches[0]
+
+
+def list_workbooks():
+    """One row per workbook: sheets, tables and any error raised while indexing it."""
+    rows = [{'Workbook': name, 'Sheets': len(entry['sheets']),
+             'Tables': sum(len(sheet['tables']) for sheet in entry['sheets']), 'Error': entry.get('error')}
+            for name, entry in load_index()['workbooks'].items()]
+    return pd.DataFrame(rows)
+
+
+def list_sheets(workbook=None):
+    """One row per sheet (of one workbook, or all), with its dimensions and number of tables."""
+    workbooks = load_index()['workbooks']
+    names = [resolve_workbook(workbook)] if workbook else list(workbooks)
+    rows = [{'Workbook': name, 'Sheet': sheet['name'], 'Rows': sheet['n_rows'], 'Columns': sheet['n_cols'],
+             'Tables': len(sheet['tables'])}
+            for name in names for sheet in workbooks[name]['sheets']]
+    return pd.DataFrame(rows)
+
+
+def list_tables(workbook=None, sheet=None, search=None):
+    """
+    One row per detected table, with its title, header rows (0-based sheet rows),
+    dimensions and column labels. search keeps tables whose title or columns contain
+    it (case-insensitive).
+    """
+    workbooks = load_index()['workbooks']
+    names = [resolve_workbook(workbook)] if workbook else list(workbooks)
+    rows = []
+    for name in names:
+        for entry in workbooks[name]['sheets']:
+            if sheet is not None and entry['name'] != str(sheet):
+                continue
+            for table in entry['tables']:
+                text = ' '.join([table['title'] or ''] + table['columns']).lower()
+                if search and search.lower() not in text:
+                    continue
+                rows.append({'Workbook': name, 'Sheet': entry['name'], 'Table': table['id'], 'Title': table['title'],
+                             'Header Rows': table['header_rows'], 'Rows': table['n_rows'], 'Columns': table['n_cols'],
+                             'Column Labels': table['columns']})
+    return pd.DataFrame(rows, columns=['Workbook', 'Sheet', 'Table', 'Title', 'Header Rows', 'Rows', 'Columns',
+                                       'Column Labels'])
+
+
+def _sheet_entry(workbook, sheet):
+    name = resolve_workbook(workbook)
+    entry = load_index()['workbooks'][name]
+    for sheet_entry in entry['sheets']:
+        if sheet_entry['name'] == str(sheet):
+            return name, entry, sheet_entry
+    raise KeyError(f"Workbook {name} has no sheet '{sheet}'.")
+
+
+@functools.lru_cache(maxsize=32)
+def _load_sheet_cached(workbook, sheet):
+    name, entry, sheet_entry = _sheet_entry(workbook, sheet)
+    path = os.path.join(DATA_PATH, name)
+    if fingerprint(path) != entry['sha1']:
+        build_index()
+        name, entry, sheet_entry = _sheet_entry(name, sheet)
+    cache_path = _sheet_cache_path(entry['sha1'], sheet_entry['position'])
+    if not os.path.exists(cache_path):
+        # The catalog is not committed: a fresh checkout fills the sheet cache on first use
+        cache_sheets(path, entry['sha1'])
+    with open(cache_path, 'rb') as handle:
+        return pickle.load(handle)
+
+
+def load_sheet(workbook, sheet):
+    """A whole worksheet without headers (as pd.read_excel(..., header=None)), from the sheet cache."""
+    return _load_sheet_cached(workbook, str(sheet)).copy()
+
+
+def load_table(workbook, table):
+    """
+    A detected table ('sheet#n', see list_tables) as a DataFrame with its header
+    labels as columns and its data rows, indexed by their sheet row.
+    """
+    sheet = table.rpartition('#')[0]
+    _, _, sheet_entry = _sheet_entry(workbook, sheet)
+    spec = next((entry for entry in sheet_entry['tables'] if entry['id'] == table), None)
+    if spec is None:
+        raise KeyError(f"Sheet '{sheet}' has no table '{table}'.")
+    sheet_df = _load_sheet_cached(workbook, sheet)
+    table_df = sheet_df.iloc[spec['first_row']:spec['last_row'] + 1, spec['first_col']:spec['last_col'] + 1].copy()
+    table_df.columns = spec['columns']
+    return table_df.dropna(how='all')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Index the raw OBR workbooks and browse their sheets and tables.')
+    parser.add_argument('--refresh', action='store_true', help='Re-parse every workbook.')
+    parser.add_argument('--workbook', default=None, help='Workbook (or part of its name) to list.')
+    parser.add_argument('--search', default=None, help='Only tables whose title or columns contain this.')
+    parser.add_argument('--table', default=None, help="Show this table ('sheet#n') of --workbook.")
+    args = parser.parse_args()
+    if args.table and not args.workbook:
+        parser.error('--table requires --workbook')
+
+    build_index(refresh=args.refresh)
+    if args.table:
+        print(load_table(args.workbook, args.table).to_string())
+    elif args.workbook or args.search:
+        tables = list_tables(args.workbook, search=args.search)
+        print(tables[['Workbook', 'Sheet', 'Table', 'Title', 'Rows', 'Columns']].to_string(index=False))
+    else:
+        print(list_workbooks().to_string(index=False))
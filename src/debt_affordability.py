@@ -1,43 +1,32 @@
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
+import argparse
 import os
 
+from plotting import load_pyplot
+from instrumentation import instrument, mark_failed
+from revenue_engine import total_receipts
+
 # File paths
 analysis_file_path = 'data/processed/dsa_analysis_results.csv'
 output_file_path = 'data/processed/dsa_full_analysis.csv'
 plots_dir = 'plots'
 
-def run_affordability_analysis():
+def run_affordability_analysis(render=True):
     """
     Calculates and visualizes the debt affordability ratio.
+    With render=False only the numbers are produced and the plotting stack is never imported.
     """
     try:
         # Load the dataset
         df = pd.read_csv(analysis_file_path)
         print("Successfully loaded the analysis results.")
 
-        # --- 1. Add Total Revenue Data ---
-        # Data provided by the user and from OBR forecasts
-        total_revenue_data = {
-            2008: 583854, 2009: 569099, 2010: 563967, 2011: 603409, 2012: 624923,
-            2013: 636794, 2014: 663829, 2015: 690628, 2016: 714078, 2017: 757572,
-            2018: 780660, 2019: 813448, 2020: 826494, 2021: 793539, 2022: 919925,
-            2023: 1017488,
-            # Forecasts in billions, converted to millions
-            2024: 1105.5 * 1000, 2025: 1192.2 * 1000, 2026: 1253.8 * 1000,
-            2027: 1310.8 * 1000, 2028: 1352.8 * 1000, 2029: 1402.4 * 1000
-        }
-        df['Total Revenue'] = df['Year'].map(total_revenue_data)
-        print("Added Total Revenue data.")
-
-        # --- 2. Calculate Debt Affordability Ratio ---
-        # Interest Payments as a % of Total Revenue
-        df['Debt Affordability Ratio (%)'] = (df['Debt Interest'] / df['Total Revenue']) * 100
+        df = compute_affordability(df)
         print("Calculated Debt Affordability Ratio.")
 
         # --- 3. Visualize the Result ---
-        visualize_affordability(df)
+        if render:
+            visualize_affordability(df)
 
         # --- 4. Save the final dataset ---
         df.to_csv(output_file_path, index=False)
@@ -45,11 +34,31 @@ def run_affordability_analysis():
 
     except Exception as e:
         print(f"An error occurred during affordability analysis: {e}")
+        mark_failed(e)
+
+@instrument('affordability')
+def compute_affordability(df):
+    """
+    Adds Total Revenue and the Debt Affordability Ratio (interest as a % of revenue).
+    """
+    df = df.copy()
+
+    # --- 1. Add Total Revenue Data ---
+    # Public sector current receipts (£m) from the revenue engine
+    df['Total Revenue'] = df['Year'].map(total_receipts())
 
+    # --- 2. Calculate Debt Affordability Ratio ---
+    # Interest Payments as a % of Total Revenue
+    df['Debt Affordability Ratio (%)'] = (df['Debt Interest'] / df['Total Revenue']) * 100
+    return df
+
+@instrument('plot_render[debt_affordability]')
 def visualize_affordability(df):
     """
     Generates a plot for the Debt Affordability Ratio.
     """
+    plt, sns = load_pyplot()
+
     plt.figure(figsize=(12, 7))
     sns.set_theme(style="whitegrid")
     
@@ -77,4 +86,7 @@ def visualize_affordability(df):
     plt.close()
 
 if __name__ == '__main__':
-    run_affordability_analysis()
+    parser = argparse.ArgumentParser(description='Run the debt affordability analysis.')
+    parser.add_argument('--no-plots', action='store_true', help='Compute only; do not import matplotlib.')
+    args = parser.parse_args()
+    run_affordability_analysis(render=not args.no_plots)
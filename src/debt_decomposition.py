@@ -1,71 +1,195 @@
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
+import numpy as np
+import argparse
 import os
 
+from plotting import load_pyplot
+from atomic_io import atomic_write_json
+from instrumentation import instrument, mark_failed
+
 # File path for the analysis results and directory for plots
 analysis_file_path = 'data/processed/dsa_analysis_results.csv'
 plots_dir = 'plots'
+decomposition_output_path = 'data/processed/debt_decomposition_results.csv'
+mc_decomposition_output_path = 'data/processed/monte_carlo_decomposition_bands.csv'
+mc_decomposition_run_output_path = 'data/processed/monte_carlo_decomposition_run.json'
+
+DECOMPOSITION_COMPONENTS = ['Primary Balance Effect', 'Snowball Effect', 'Stock-Flow Adjustment', 'Debt Ratio Change']
+STOCHASTIC_COMPONENTS = ['Primary Balance Effect', 'Snowball Effect', 'Stock-Flow Effect', 'Debt Ratio Change']
 
-def run_debt_decomposition():
+def run_debt_decomposition(render=True):
     """
     Performs and visualizes the decomposition of changes in the Debt-to-GDP ratio.
+    With render=False only the numbers are produced and the plotting stack is never imported.
     """
     try:
         # Load the dataset
         df = pd.read_csv(analysis_file_path)
         print("Successfully loaded the analysis results.")
 
-        # --- 1. Calculate Necessary Components ---
-        # Ensure calculations are on a per-unit basis, not percentage
-        df['debt_ratio'] = df['Debt-to-GDP Ratio (%)'] / 100
-        df['pb_ratio'] = df['Primary Balance-to-GDP Ratio (%)'] / 100
-        
-        # Lagged debt ratio
-        df['debt_ratio_lagged'] = df['debt_ratio'].shift(1)
-        
-        # Nominal GDP Growth (g)
-        df['g'] = df['Nominal GDP'].pct_change()
-        
-        # Effective Interest Rate (r)
-        df['r'] = df['Debt Interest'] / df['PSND'].shift(1)
-        
-        # --- 2. Decompose the Change in Debt Ratio ---
-        # Contribution from the primary balance
-        df['Primary Balance Effect'] = -df['pb_ratio']
-        
-        # Contribution from the "snowball effect"
-        # Formula: ((r - g) / (1 + g)) * d_t-1
-        df['Snowball Effect'] = ((df['r'] - df['g']) / (1 + df['g'])) * df['debt_ratio_lagged']
-        
-        # Actual change in debt ratio
-        df['Debt Ratio Change'] = df['debt_ratio'].diff()
-        
-        # Contribution from stock-flow adjustments (the residual)
-        df['Stock-Flow Adjustment'] = df['Debt Ratio Change'] - df['Primary Balance Effect'] - df['Snowball Effect']
-        
-        # Convert effects to percentage points for plotting
-        cols_to_convert = ['Primary Balance Effect', 'Snowball Effect', 'Stock-Flow Adjustment', 'Debt Ratio Change']
-        for col in cols_to_convert:
-            df[col] = df[col] * 100
-
+        df = compute_debt_decomposition(df)
         print("Completed debt decomposition calculations.")
 
         # --- 3. Visualize the Decomposition ---
-        visualize_decomposition(df)
+        if render:
+            visualize_decomposition(df)
         
         # --- 4. Save the results ---
-        decomposition_output_path = 'data/processed/debt_decomposition_results.csv'
         df.to_csv(decomposition_output_path, index=False)
         print(f"Decomposition results saved to {decomposition_output_path}")
 
     except Exception as e:
         print(f"An error occurred during debt decomposition: {e}")
+        mark_failed(e)
+
+@instrument('decomposition')
+def compute_debt_decomposition(df):
+    """
+    Splits the annual change in the Debt-to-GDP ratio into primary balance,
+    snowball and stock-flow components (in percentage points).
+    """
+    df = df.copy()
+
+    # --- 1. Calculate Necessary Components ---
+    # Ensure calculations are on a per-unit basis, not percentage
+    df['debt_ratio'] = df['Debt-to-GDP Ratio (%)'] / 100
+    df['pb_ratio'] = df['Primary Balance-to-GDP Ratio (%)'] / 100
+    
+    # Lagged debt ratio
+    df['debt_ratio_lagged'] = df['debt_ratio'].shift(1)
+    
+    # Nominal GDP Growth (g)
+    df['g'] = df['Nominal GDP'].pct_change()
+    
+    # Effective Interest Rate (r)
+    df['r'] = df['Debt Interest'] / df['PSND'].shift(1)
+    
+    # --- 2. Decompose the Change in Debt Ratio ---
+    # Contribution from the primary balance
+    # 'Primary Balance' is PSNB less debt interest, i.e. the primary deficit, so it adds to debt
+    df['Primary Balance Effect'] = df['pb_ratio']
+    
+    # Contribution from the "snowball effect"
+    # Formula: ((r - g) / (1 + g)) * d_t-1
+    df['Snowball Effect'] = ((df['r'] - df['g']) / (1 + df['g'])) * df['debt_ratio_lagged']
+    
+    # Actual change in debt ratio
+    df['Debt Ratio Change'] = df['debt_ratio'].diff()
+    
+    # Contribution from stock-flow adjustments (the residual)
+    df['Stock-Flow Adjustment'] = df['Debt Ratio Change'] - df['Primary Balance Effect'] - df['Snowball Effect']
+    
+    # Convert effects to percentage points for plotting
+    cols_to_convert = ['Primary Balance Effect', 'Snowball Effect', 'Stock-Flow Adjustment', 'Debt Ratio Change']
+    for col in cols_to_convert:
+        df[col] = df[col] * 100
+
+    return df
+
+def decompose_paths(baseline_df, paths, forecast_years):
+    """
+    Decomposes the simulated debt ratio change of every path at once, one year at a time.
+
+    Uses the same formulas as compute_debt_decomposition on the (n_years, n_sims)
+    arrays from monte_carlo_simulation.simulate_paths, with the last baseline year
+    as the starting point. Yields (year, {component: array of n_sims}) in percentage
+    points for STOCHASTIC_COMPONENTS. The 'Stock-Flow Effect' is the residual, so the
+    components always add up to the change; it is zero unless the paths were
+    simulated with a stock_flow.StockFlow.
+    """
+    baseline = baseline_df.set_index('Year')
+    start_year = forecast_years[0] - 1
+    prev_gdp = np.full(paths['PSND'].shape[1], baseline.loc[start_year, 'Nominal GDP'])
+    prev_psnd = np.full(paths['PSND'].shape[1], baseline.loc[start_year, 'PSND'])
+    prev_debt_ratio = prev_psnd / (prev_gdp * 1000)
+
+    for i, year in enumerate(forecast_years):
+        gdp = paths['Nominal GDP'][i]
+        psnd = paths['PSND'][i]
+        debt_ratio = psnd / (gdp * 1000)
+        pb_ratio = paths['Primary Balance'][i] / (gdp * 1000)
+        g = gdp / prev_gdp - 1
+        r = paths['Debt Interest'][i] / prev_psnd
+
+        primary_balance_effect = pb_ratio
+        snowball_effect = ((r - g) / (1 + g)) * prev_debt_ratio
+        debt_ratio_change = debt_ratio - prev_debt_ratio
+        stock_flow_effect = debt_ratio_change - primary_balance_effect - snowball_effect
+
+        yield year, {
+            'Primary Balance Effect': primary_balance_effect * 100,
+            'Snowball Effect': snowball_effect * 100,
+            'Stock-Flow Effect': stock_flow_effect * 100,
+            'Debt Ratio Change': debt_ratio_change * 100,
+        }
+        prev_gdp, prev_psnd, prev_debt_ratio = gdp, psnd, debt_ratio
+
+@instrument('stochastic_decomposition')
+def decomposition_bands(baseline_df, paths, forecast_years, percentiles=None):
+    """
+    Reduces each year's decomposition to percentile bands as soon as it is computed,
+    so only one year of components is held in memory. Returns a long DataFrame with
+    one row per (Year, Component).
+    """
+    from monte_carlo_simulation import PERCENTILES, PERCENTILE_COLUMNS
+    percentiles = percentiles or PERCENTILES
+    columns = PERCENTILE_COLUMNS if percentiles == PERCENTILES else [f'P{p}' for p in percentiles]
 
+    rows = []
+    for year, components in decompose_paths(baseline_df, paths, forecast_years):
+        for component in STOCHASTIC_COMPONENTS:
+            values = components[component]
+            row = {'Year': year, 'Component': component, 'Mean': values.mean()}
+            row.update(zip(columns, np.percentile(values, percentiles)))
+            rows.append(row)
+    return pd.DataFrame(rows)
+
+def run_stochastic_decomposition(n_sims=10000, seed=None, render=True, rate_model='normal', shock_model='normal',
+                                 stock_flow=None, sfa_items=()):
+    """
+    Decomposes the debt ratio change over every Monte Carlo path and saves the
+    per-year percentile bands of each component.
+    rate_model, shock_model, stock_flow and sfa_items select the same shock and debt
+    models as monte_carlo_simulation.run_monte_carlo_simulation, so the decomposition
+    can run on the paths behind the fan chart.
+    """
+    import monte_carlo_simulation as mc
+
+    try:
+        df = pd.read_csv(analysis_file_path)
+        print("Successfully loaded the analysis results.")
+
+        shock_params = mc.calibrate_shocks(df)
+        rates = mc.TermStructure(rate_model) if rate_model != 'normal' else None
+        regimes = mc.RegimeSwitching(df=df) if shock_model == 'regime' else None
+        sfa = mc.StockFlow(df=df, centre=stock_flow, items=sfa_items) if stock_flow is not None else None
+        rng = np.random.default_rng(seed)
+        shocks = mc.draw_shocks(shock_params, len(mc.FORECAST_YEARS), n_sims, rng, rates=rates, regimes=regimes,
+                                stock_flow=sfa)
+        paths = mc.simulate_paths(df, shocks, rates=rates, stock_flow=sfa)
+
+        bands_df = decomposition_bands(df, paths, mc.FORECAST_YEARS)
+        print(f"Completed debt decomposition over {n_sims} simulated paths.")
+
+        if render:
+            visualize_stochastic_decomposition(bands_df, n_sims)
+
+        bands_df.to_csv(mc_decomposition_output_path, index=False)
+        atomic_write_json({'n_sims': n_sims, 'seed': seed, 'rate_model': rate_model, 'shock_model': shock_model,
+                           'stock_flow': stock_flow, 'sfa_items': list(sfa_items)}, mc_decomposition_run_output_path)
+        print(f"Decomposition percentile bands saved to {mc_decomposition_output_path}")
+
+    except Exception as e:
+        print(f"An error occurred during stochastic debt decomposition: {e}")
+        mark_failed(e)
+
+@instrument('plot_render[debt_decomposition]')
 def visualize_decomposition(df):
     """
     Generates a stacked bar chart of the debt decomposition.
     """
+    plt, sns = load_pyplot()
+
     # Filter for the relevant period (from 2009 onwards as 2008 has no lagged data)
     plot_df = df[df['Year'] >= 2009].copy()
     
@@ -93,5 +217,78 @@ def visualize_decomposition(df):
     print(f"Debt decomposition plot saved to {plot_path}")
     plt.close()
 
+@instrument('plot_render[stochastic_decomposition]')
+def visualize_stochastic_decomposition(bands_df, n_sims=10000):
+    """
+    Generates a stacked bar chart of the median contributions, with whiskers showing
+    the 5th-95th percentile range of each component and a fan for the total change.
+    """
+    plt, sns = load_pyplot()
+
+    bands = bands_df.set_index(['Component', 'Year'])
+    years = bands.loc['Debt Ratio Change'].index.values
+
+    plt.figure(figsize=(16, 9))
+    sns.set_theme(style="whitegrid")
+
+    # Stack positive and negative medians separately so the bars never overlap
+    pos_bottom = np.zeros(len(years))
+    neg_bottom = np.zeros(len(years))
+    components = [('Primary Balance Effect', 'Primary Balance Contribution', 'g'),
+                  ('Snowball Effect', 'Snowball Effect (r-g)', 'b'),
+                  ('Stock-Flow Effect', 'Stock-Flow Adjustment', 'orange')]
+    for offset, (component, label, color) in zip([-0.2, 0.0, 0.2], components):
+        median = bands.loc[component, 'P50 (Median)'].values
+        bottom = np.where(median >= 0, pos_bottom, neg_bottom)
+        plt.bar(years, median, bottom=bottom, width=0.6, label=label, color=color, alpha=0.8)
+        # Whiskers: 90% range of the component, measured from the base of its segment
+        plt.vlines(years + offset, bottom + bands.loc[component, 'P5'].values,
+                   bottom + bands.loc[component, 'P95'].values, color=color, linewidth=2)
+        top = bottom + median
+        pos_bottom = np.where(median >= 0, top, pos_bottom)
+        neg_bottom = np.where(median < 0, top, neg_bottom)
+
+    total = bands.loc['Debt Ratio Change']
+    plt.fill_between(years, total['P5'], total['P95'], color='r', alpha=0.1, label='Total Change: 90% Interval')
+    plt.plot(years, total['P50 (Median)'], 'r-o', label='Total Change: Median')
+
+    plt.axhline(0, color='k', linewidth=0.8)
+    plt.title(f'Probabilistic Decomposition of Annual Change in UK Debt-to-GDP Ratio ({n_sims:,} Simulations)', fontsize=18)
+    plt.xlabel('Year', fontsize=14)
+    plt.ylabel('Change in Debt-to-GDP Ratio (Percentage Points)', fontsize=14)
+    plt.xticks(years)
+    plt.legend()
+    plt.tight_layout()
+
+    plot_path = os.path.join(plots_dir, 'monte_carlo_debt_decomposition.png')
+    plt.savefig(plot_path)
+    print(f"Probabilistic debt decomposition plot saved to {plot_path}")
+    plt.close()
+
 if __name__ == '__main__':
-    run_debt_decomposition()
+    from monte_carlo_simulation import RATE_MODEL_CHOICES, SHOCK_MODEL_CHOICES
+    from stock_flow import SFA_CENTRES, SFA_ITEMS
+
+    parser = argparse.ArgumentParser(description='Decompose changes in the Debt-to-GDP ratio.')
+    parser.add_argument('--no-plots', action='store_true', help='Compute only; do not import matplotlib.')
+    parser.add_argument('--monte-carlo', action='store_true',
+                        help='Decompose every Monte Carlo path and report percentile bands instead of the baseline.')
+    parser.add_argument('--sims', type=int, default=10000, help='Number of simulated paths (with --monte-carlo).')
+    parser.add_argument('--seed', type=int, default=None, help='Random seed (with --monte-carlo).')
+    parser.add_argument('--rate-model', choices=RATE_MODEL_CHOICES, default='normal',
+                        help='Interest rate shocks of the simulated paths (with --monte-carlo).')
+    parser.add_argument('--shock-model', choices=SHOCK_MODEL_CHOICES, default='normal',
+                        help='Shock model of the simulated paths (with --monte-carlo).')
+    parser.add_argument('--stock-flow', choices=SFA_CENTRES, default=None,
+                        help='Add a stock-flow adjustment to the simulated paths (with --monte-carlo).')
+    parser.add_argument('--sfa-items', nargs='*', choices=list(SFA_ITEMS), default=(),
+                        help='Deterministic stock-flow items to add (requires --stock-flow).')
+    args = parser.parse_args()
+    if args.sfa_items and args.stock_flow is None:
+        parser.error('--sfa-items requires --stock-flow')
+    if args.monte_carlo:
+        run_stochastic_decomposition(n_sims=args.sims, seed=args.seed, render=not args.no_plots,
+                                     rate_model=args.rate_model, shock_model=args.shock_model,
+                                     stock_flow=args.stock_flow, sfa_items=args.sfa_items)
+    else:
+        run_debt_decomposition(render=not args.no_plots)
@@ -1,34 +1,28 @@
 import pandas as pd
 import numpy as np
+import argparse
+
+from vintage_store import load_vintage
+from instrumentation import instrument, mark_failed
 
 # File path for the processed data
 csv_file_path = 'data/processed/obr_data.csv'
 
-def run_analysis():
+def run_analysis(vintage=None):
     """
     Performs the debt sustainability analysis.
+    If a vintage is given, the input is read from the vintage store instead of obr_data.csv.
     """
     try:
         # Load the dataset
-        df = pd.read_csv(csv_file_path)
-        print("Successfully loaded the dataset.")
-
-        # --- 1. Calculate Debt-to-GDP Ratio ---
-        # PSND is in millions, Nominal GDP is in billions.
-        # To get the ratio, we need them in the same units.
-        # Debt-to-GDP = (PSND * 1,000,000) / (Nominal GDP * 1,000,000,000) * 100
-        # This simplifies to (PSND / (Nominal GDP * 1000)) * 100
-        df['Debt-to-GDP Ratio (%)'] = (df['PSND'] / (df['Nominal GDP'] * 10))
-        print("Calculated Debt-to-GDP ratio.")
-
-        # --- 2. Calculate Primary Balance ---
-        # Primary Balance = PSNB - Debt Interest (both are in millions)
-        df['Primary Balance'] = df['PSNB'] - df['Debt Interest']
-        print("Calculated Primary Balance.")
-        
-        # --- 3. Calculate Primary Balance to GDP Ratio ---
-        df['Primary Balance-to-GDP Ratio (%)'] = (df['Primary Balance'] / (df['Nominal GDP'] * 10))
-        print("Calculated Primary Balance-to-GDP ratio.")
+        if vintage is None:
+            df = pd.read_csv(csv_file_path)
+        else:
+            df = load_vintage(vintage)
+        print(f"Successfully loaded the dataset (vintage: {vintage or 'obr_data.csv'}).")
+
+        df = compute_analysis(df)
+        print("Calculated Debt-to-GDP, Primary Balance and Primary Balance-to-GDP ratios.")
 
         # Display the DataFrame with the new calculations
         print("\nAnalysis Results:")
@@ -40,10 +34,51 @@ def run_analysis():
         print(f"\nAnalysis results saved to {analysis_output_path}")
 
 
-    except FileNotFoundError:
+    except FileNotFoundError as e:
         print(f"Error: The file {csv_file_path} was not found.")
+        mark_failed(e)
     except Exception as e:
         print(f"An error occurred during analysis: {e}")
+        mark_failed(e)
+
+@instrument('analysis')
+def compute_analysis(df):
+    """
+    Adds the Debt-to-GDP ratio, Primary Balance and Primary Balance-to-GDP ratio.
+    """
+    df = df.copy()
+
+    # --- 1. Calculate Debt-to-GDP Ratio ---
+    # PSND is in millions, Nominal GDP is in billions.
+    # To get the ratio, we need them in the same units.
+    # Debt-to-GDP = (PSND * 1,000,000) / (Nominal GDP * 1,000,000,000) * 100
+    # This simplifies to (PSND / (Nominal GDP * 1000)) * 100
+    df['Debt-to-GDP Ratio (%)'] = (df['PSND'] / (df['Nominal GDP'] * 10))
+
+    # --- 2. Calculate Primary Balance ---
+    # Primary Balance = PSNB - Debt Interest (both are in millions)
+    df['Primary Balance'] = df['PSNB'] - df['Debt Interest']
+    
+    # --- 3. Calculate Primary Balance to GDP Ratio ---
+    df['Primary Balance-to-GDP Ratio (%)'] = (df['Primary Balance'] / (df['Nominal GDP'] * 10))
+    return df
+
+def baseline_arrays(baseline, years, columns):
+    """
+    The baseline `columns` over `years` as arrays with one row per year, for the
+    shared debt recursions (stress_tests.project_scenarios, monte_carlo_simulation.simulate_paths).
+    baseline is an analysis DataFrame, giving one value per year, or a panel of
+    datasets from panel_analysis.stack_panel, giving one value per dataset shaped
+    (n_datasets, 1) so it broadcasts against arrays of shape (n_datasets, n_paths).
+    """
+    if isinstance(baseline, pd.DataFrame):
+        indexed = baseline.set_index('Year')
+        return {column: indexed.loc[list(years), column].values for column in columns}
+    rows = [list(baseline['Year']).index(year) for year in years]
+    return {column: np.asarray(baseline[column])[rows][:, :, None] for column in columns}
 
 if __name__ == '__main__':
-    run_analysis()
+    parser = argparse.ArgumentParser(description='Run the debt sustainability analysis.')
+    parser.add_argument('--vintage', help='Forecast vintage from the vintage store (default: obr_data.csv).')
+    args = parser.parse_args()
+    run_analysis(vintage=args.vintage)
@@ -0,0 +1,276 @@
+import pandas as pd
+import numpy as np
+import argparse
+import functools
+import os
+import re
+
+from atomic_io import atomic_write_csv
+from instrumentation import instrument
+
+# --- Configuration ---
+DATA_PATH = 'data/raw'
+PROCESSED_PATH = 'data/processed'
+RATINGS_FILE = os.path.join(DATA_PATH, 'Uncertainty_ratings_database_March_2025.xlsx')
+MEASURES_FILE = os.path.join(DATA_PATH, 'Policy_measures_database_March_2025.xlsx')
+REGISTER_FILE = os.path.join(DATA_PATH, 'Risk_register_FRS_July_2025.xlsx')
+COSTINGS_PATH = os.path.join(PROCESSED_PATH, 'policy_costing_uncertainty.csv')
+REGISTER_PATH = os.path.join(PROCESSED_PATH, 'fiscal_risk_register.csv')
+analysis_file_path = os.path.join(PROCESSED_PATH, 'dsa_analysis_results.csv')
+
+FORECAST_YEARS = list(range(2025, 2030))
+
+# Components of the primary balance: measures database sheet of their costings (£m)
+COMPONENTS = {'Receipts': 'Tax Measures', 'Spending': 'Spending Measures'}
+# Policy decisions of the March 2025 forecast whose costings are not yet tested by outturn
+COSTING_EVENTS = ['Autumn Budget 2024', 'Spring Statement 2025']
+
+# The OBR publishes these ratings as categories only, so the numbers they stand for
+# here are this repo's assumptions, not OBR figures.
+# Coefficient of variation of a costing, by uncertainty rating. Source of the ratings:
+# Uncertainty_ratings_database_March_2025.xlsx, 'Introduction' (criteria in words only)
+COSTING_CV = {'Low': 0.05, 'Medium-low': 0.10, 'Medium': 0.20, 'Medium-high': 0.30, 'High': 0.45, 'Very high': 0.65}
+# Probability that a risk crystallises over its time scale (to 2029-30 for medium-term
+# risks). Source of the ratings: Risk_register_FRS_July_2025.xlsx, 'Introduction' and the
+# 'Probability of crystallisation' column (Very low to Very high, no numbers given)
+PROBABILITY_SCALE = {'Very low': 0.05, 'Low': 0.10, 'Medium': 0.25, 'High': 0.45, 'Very high': 0.70}
+# Impact on PSND by 2029-30 when a risk crystallises, % of GDP. Source of the ratings: the
+# register's 'Impact on public sector net debt' column (Low, Medium, High, no numbers given)
+IMPACT_SCALE = {'Low': 0.25, 'Medium': 1.0, 'High': 3.0}
+
+REGISTER_SHEETS = ['Shocks', 'Trends', 'Policy']
+# Register groups the Monte Carlo already simulates: growth, rate and regime shocks,
+# and the debt stock's own interest rate sensitivity
+MODELLED_GROUPS = {('Shocks', 'Economy'), ('Trends', 'Economy'), ('Trends', 'Balance sheet')}
+MEDIUM_TERM = 'Medium term'
+
+_RATING_ALIASES = {'low-medium': 'medium-low', 'mediun-high': 'medium-high'}
+
+
+def normalize_rating(value):
+    """Maps a rating as typed in the workbooks ('Medium - Low', 'Very-high ') to its canonical form."""
+    if pd.isna(value):
+        return None
+    key = re.sub(r'[^a-z]+', '-', str(value).lower()).strip('-')
+    key = _RATING_ALIASES.get(key, key)
+    for rating in list(COSTING_CV) + list(PROBABILITY_SCALE):
+        if key == rating.lower().replace(' ', '-'):
+            return rating
+    return None
+
+
+def _measure_key(text):
+    return re.sub(r'\s+', ' ', str(text)).strip().lower()
+
+
+def _clean(value):
+    return re.sub(r'\s+', ' ', str(value)).strip() if pd.notna(value) else None
+
+
+def parse_ratings_sheet(sheet_df, event):
+    """
+    Parses one fiscal event of the uncertainty ratings database into one row per rated
+    measure. The order of the three source columns differs between events, so they are
+    located by their headers; a sheet may repeat the header for a second table.
+    Section titles, footnotes and parent rows without a final rating are skipped.
+    """
+    sources = {'Data': 'data', 'Behavioural': 'behav', 'Modelling': 'modell'}
+    rows, columns = [], None
+    for _, row in sheet_df.iterrows():
+        cells = [_clean(cell) or '' for cell in row]
+        if 'Measure' in cells:
+            lowered = [cell.lower() for cell in cells]
+            columns = {name: next(j for j, cell in enumerate(lowered) if cell.startswith(prefix))
+                       for name, prefix in sources.items()}
+            columns['Measure'] = cells.index('Measure')
+            columns['Most Important'] = next(j for j, cell in enumerate(lowered) if cell.startswith('of which'))
+            columns['Final Rating'] = next(j for j, cell in enumerate(lowered) if cell.startswith('final rating'))
+            continue
+        if columns is None or not cells[columns['Measure']]:
+            continue
+        final = normalize_rating(row.iloc[columns['Final Rating']])
+        if final not in COSTING_CV:
+            continue
+        record = {'Event': event, 'Measure': cells[columns['Measure']], 'Final Rating': final}
+        record.update({name: normalize_rating(row.iloc[columns[name]]) for name in sources})
+        record['Most Important'] = cells[columns['Most Important']].replace('Behavioural', 'Behaviour') or None
+        rows.append(record)
+    return pd.DataFrame(rows)
+
+
+def parse_costings(sheet_df, component, years=FORECAST_YEARS):
+    """
+    Costings (£m) of one sheet of the policy measures database over `years`, summed
+    across the heads a measure is split into. Fiscal year 2025-26 is Year 2025.
+    """
+    header_row = next(i for i, row in sheet_df.iterrows() if 'Event' in [_clean(cell) for cell in row])
+    header = [_clean(cell) for cell in sheet_df.iloc[header_row]]
+    body = sheet_df.iloc[header_row + 1:]
+    costings = pd.DataFrame({
+        'Event': body.iloc[:, header.index('Event')].map(_clean),
+        'Key': body.iloc[:, header.index('Measure description')].map(_measure_key),
+    })
+    for year in years:
+        label = f'{year}-{str(year + 1)[-2:]}'
+        costings[year] = pd.to_numeric(body.iloc[:, header.index(label)], errors='coerce').fillna(0.0).values
+    costings = costings.dropna(subset=['Event']).groupby(['Event', 'Key'], as_index=False)[years].sum().round(3)
+    costings['Component'] = component
+    return costings
+
+
+def parse_register_sheet(sheet_df, sheet):
+    """
+    Parses one sheet of the fiscal risk register into one row per risk and time scale.
+    Group titles ('Spending', 'Revenue', ...) carry no time scale; a risk assessed over
+    both time scales has its second row without number or issue, inherited from the
+    first. The ratings are the OBR's 2025 assessment, mapped to numbers with the
+    scales above (impacts reported 'Not quantified' stay missing).
+    """
+    header_row = next(i for i, row in sheet_df.iterrows() if _clean(row.iloc[0]) == '#')
+    rows, group, number, issue = [], None, None, None
+    for _, row in sheet_df.iloc[header_row + 1:].iterrows():
+        cells = [_clean(cell) for cell in row]
+        if cells[2] is None:
+            if cells[0] is None and cells[1]:
+                group = cells[1]
+            continue
+        if cells[1] is not None:
+            number, issue = cells[0], cells[1]
+        probability, impact = normalize_rating(cells[8]), normalize_rating(cells[9])
+        rows.append({
+            'Sheet': sheet, 'Group': group, 'Number': number, 'Issue': issue, 'Time Scale': cells[2],
+            'Probability Rating': probability, 'Impact Rating': cells[9] if impact is None else impact,
+            'Change since 2023': cells[10],
+            'Probability': PROBABILITY_SCALE.get(probability, np.nan),
+            'Impact (% of GDP)': IMPACT_SCALE.get(impact, np.nan),
+        })
+    return pd.DataFrame(rows)
+
+
+@instrument('fiscal_risks_ingest')
+def ingest_fiscal_risks():
+    """
+    Parses the uncertainty ratings, the policy measures database and the fiscal risk
+    register once and stores the rated costings and the register in data/processed.
+    Rated measures are matched to their costings by event and description; unmatched
+    ones are reported and dropped. Returns (costings, register).
+    """
+    from robust_data_extraction import read_sheet
+
+    sheets = pd.ExcelFile(RATINGS_FILE).sheet_names
+    ratings_df = pd.concat([parse_ratings_sheet(read_sheet(RATINGS_FILE, sheet), sheet.strip())
+                            for sheet in sheets if sheet != 'Introduction'], ignore_index=True)
+    ratings_df['Key'] = ratings_df['Measure'].map(_measure_key)
+    measures_df = pd.concat([parse_costings(read_sheet(MEASURES_FILE, sheet), component)
+                             for component, sheet in COMPONENTS.items()], ignore_index=True)
+    costings_df = ratings_df.merge(measures_df, on=['Event', 'Key']).drop(columns='Key')
+    costings_df['Costing CV'] = costings_df['Final Rating'].map(COSTING_CV)
+    matched = costings_df[['Event', 'Measure']].drop_duplicates().shape[0]
+    print(f"Matched {matched} of {len(ratings_df)} rated measures to their costings.")
+    atomic_write_csv(costings_df, COSTINGS_PATH, index=False)
+    print(f"Rated policy costings saved to {COSTINGS_PATH}")
+
+    register_df = pd.concat([parse_register_sheet(read_sheet(REGISTER_FILE, sheet), sheet)
+                             for sheet in REGISTER_SHEETS], ignore_index=True)
+    atomic_write_csv(register_df, REGISTER_PATH, index=False)
+    print(f"Fiscal risk register saved to {REGISTER_PATH}")
+    return costings_df, register_df
+
+
+@functools.lru_cache(maxsize=4)
+def _read_csv_cached(path, mtime):
+    return pd.read_csv(path)
+
+
+def load_fiscal_risks():
+    """
+    Reads the ingested costings and register, ingesting the workbooks first if they do
+    not exist yet (run with --refresh after they change). Cached for the life of the process.
+    """
+    if not (os.path.exists(COSTINGS_PATH) and os.path.exists(REGISTER_PATH)):
+        ingest_fiscal_risks()
+    costings_df = _read_csv_cached(COSTINGS_PATH, os.path.getmtime(COSTINGS_PATH)).copy()
+    costings_df.columns = [int(column) if column.isdigit() else column for column in costings_df.columns]
+    return costings_df, _read_csv_cached(REGISTER_PATH, os.path.getmtime(REGISTER_PATH)).copy()
+
+
+class FiscalRisks:
+    """
+    Policy costing errors and discrete fiscal risks as primary balance shocks
+    (fractions of GDP, positive = higher deficit).
+
+    Costing errors: each component's costings of events are wrong by a common factor
+    per path, with std dev the root sum of squares of CV x costing over its measures
+    (measures independent), so a miss persists over the years the measure scores.
+    Risk events: the quantified medium-term risks of the register not already
+    simulated; a risk crystallises on a path with its probability, in a year drawn
+    uniformly over the horizon, adding its impact to that year's primary deficit.
+    The risks are all one-sided (costs), and the OBR central forecast the shocks are
+    applied to is a central case, so each year's expected event cost is subtracted:
+    the event shocks widen the fan on both sides without moving its centre.
+    Both take one draw per component or risk per path, whatever the horizon.
+    """
+
+    def __init__(self, costings=None, register=None, df=None, events=COSTING_EVENTS):
+        if costings is None or register is None:
+            costings, register = load_fiscal_risks()
+        df = pd.read_csv(analysis_file_path) if df is None else df
+        gdp = df.set_index('Year').loc[FORECAST_YEARS, 'Nominal GDP'] * 1000 # £m
+
+        costings = costings[costings['Event'].isin(events)]
+        spread = costings[FORECAST_YEARS].abs().mul(costings['Costing CV'], axis=0)
+        std = np.sqrt(spread.pow(2).groupby(costings['Component']).sum()).T
+        self.component_std = std.reindex(columns=list(COMPONENTS), fill_value=0.0).div(gdp.values, axis=0)
+
+        modelled = register[['Sheet', 'Group']].apply(tuple, axis=1).isin(MODELLED_GROUPS)
+        self.risks = register[~modelled & (register['Time Scale'] == MEDIUM_TERM)].dropna(
+            subset=['Probability', 'Impact (% of GDP)']).reset_index(drop=True)
+
+    @property
+    def expected_cost(self):
+        """Expected total cost of the risk events over the horizon, % of GDP."""
+        return float((self.risks['Probability'] * self.risks['Impact (% of GDP)']).sum())
+
+    def expected_annual_cost(self, n_years):
+        """Expected cost of the risk events in each of n_years years, fraction of GDP."""
+        probability = np.minimum(self.risks['Probability'].values, 1.0)
+        return np.full(n_years, np.sum(probability * self.risks['Impact (% of GDP)'].values / 100) / n_years)
+
+    @instrument('fiscal_risk_draws')
+    def draw(self, n_years, n_sims, rng, dtype=np.float64):
+        """
+        Primary balance shocks of shape (n_years, n_sims): 'costing' (the costing errors)
+        and 'events' (the risk events less their expected cost, mean zero), with
+        'crystallised' the gross cost of the risk events that crystallised.
+        """
+        z = rng.standard_normal(size=(self.component_std.shape[1], n_sims))
+        costing = self.component_std.values[:n_years] @ z
+
+        probability = self.risks['Probability'].values
+        cost = self.risks['Impact (% of GDP)'].values / 100
+        u = rng.random(size=(len(self.risks), n_sims))
+        # A risk crystallises if u < p, and given that u / p is uniform on [0, 1), which
+        # fixes the year; row n_years collects the paths where it does not crystallise
+        events = np.zeros((n_years + 1) * n_sims)
+        columns = np.arange(n_sims)
+        for r in range(len(self.risks)):
+            year = np.minimum(u[r] * (n_years / probability[r]), n_years).astype(np.int64)
+            events[year * n_sims + columns] += cost[r]
+        crystallised = events.reshape(n_years + 1, n_sims)[:n_years]
+        centred = crystallised - self.expected_annual_cost(n_years)[:, None]
+        return {'costing': costing.astype(dtype, copy=False), 'events': centred.astype(dtype, copy=False),
+                'crystallised': crystallised.astype(dtype, copy=False)}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Ingest the OBR uncertainty ratings and fiscal risk register.')
+    parser.add_argument('--refresh', action='store_true', help='Re-parse the workbooks.')
+    args = parser.parse_args()
+    costings_df, register_df = ingest_fiscal_risks() if args.refresh else load_fiscal_risks()
+
+    risks = FiscalRisks(costings_df, register_df)
+    print(f"\nCosting error std dev by component (% of GDP), events: {', '.join(COSTING_EVENTS)}")
+    print((risks.component_std * 100).round(3).to_string())
+    print(f"\n{len(risks.risks)} medium-term risk events, expected cost {risks.expected_cost:.2f}% of GDP by "
+          f"{FORECAST_YEARS[-1]} (netted off in the Monte Carlo; probability and impact scales are assumptions):")
+    print(risks.risks[['Sheet', 'Group', 'Issue', 'Probability', 'Impact (% of GDP)']].to_string(index=False))
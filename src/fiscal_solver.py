@@ -0,0 +1,247 @@
+import pandas as pd
+import numpy as np
+import argparse
+
+import monte_carlo_simulation as mc
+import stress_tests
+from stock_flow import SFA_CENTRES, SFA_ITEMS, StockFlow
+from instrumentation import instrument, mark_failed
+
+# File paths for the analysis results and solver outputs
+analysis_file_path = 'data/processed/dsa_analysis_results.csv'
+stabilising_pb_output_path = 'data/processed/debt_stabilising_primary_balance.csv'
+consolidation_output_path = 'data/processed/fiscal_rule_consolidation.csv'
+stress_consolidation_output_path = 'data/processed/fiscal_rule_stress_consolidation.csv'
+
+# Deterministic scenarios checked with the stress test recursion
+STRESS_SCENARIOS = {
+    'Baseline': {},
+    'Interest Rate Shock (+1pp)': {'ir_shock': 0.01},
+    'GDP Growth Shock (-1pp)': {'growth_shock': -0.01},
+}
+
+# Default grids for the debt-stabilising primary balance, as fractions
+R_GRID = np.round(np.arange(0.0, 0.0801, 0.005), 4)
+G_GRID = np.round(np.arange(0.0, 0.0801, 0.005), 4)
+
+
+def debt_stabilising_primary_balance(debt_ratio, r, g):
+    """
+    Closed-form primary balance that keeps the debt ratio constant:
+    d_t = d_t-1 requires a primary deficit of -d * (r - g) / (1 + g).
+
+    Follows the sign convention of 'Primary Balance-to-GDP Ratio (%)' (a deficit is
+    positive) and returns % of GDP. debt_ratio is in %, r and g are fractions; all
+    three broadcast against each other.
+    """
+    r = np.asarray(r, dtype=float)
+    g = np.asarray(g, dtype=float)
+    return -np.asarray(debt_ratio, dtype=float) * (r - g) / (1 + g)
+
+
+def stabilising_pb_grid(debt_ratio, r_grid=R_GRID, g_grid=G_GRID):
+    """
+    Evaluates the debt-stabilising primary balance over every (r, g) pair at once.
+    Returns a DataFrame indexed by r with one column per g (both in %).
+    """
+    grid = debt_stabilising_primary_balance(debt_ratio, np.asarray(r_grid)[:, None], np.asarray(g_grid)[None, :])
+    return pd.DataFrame(grid,
+                        index=pd.Index(np.round(np.asarray(r_grid) * 100, 2), name='r (%)'),
+                        columns=pd.Index(np.round(np.asarray(g_grid) * 100, 2), name='g (%)'))
+
+
+def consolidation_profile(n_years, phase_in_years=1):
+    """
+    Shape of a permanent consolidation phased in linearly over phase_in_years,
+    scaled so that its full size is 1 (fraction of GDP per unit of consolidation).
+    """
+    return np.minimum(np.arange(1, n_years + 1) / max(phase_in_years, 1), 1.0)
+
+
+class ConsolidationProblem:
+    """
+    Debt ratio paths as an affine function of the consolidation size, on fixed shocks.
+
+    The primary balance enters the recursion linearly and neither GDP nor the interest
+    shocks depend on it, so with common random numbers every path's debt is
+    PSND_t = base_t + c * slope_t. Two runs of monte_carlo_simulation.simulate_paths
+    (c = 0 and c = 1) give both terms; after that any consolidation size is evaluated
+    by re-weighting those arrays instead of simulating again. A stock_flow.StockFlow
+    only depends on GDP, so it adds the same amount to both runs and keeps this exact.
+    """
+
+    def __init__(self, df, shocks, profile, forecast_years=mc.FORECAST_YEARS, stock_flow=None):
+        self.forecast_years = list(forecast_years)
+        self.profile = profile
+        base = mc.simulate_paths(df, shocks, forecast_years, stock_flow=stock_flow)
+        # A consolidation lowers the deficit ratio, so it enters as a negative adjustment
+        full = mc.simulate_paths(df, shocks, forecast_years, pb_adjustment=-profile, stock_flow=stock_flow)
+        self.gdp = base['Nominal GDP']
+        self.base_psnd = base['PSND']
+        self.slope_psnd = full['PSND'] - base['PSND']
+
+    def debt_ratio(self, size):
+        """Debt-to-GDP ratio (%) of every path for a consolidation of `size` (fraction of GDP)."""
+        return (self.base_psnd + size * self.slope_psnd) / (self.gdp * 10)
+
+    def rule_probability(self, size, target, years=None):
+        """Share of paths whose debt ratio stays at or below `target` (%) in all of `years`."""
+        rows = self._rows(years)
+        return np.mean(np.all(self.debt_ratio(size)[rows] <= target, axis=0))
+
+    def required_sizes(self, target, years=None):
+        """
+        Smallest consolidation each path needs to stay at or below `target` in all of `years`.
+        Paths already below target need none; paths the consolidation cannot move are inf.
+        """
+        rows = self._rows(years)
+        gap = self.base_psnd[rows] - target * self.gdp[rows] * 10
+        slope = self.slope_psnd[rows]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            needed = np.where(slope < 0, gap / -slope, np.where(gap < 0, 0.0, np.inf))
+        return np.maximum(needed.max(axis=0), 0.0)
+
+    def _rows(self, years):
+        if years is None:
+            return slice(None)
+        return [self.forecast_years.index(year) for year in years]
+
+
+@instrument('fiscal_rule_solver')
+def solve_consolidation(problem, target, probability, years=None):
+    """
+    Minimal consolidation size meeting P(debt ratio <= target in all `years`) >= probability.
+
+    The rule holds for a size c on exactly the paths whose required size is at most c,
+    so the minimum is an order statistic of the per-path requirements. Returns
+    (size, achieved probability); size is inf if the rule cannot be met.
+    """
+    needed = np.sort(problem.required_sizes(target, years))
+    k = int(np.ceil(probability * len(needed))) - 1
+    size = needed[max(k, 0)]
+    if not np.isfinite(size):
+        return np.inf, np.mean(np.isfinite(needed))
+    return size, problem.rule_probability(size, target, years)
+
+
+@instrument('stress_consolidation')
+def stress_consolidation(baseline_df, target, horizon_year, scenarios=STRESS_SCENARIOS, stock_flow=None):
+    """
+    Permanent consolidation (% of GDP) each deterministic stress scenario needs to bring
+    the debt ratio to `target` in horizon_year.
+
+    stress_tests.project_scenarios is affine in its primary balance shock, so each
+    scenario is projected with pb_shock = 0 and -1 in a single stacked call and the
+    required size is solved exactly from the two runs (a stock_flow.StockFlow moves
+    both runs alike).
+    """
+    names = list(scenarios)
+    ir_shock = np.repeat([scenarios[name].get('ir_shock', 0.0) for name in names], 2)
+    growth_shock = np.repeat([scenarios[name].get('growth_shock', 0.0) for name in names], 2)
+    pb_shock = np.tile([0.0, -1.0], len(names))
+    results = stress_tests.project_scenarios(baseline_df, ir_shock=ir_shock, growth_shock=growth_shock, pb_shock=pb_shock,
+                                             stock_flow=stock_flow)
+
+    i = list(results['Year']).index(horizon_year)
+    psnd = results['PSND'][:, i].reshape(-1, 2)
+    gdp = results['Nominal GDP'][:, i].reshape(-1, 2)[:, 0]
+    base_ratio = psnd[:, 0] / (gdp * 10)
+    size = np.maximum((psnd[:, 0] - target * gdp * 10) / (psnd[:, 0] - psnd[:, 1]), 0.0)
+    return pd.DataFrame({
+        'Scenario': names,
+        f'Debt-to-GDP Ratio {horizon_year} (%)': base_ratio,
+        'Required Consolidation (% of GDP)': size * 100,
+    })
+
+
+def run_fiscal_solver(target=95.0, probability=0.8, horizon_year=None, all_years=False,
+                      phase_in_years=3, n_sims=10000, seed=None, stock_flow=None, sfa_items=()):
+    """
+    Computes the debt-stabilising primary balance grid and the minimal consolidation
+    meeting a probabilistic debt rule, and saves both.
+    stock_flow ('baseline' or 'historical') keeps a stock-flow adjustment centred there,
+    with the historical volatility and the deterministic sfa_items, in the simulated
+    and stress debt paths (stock_flow.StockFlow); without it debt moves by PSNB alone.
+    """
+    try:
+        df = pd.read_csv(analysis_file_path)
+        print("Successfully loaded the baseline analysis results.")
+
+        # --- 1. Debt-Stabilising Primary Balance over r and g ---
+        start_year = mc.FORECAST_YEARS[0] - 1
+        start_debt_ratio = df.set_index('Year').loc[start_year, 'Debt-to-GDP Ratio (%)']
+        grid_df = stabilising_pb_grid(start_debt_ratio)
+        grid_df.to_csv(stabilising_pb_output_path)
+        print(f"Debt-stabilising primary balance at {start_debt_ratio:.1f}% debt saved to {stabilising_pb_output_path}")
+
+        # --- 2. Minimal Consolidation for the Probabilistic Rule ---
+        forecast_years = list(mc.FORECAST_YEARS)
+        horizon_year = horizon_year or forecast_years[-1]
+        years = forecast_years if all_years else [horizon_year]
+
+        sfa = None
+        if stock_flow is not None:
+            sfa = StockFlow(df=df, centre=stock_flow, items=sfa_items)
+            print(f"Stock-flow adjustment: {stock_flow} centre, mean {np.mean(sfa.centre) * 100:.2f}% of GDP")
+        shock_params = mc.calibrate_shocks(df)
+        rng = np.random.default_rng(seed)
+        shocks = mc.draw_shocks(shock_params, len(forecast_years), n_sims, rng, stock_flow=sfa)
+        profile = consolidation_profile(len(forecast_years), phase_in_years)
+        problem = ConsolidationProblem(df, shocks, profile, stock_flow=sfa)
+
+        baseline_probability = problem.rule_probability(0.0, target, years)
+        size, achieved = solve_consolidation(problem, target, probability, years)
+        rule = f"P(debt <= {target:g}% in {'every year' if all_years else horizon_year}) >= {probability:.0%}"
+        print(f"Without consolidation: {baseline_probability:.1%} of {n_sims:,} paths meet the rule.")
+        if not np.isfinite(size):
+            print(f"No consolidation can meet {rule}.")
+            return
+        print(f"Minimal consolidation for {rule}: {size * 100:.2f}% of GDP "
+              f"(phased in over {phase_in_years} years), achieving {achieved:.1%}.")
+
+        # --- 3. Deterministic Cross-Check under the Stress Scenarios ---
+        stress_df = stress_consolidation(df, target, horizon_year, stock_flow=sfa)
+        print(stress_df.to_string(index=False))
+        stress_df.to_csv(stress_consolidation_output_path, index=False)
+
+        # --- 4. Save the Consolidation Path ---
+        baseline_pb = df.set_index('Year').loc[forecast_years, 'Primary Balance-to-GDP Ratio (%)'].values
+        debt_ratio = problem.debt_ratio(size)
+        path_df = pd.DataFrame({
+            'Year': forecast_years,
+            'Consolidation (% of GDP)': size * profile * 100,
+            'Baseline Primary Balance-to-GDP Ratio (%)': baseline_pb,
+            'Target Primary Balance-to-GDP Ratio (%)': baseline_pb - size * profile * 100,
+            'Median Debt-to-GDP Ratio (%)': np.median(debt_ratio, axis=1),
+            'P(Debt-to-GDP Ratio <= Target)': np.mean(debt_ratio <= target, axis=1),
+        })
+        path_df.to_csv(consolidation_output_path, index=False)
+        print(f"Consolidation path saved to {consolidation_output_path}")
+
+    except Exception as e:
+        print(f"An error occurred during the fiscal solver: {e}")
+        mark_failed(e)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Solve for debt-stabilising and rule-meeting primary balances.')
+    parser.add_argument('--target', type=float, default=95.0, help='Debt-to-GDP ceiling in %%.')
+    parser.add_argument('--probability', type=float, default=0.8, help='Required probability of staying below the ceiling.')
+    parser.add_argument('--horizon-year', type=int, default=None, help='Year the rule applies to (default: last forecast year).')
+    parser.add_argument('--all-years', action='store_true', help='Require the ceiling in every forecast year.')
+    parser.add_argument('--phase-in', type=int, default=3, help='Years over which the consolidation is phased in.')
+    parser.add_argument('--sims', type=int, default=10000, help='Number of simulated paths.')
+    parser.add_argument('--seed', type=int, default=None, help='Random seed for reproducible runs.')
+    parser.add_argument('--stock-flow', choices=SFA_CENTRES, default=None,
+                        help='Keep a stock-flow adjustment in the debt recursion, centred on the baseline '
+                             "forecast's or the historical mean (see stock_flow.py).")
+    parser.add_argument('--sfa-items', nargs='*', choices=list(SFA_ITEMS), default=(),
+                        help='Deterministic stock-flow items to add (requires --stock-flow).')
+    args = parser.parse_args()
+    if not 0 < args.probability <= 1:
+        parser.error('--probability must be in (0, 1]')
+    if args.sfa_items and args.stock_flow is None:
+        parser.error('--sfa-items requires --stock-flow')
+    run_fiscal_solver(target=args.target, probability=args.probability, horizon_year=args.horizon_year,
+                      all_years=args.all_years, phase_in_years=args.phase_in, n_sims=args.sims, seed=args.seed,
+                      stock_flow=args.stock_flow, sfa_items=args.sfa_items)
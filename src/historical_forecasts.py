@@ -0,0 +1,126 @@
+import pandas as pd
+import argparse
+import functools
+import os
+import re
+
+from atomic_io import atomic_write_csv
+from instrumentation import instrument
+
+# --- Configuration ---
+DATA_PATH = 'data/raw'
+PROCESSED_PATH = 'data/processed'
+FORECASTS_FILE = os.path.join(DATA_PATH, 'Historical_official_forecasts_database_March_2025.xlsx')
+FORECASTS_PATH = os.path.join(PROCESSED_PATH, 'historical_forecasts.csv')
+
+OUTTURN = 'Outturn'
+
+# DSA inputs of the historical forecasts database: sheet and scale to the units of
+# obr_data.csv. PSND is published as a ratio and is converted to £m with each
+# vintage's own GDP.
+DSA_SERIES = {
+    'Nominal GDP': ('NGDP', 1.0),           # £ billion
+    'PSND (% of GDP)': ('PSND', 1.0),       # per cent of GDP
+    'PSNB': ('£PSNB', 1000.0),              # £ billion -> £m
+    'Debt Interest': ('PSDebtint', 1000.0), # £ billion -> £m
+}
+
+# Interest rate conditioning assumptions, in per cent
+RATE_SERIES = {
+    'Bank Rate (%)': ('Shorttermrates', 1.0),
+    'Gilt Rate (%)': ('Gilts', 1.0), # weighted average maturity of the gilts issued
+}
+
+SERIES_SHEETS = {**DSA_SERIES, **RATE_SERIES}
+
+
+def _fiscal_year(label):
+    """Maps a fiscal year label such as '2024-25' to its first calendar year."""
+    match = re.match(r'^(\d{4})-\d{2}', str(label))
+    return int(match.group(1)) if match else None
+
+
+def parse_forecast_sheet(sheet_df, series, scale=1.0):
+    """
+    Parses one sheet of the historical forecasts database into long format
+    (Vintage, Year, Series, Value). Rows are fiscal events ('March 2012'); the
+    'Outturn data' row is kept as the 'Outturn' vintage. Outturn cells of exactly
+    zero mark missing data in the database and are dropped.
+    """
+    header_row = next(i for i, row in sheet_df.iterrows() if any(_fiscal_year(cell) for cell in row))
+    year_columns = {j: _fiscal_year(cell) for j, cell in sheet_df.iloc[header_row].items() if _fiscal_year(cell)}
+
+    rows, seen = [], set()
+    for _, row in sheet_df.iloc[header_row + 1:].iterrows():
+        label = str(row.iloc[0]).strip()
+        if label.startswith('Outturn'):
+            vintage = OUTTURN
+        elif label.startswith('Memo'):
+            break
+        elif pd.notna(pd.to_datetime(label, format='%B %Y', errors='coerce')):
+            vintage = label
+        else:
+            continue
+        # A few fiscal events appear twice in the older sheets; the first row is kept
+        if vintage in seen:
+            continue
+        seen.add(vintage)
+
+        for j, year in year_columns.items():
+            value = pd.to_numeric(row.iloc[j], errors='coerce')
+            if pd.notna(value) and not (vintage == OUTTURN and value == 0):
+                rows.append({'Vintage': vintage, 'Year': year, 'Series': series, 'Value': round(value * scale, 6)})
+    return pd.DataFrame(rows)
+
+
+@instrument('forecasts_ingest')
+def ingest_forecasts():
+    """
+    Parses the historical forecasts database once and stores every vintage of the
+    series above in data/processed. Returns the long DataFrame.
+    """
+    from robust_data_extraction import read_sheet
+
+    forecasts_df = pd.concat([parse_forecast_sheet(read_sheet(FORECASTS_FILE, sheet), series, scale)
+                              for series, (sheet, scale) in SERIES_SHEETS.items()], ignore_index=True)
+    atomic_write_csv(forecasts_df, FORECASTS_PATH, index=False)
+    print(f"Historical forecasts saved to {FORECASTS_PATH}")
+    return forecasts_df
+
+
+@functools.lru_cache(maxsize=4)
+def _read_csv_cached(path, mtime):
+    return pd.read_csv(path)
+
+
+def load_forecasts():
+    """
+    Reads the ingested forecasts, ingesting the workbook first if they do not exist
+    yet (run with --refresh after it changes). Cached for the life of the process.
+    """
+    if not os.path.exists(FORECASTS_PATH):
+        ingest_forecasts()
+    return _read_csv_cached(FORECASTS_PATH, os.path.getmtime(FORECASTS_PATH)).copy()
+
+
+def vintage_table(forecasts_df, vintage, series=None):
+    """One vintage as a frame with a column per series (default: the DSA inputs), indexed by Year."""
+    columns = list(DSA_SERIES if series is None else series)
+    rows = forecasts_df[forecasts_df['Vintage'] == vintage]
+    return rows.pivot(index='Year', columns='Series', values='Value').reindex(columns=columns)
+
+
+def list_vintages(forecasts_df, series=None):
+    """Fiscal events publishing all of `series` (default: the DSA inputs), in chronological order."""
+    required = set(DSA_SERIES if series is None else series)
+    available = forecasts_df[forecasts_df['Vintage'] != OUTTURN].groupby('Vintage', sort=False)['Series'].agg(set)
+    complete = [vintage for vintage, names in available.items() if required <= names]
+    return sorted(complete, key=lambda v: pd.to_datetime(v, format='%B %Y'))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Ingest the OBR historical forecasts database.')
+    parser.add_argument('--refresh', action='store_true', help='Re-parse the historical forecasts workbook.')
+    args = parser.parse_args()
+    forecasts_df = ingest_forecasts() if args.refresh else load_forecasts()
+    print(forecasts_df.groupby('Series')['Vintage'].nunique().to_string())
@@ -0,0 +1,192 @@
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError: # Windows
+    resource = None
+
+from atomic_io import atomic_write_json
+
+# Record lists of the open collect() scopes; stages outside any scope are not kept
+_collectors = []
+_local = threading.local()
+_lock = threading.Lock()
+
+
+def max_rss_mb():
+    """
+    Returns the high-water mark of this process's resident set size in MB (since the
+    process started, not per stage), or None if unavailable.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+class StageRecord:
+    """
+    Measurements of one stage. Callers may set `rows` and `paths` inside the stage.
+    rss_growth_mb is how far the stage raised the process's RSS high-water mark: a
+    stage that stays below an earlier stage's peak records 0.
+    """
+
+    def __init__(self, name, rows=None, paths=None):
+        self.name = name
+        self.rows = rows
+        self.paths = paths
+        self.status = 'ok'
+        self.error = None
+        self.wall_s = None
+        self.cpu_s = None
+        self.rss_growth_mb = None
+
+    def to_dict(self):
+        record = {
+            'stage': self.name,
+            'status': self.status,
+            'wall_s': round(self.wall_s, 6),
+            'cpu_s': round(self.cpu_s, 6),
+            'rss_growth_mb': None if self.rss_growth_mb is None else round(self.rss_growth_mb, 1),
+            'rows': self.rows,
+            'paths': self.paths,
+            'paths_per_s': round(self.paths / self.wall_s, 1) if self.paths and self.wall_s else None,
+        }
+        if self.error:
+            record['error'] = self.error
+        return record
+
+
+@contextmanager
+def stage(name, rows=None, paths=None):
+    """
+    Times a stage or sub-step. Nested stages are recorded as 'parent/child', in every
+    open collect() scope. Exceptions are recorded on the stage and re-raised.
+    """
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    full_name = '/'.join([parent.name for parent in stack[-1:]] + [name])
+    record = StageRecord(full_name, rows, paths)
+
+    stack.append(record)
+    rss_start = max_rss_mb()
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    try:
+        yield record
+    except BaseException as e:
+        record.status = 'error'
+        record.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        record.wall_s = time.perf_counter() - wall_start
+        record.cpu_s = time.process_time() - cpu_start
+        rss_end = max_rss_mb()
+        record.rss_growth_mb = None if rss_end is None else rss_end - rss_start
+        stack.pop()
+        with _lock:
+            for collector in _collectors:
+                collector.append(record)
+
+
+def instrument(name=None):
+    """Decorator recording every call of a function as a stage."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name or func.__name__):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def mark_failed(error):
+    """
+    Marks the open stages (the innermost and its parents) as failed, for callers
+    that handle an exception themselves (the run_* functions print it) instead of
+    letting it reach stage().
+    """
+    for record in getattr(_local, 'stack', None) or []:
+        record.status = 'error'
+        record.error = f"{type(error).__name__}: {error}"
+
+
+@contextmanager
+def collect():
+    """
+    Keeps the records of the stages completed inside the block, in completion order,
+    in the list it yields. Outside a collect() scope stages are timed but not kept,
+    so long-running callers of instrumented functions do not accumulate records.
+    """
+    collected = []
+    with _lock:
+        _collectors.append(collected)
+    try:
+        yield collected
+    finally:
+        with _lock:
+            _collectors.remove(collected)
+
+
+def emit_json(collected, path=None):
+    """Writes the collected stage records as JSON to `path`, or to stdout if no path is given."""
+    report = {'stages': [record.to_dict() for record in collected]}
+    if path is None:
+        print(json.dumps(report, indent=2))
+    else:
+        atomic_write_json(report, path)
+        print(f"Instrumentation report saved to {path}")
+    return report
+
+
+@contextmanager
+def profiled(profiler=None, output_path=None):
+    """
+    Optionally profiles the enclosed block. profiler is None (off), 'cprofile' or
+    'pyinstrument' (an optional dependency); the dump is written to output_path, or
+    to output_path with a .prof extension if pyinstrument is missing.
+    """
+    if profiler is None:
+        yield
+        return
+
+    directory = os.path.dirname(output_path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+
+    if profiler == 'pyinstrument':
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            # A cProfile dump is not HTML, so it goes next to output_path as .prof
+            output_path = os.path.splitext(output_path)[0] + '.prof'
+            print(f"pyinstrument is not installed; falling back to cProfile ({output_path}).")
+            profiler = 'cprofile'
+        else:
+            session = Profiler()
+            session.start()
+            try:
+                yield
+            finally:
+                session.stop()
+                with open(output_path, 'w') as handle:
+                    handle.write(session.output_html())
+                print(f"pyinstrument profile saved to {output_path}")
+            return
+
+    import cProfile
+    session = cProfile.Profile()
+    session.enable()
+    try:
+        yield
+    finally:
+        session.disable()
+        session.dump_stats(output_path)
+        print(f"cProfile dump saved to {output_path} (inspect with python -m pstats)")
@@ -1,16 +1,348 @@
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
+import argparse
 import os
 
+from plotting import load_pyplot
+from atomic_io import atomic_write_json
+from instrumentation import instrument, stage, mark_failed
+from revenue_engine import ReceiptsProjection
+from term_structure import RATE_MODELS, TermStructure
+from checkpoint import HistogramSketch, data_hash, resume, save_checkpoint
+from path_store import PRECISIONS, PathStore, shock_dtype
+from path_archive import MC_ARCHIVE_DIR, ArchiveWriter
+from regime_switching import RegimeSwitching
+from fiscal_risks import FiscalRisks
+from stock_flow import SFA_CENTRES, SFA_ITEMS, StockFlow
+from dsa_analysis import baseline_arrays
+
 # File path for the analysis results and directory for plots
 analysis_file_path = 'data/processed/dsa_analysis_results.csv'
 plots_dir = 'plots'
+mc_affordability_output_path = 'data/processed/monte_carlo_affordability.csv'
+mc_gilt_output_path = 'data/processed/monte_carlo_gilt_rates.csv'
+mc_regime_output_path = 'data/processed/monte_carlo_regimes.csv'
+# Settings of the run behind the saved results (the figures quote its number of paths)
+mc_run_output_path = 'data/processed/monte_carlo_run.json'
+MC_CHECKPOINT_PATH = 'data/processed/monte_carlo_checkpoint.npz'
+
+FORECAST_YEARS = range(2025, 2030)
+PERCENTILES = [5, 25, 50, 75, 95]
+PERCENTILE_COLUMNS = ['P5', 'P25', 'P50 (Median)', 'P75', 'P95']
+AFFORDABILITY_THRESHOLDS = [8, 10, 12] # debt interest as % of revenue
+SHOCK_KEYS = ['gdp', 'ir', 'pb']
+SHOCK_CORR_KEYS = ['gdp_ir_corr', 'gdp_pb_corr', 'ir_pb_corr']
+RATE_MODEL_CHOICES = ['normal'] + sorted(RATE_MODELS) # 'normal': i.i.d. implied interest rate shocks
+SHOCK_MODEL_CHOICES = ['normal', 'regime'] # 'regime': two-regime Markov-switching shocks
+
+# Fixed quantile sketch bins of the batched mode: column, low, high, bin width
+SKETCHES = {
+    'debt': ('Debt-to-GDP Ratio (%)', 0.0, 300.0, 0.01),
+    'affordability': ('Debt Affordability Ratio (%)', 0.0, 50.0, 0.001),
+}
+
+@instrument('calibrate_shocks')
+def calibrate_shocks(df, last_history_year=2024):
+    """
+    Estimates the standard deviation of shocks from the historical data.
+    """
+    hist_df = df[df['Year'] <= last_history_year].copy()
+    hist_df['Nominal GDP Growth'] = hist_df['Nominal GDP'].pct_change()
+    hist_df['Implied Interest Rate'] = hist_df['Debt Interest'] / hist_df['PSND'].shift(1)
+
+    return {
+        'gdp_growth_std': hist_df['Nominal GDP Growth'].std(),
+        'interest_rate_std': hist_df['Implied Interest Rate'].std(),
+        'primary_balance_std': hist_df['Primary Balance-to-GDP Ratio (%)'].std() / 100, # as fraction of GDP
+    }
+
+def correlate_shocks(innovations, shock_params):
+    """
+    Scales standard normal innovations {'gdp', 'ir', 'pb'} to shocks with the std devs
+    and pairwise correlations in shock_params (missing correlations are zero).
+
+    Parameters may be scalars or arrays with one entry per path, so each path can have
+    its own covariance; the Cholesky factor of the 3x3 correlation matrix is written
+    out in closed form to stay vectorized.
+    """
+    z_gdp, z_ir, z_pb = (innovations[key] for key in SHOCK_KEYS)
+    rho_gdp_ir, rho_gdp_pb, rho_ir_pb = (shock_params.get(key, 0.0) for key in SHOCK_CORR_KEYS)
+
+    if not (np.any(rho_gdp_ir) or np.any(rho_gdp_pb) or np.any(rho_ir_pb)):
+        mixed_ir, mixed_pb = z_ir, z_pb
+    else:
+        l11 = np.sqrt(1 - np.square(rho_gdp_ir))
+        l21 = (rho_ir_pb - rho_gdp_pb * rho_gdp_ir) / l11
+        l22 = np.sqrt(np.maximum(1 - np.square(rho_gdp_pb) - np.square(l21), 0.0))
+        mixed_ir = rho_gdp_ir * z_gdp + l11 * z_ir
+        mixed_pb = rho_gdp_pb * z_gdp + l21 * z_ir + l22 * z_pb
+
+    return {
+        'gdp': shock_params['gdp_growth_std'] * z_gdp,
+        'ir': shock_params['interest_rate_std'] * mixed_ir,
+        'pb': shock_params['primary_balance_std'] * mixed_pb,
+    }
+
+def draw_shocks(shock_params, n_years, n_sims, rng, rates=None, dtype=np.float64, regimes=None, risks=None,
+                stock_flow=None):
+    """
+    Draws normal shocks for every (year, path), as arrays of shape (n_years, n_sims).
+    Shocks are independent unless shock_params holds correlations (see correlate_shocks).
+    If a term_structure.TermStructure is passed as rates, the interest rate innovation
+    drives its first factor instead and 'gilt' (the issuance yield deviation) replaces
+    the 'ir' shock, keeping its correlations with GDP and the primary balance.
+    With dtype=np.float32 the same draws are rounded to float32 and kept at that
+    precision, halving the memory of the shocks.
+    With a regime_switching.RegimeSwitching as regimes, a regime path is drawn first
+    and each year's shocks take its regime's std devs and mean shift; the crisis
+    indicators are returned as 'crisis' (under a term structure model the crisis
+    regime scales and shifts the rate innovation before it drives the yield instead;
+    see RegimeSwitching.rate_innovations).
+    With a fiscal_risks.FiscalRisks as risks, its policy costing errors and risk
+    events (net of their expected cost) are added to the primary balance shock, drawn
+    after all other shocks so those stay the same; the gross cost of the risk events
+    that crystallised is returned as 'risk_events'.
+    With a stock_flow.StockFlow as stock_flow, stock-flow adjustment shocks (fraction
+    of GDP) are drawn last and returned as 'sfa' (see simulate_paths).
+    """
+    crisis = None
+    if regimes is not None:
+        crisis = regimes.simulate_regimes(n_years, n_sims, rng)
+        shock_params = regimes.shock_params(shock_params, crisis)
+    innovations = {key: rng.standard_normal(size=(n_years, n_sims)).astype(dtype, copy=False) for key in SHOCK_KEYS}
+    if dtype != np.float64:
+        shock_params = {key: np.asarray(value, dtype=dtype) for key, value in shock_params.items()}
+    if rates is None:
+        shocks = correlate_shocks(innovations, shock_params)
+    else:
+        shocks = correlate_shocks(innovations, dict(shock_params, interest_rate_std=np.asarray(1.0, dtype=dtype)))
+        rate_innovations = shocks.pop('ir')
+        if regimes is not None:
+            rate_innovations = regimes.rate_innovations(rate_innovations, crisis)
+        shocks['gilt'] = rates.yield_deviations(rate_innovations, rng).astype(dtype, copy=False)
+    if regimes is not None:
+        shocks = regimes.shift(shocks, crisis)
+        shocks['crisis'] = crisis
+    if risks is not None:
+        fiscal = risks.draw(n_years, n_sims, rng, dtype=dtype)
+        shocks['pb'] = shocks['pb'] + fiscal['costing'] + fiscal['events']
+        shocks['risk_events'] = fiscal['crystallised']
+    if stock_flow is not None:
+        shocks['sfa'] = stock_flow.draw(n_years, n_sims, rng, dtype=dtype)
+    return shocks
+
+def simulate_paths(df, shocks, forecast_years=FORECAST_YEARS, pb_adjustment=None, receipts=None,
+                   fiscal_sensitivity=0.0, rates=None, precision='float64', columns=None, stock_flow=None):
+    """
+    Runs the debt recursion for all paths at once.
+
+    Each year applies the shocks to the baseline forecast exactly as the per-path
+    simulation did: growth and the implied interest rate are shocked relative to
+    the simulated previous year, the primary balance ratio is shocked directly.
+    pb_adjustment optionally shifts the primary balance ratio (fraction of GDP) per
+    year, shape (n_years,) or (n_years, n_sims); a consolidation is negative.
+    A non-zero fiscal_sensitivity (scalar or per path) makes the primary balance react
+    to the GDP shortfall against the baseline, as in stress_tests.
+    If a revenue_engine.ReceiptsProjection is passed as receipts, 'Total Revenue' (£m)
+    is projected from each path's GDP in the same pass, together with the joint
+    'Debt Affordability Ratio (%)' (that path's debt interest over its revenue).
+    With a term_structure.TermStructure as rates (and shocks from draw_shocks with the
+    same rates), the implied interest rate follows the simulated gilt yield on the
+    share of the stock repriced each year (redemptions plus last year's borrowing)
+    instead of the i.i.d. 'ir' shock, and 'Gilt Issuance Cost' (£m, first-year interest
+    on the gilts issued: redemptions plus new borrowing) is returned as well.
+    With a stock_flow.StockFlow as stock_flow, debt also moves by its stock-flow
+    adjustment on each path's GDP (plus the 'sfa' shocks, if drawn), so PSND follows
+    PSND_t = PSND_{t-1} + PSNB_t + SFA_t as in debt_decomposition.
+    The recursion runs in float64; results are stored at `precision` (see
+    path_store.PathStore), keeping only `columns` if given.
+    Returns a PathStore of arrays of shape (n_years, n_sims) keyed by column name.
+    df may also be a panel of datasets (panel_analysis.stack_panel) with shocks of
+    shape (n_years, n_datasets, n_paths); paths then have that shape too.
+    """
+    n_years = shocks['gdp'].shape[0]
+    shape = shocks['gdp'].shape[1:]
+    start_year = forecast_years[0] - 1
+    base = baseline_arrays(df, [start_year] + list(forecast_years),
+                           ['Nominal GDP', 'PSND', 'PSNB', 'Debt Interest', 'Primary Balance-to-GDP Ratio (%)'])
+    base_gdp = base['Nominal GDP']
+
+    prev_gdp = np.broadcast_to(base_gdp[0], shape).astype(float)
+    prev_psnd = np.broadcast_to(base['PSND'][0], shape).astype(float)
+    prev_new_borrowing = np.broadcast_to(np.maximum(base['PSNB'][0], 0.0), shape).astype(float)
+    rate_deviation = 0.0
+
+    outputs = ['Nominal GDP', 'Debt Interest', 'Primary Balance', 'PSND', 'Debt-to-GDP Ratio (%)']
+    if receipts is not None:
+        outputs += ['Total Revenue', 'Debt Affordability Ratio (%)']
+    if rates is not None:
+        outputs.append('Gilt Issuance Cost')
+    if columns is not None:
+        outputs = [name for name in outputs if name in columns]
+    # Fixed-point references: ratios per 100%, levels per jump-off GDP (£bn or £m)
+    gdp = base_gdp[0]
+    references = {name: 100.0 if name.endswith('(%)') else gdp if name == 'Nominal GDP' else gdp * 1000
+                  for name in outputs}
+    paths = PathStore(outputs, n_years, shape, precision, references)
 
-def run_monte_carlo_simulation():
+    for i, year in enumerate(forecast_years):
+        t = i + 1 # row of `base` (row 0 is the jump-off year)
+        # Apply shocks
+        sim_gdp_growth = base_gdp[t] / prev_gdp - 1 + shocks['gdp'][i]
+        sim_gdp = prev_gdp * (1 + sim_gdp_growth)
+
+        if rates is None:
+            sim_implied_ir = base['Debt Interest'][t] / prev_psnd + shocks['ir'][i]
+        else:
+            # Redemptions and last year's new borrowing reprice at this year's gilt yield
+            share = rates.refinancing_share + prev_new_borrowing / prev_psnd
+            rate_deviation = rate_deviation + share * (shocks['gilt'][i] - rate_deviation)
+            sim_implied_ir = base['Debt Interest'][t] / prev_psnd + rate_deviation
+        sim_interest = prev_psnd * sim_implied_ir
+
+        sim_pb_ratio = base['Primary Balance-to-GDP Ratio (%)'][t] / 100 + shocks['pb'][i]
+        if pb_adjustment is not None:
+            sim_pb_ratio = sim_pb_ratio + pb_adjustment[i]
+        sim_primary_balance = sim_pb_ratio * sim_gdp * 1000
+        if np.any(fiscal_sensitivity):
+            sim_primary_balance = sim_primary_balance + (base_gdp[t] - sim_gdp) * 1000 * fiscal_sensitivity
+
+        # Recalculate dynamics
+        sim_psnb = sim_primary_balance + sim_interest
+        sim_psnd = prev_psnd + sim_psnb
+        if stock_flow is not None:
+            sim_psnd = sim_psnd + stock_flow.level(year, sim_gdp, shocks['sfa'][i] if 'sfa' in shocks else 0.0)
+
+        paths.set('Nominal GDP', i, sim_gdp)
+        paths.set('Debt Interest', i, sim_interest)
+        paths.set('Primary Balance', i, sim_primary_balance)
+        paths.set('PSND', i, sim_psnd)
+        paths.set('Debt-to-GDP Ratio (%)', i, sim_psnd / (sim_gdp * 10))
+        if receipts is not None:
+            sim_revenue = receipts.total(year, sim_gdp, base_gdp[t])
+            paths.set('Total Revenue', i, sim_revenue)
+            paths.set('Debt Affordability Ratio (%)', i, sim_interest / sim_revenue * 100)
+        if rates is not None:
+            prev_new_borrowing = np.maximum(sim_psnb, 0.0)
+            issuance = rates.refinancing_share * prev_psnd + prev_new_borrowing
+            paths.set('Gilt Issuance Cost', i, issuance * (rates.baseline_yield(year) + shocks['gilt'][i]))
+
+        prev_gdp, prev_psnd = sim_gdp, sim_psnd
+
+    return paths
+
+def summarize_percentiles(sim_results, forecast_years=FORECAST_YEARS):
+    """
+    Computes the fan chart percentiles of simulated results of shape (n_years, n_sims).
+    """
+    percentiles = np.percentile(sim_results, PERCENTILES, axis=1)
+    return pd.DataFrame(percentiles.T, index=forecast_years, columns=PERCENTILE_COLUMNS)
+
+def summarize_exceedance(sim_results, thresholds, forecast_years=FORECAST_YEARS):
+    """
+    Computes the share of paths above each threshold, per year, for results of shape (n_years, n_sims).
+    """
+    return pd.DataFrame({f'P(> {threshold}%)': np.mean(sim_results > threshold, axis=1) for threshold in thresholds},
+                        index=forecast_years)
+
+def summarize_regimes(sim_results, crisis, forecast_years=FORECAST_YEARS):
+    """
+    Decomposes the fan chart of results of shape (n_years, n_sims) by regime history:
+    per year, the share of paths in a crisis and hit by one so far, the P5/P50/P95 of
+    the paths without and with a crisis so far, and the share of the paths above the
+    overall P95 that were hit by a crisis.
+    """
+    hit = np.logical_or.accumulate(crisis, axis=0)
+    rows = []
+    for i in range(len(forecast_years)):
+        values = sim_results[i]
+        row = {'Crisis Share (%)': crisis[i].mean() * 100, 'Crisis-Hit Share (%)': hit[i].mean() * 100}
+        for label, mask in [('No Crisis', ~hit[i]), ('Crisis-Hit', hit[i])]:
+            quantiles = np.percentile(values[mask], [5, 50, 95]) if mask.any() else [np.nan] * 3
+            row.update({f'{label} {column}': q for column, q in zip(['P5', 'P50', 'P95'], quantiles)})
+        tail = values > np.percentile(values, 95)
+        row['Crisis-Hit Share of Tail above P95 (%)'] = hit[i][tail].mean() * 100 if tail.any() else np.nan
+        rows.append(row)
+    return pd.DataFrame(rows, index=forecast_years)
+
+@instrument('mc_batched')
+def simulate_batched(df, shock_params, n_sims, batch_size, seed=None, receipts=None, rates=None,
+                     checkpoint_path=None, checkpoint_every=1, precision='float64', archive=None, regimes=None,
+                     risks=None, stock_flow=None):
+    """
+    Streams the simulation in batches of batch_size paths into HistogramSketch
+    accumulators, so memory does not grow with n_sims. Returns {sketch key: sketch}.
+
+    Batch b draws from the b-th child of the root SeedSequence, so every batch's
+    paths are fixed by the seed alone. With a checkpoint_path the sketches, the
+    completed batches and the root entropy are saved every checkpoint_every batches,
+    and a restarted run resumes from them with the same result as an uninterrupted run;
+    the checkpoint is removed once every batch is done.
+    With a path_archive.ArchiveWriter as archive, every column of batch b is archived
+    as chunk b.
+    """
+    n_years = len(FORECAST_YEARS)
+    n_batches = -(-n_sims // batch_size)
+    config = {'job': 'monte_carlo', 'n_sims': n_sims, 'batch_size': batch_size, 'seed': seed,
+              'rate_model': 'normal' if rates is None else rates.model, 'precision': precision,
+              'archive': archive is not None, 'shock_model': 'normal' if regimes is None else 'regime',
+              'fiscal_risks': risks is not None,
+              'stock_flow': None if stock_flow is None else [stock_flow.centre_name] + stock_flow.item_names,
+              'data': data_hash(df, shock_params)}
+    root, saved = resume(checkpoint_path, config, seed)
+
+    keys = ['debt'] if receipts is None else ['debt', 'affordability']
+    sketches = {key: HistogramSketch(n_years, *SKETCHES[key][1:],
+                                     thresholds=AFFORDABILITY_THRESHOLDS if key == 'affordability' else ())
+                for key in keys}
+    done = np.zeros(n_batches, dtype=bool)
+    if saved is not None:
+        done = saved['done']
+        for key, sketch in sketches.items():
+            sketch.restore(saved, key)
+        print(f"Resuming from {checkpoint_path}: {done.sum()} of {n_batches} batches already done.")
+
+    seeds = root.spawn(n_batches)
+    for b in np.flatnonzero(~done):
+        rng = np.random.default_rng(seeds[b])
+        shocks = draw_shocks(shock_params, n_years, min(batch_size, n_sims - b * batch_size), rng, rates=rates,
+                             dtype=shock_dtype(precision), regimes=regimes, risks=risks,
+                             stock_flow=stock_flow)
+        paths = simulate_paths(df, shocks, receipts=receipts, rates=rates, precision=precision,
+                               columns=None if archive else [SKETCHES[key][0] for key in keys], stock_flow=stock_flow)
+        if archive is not None:
+            archive.append(paths, chunk=b)
+        for key, sketch in sketches.items():
+            sketch.update(paths[SKETCHES[key][0]])
+        done[b] = True
+
+        if checkpoint_path and (done.sum() % checkpoint_every == 0 or done.all()):
+            state = {name: array for key, sketch in sketches.items() for name, array in sketch.state(key).items()}
+            save_checkpoint(checkpoint_path, config, root.entropy, done=done, **state)
+
+    if checkpoint_path and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    return sketches
+
+def run_monte_carlo_simulation(n_sims=10000, seed=None, render=True, rate_model='normal', batch_size=None,
+                               checkpoint_path=None, checkpoint_every=1, precision='float64', archive_path=None,
+                               shock_model='normal', fiscal_risks=False, stock_flow=None, sfa_items=()):
     """
     Performs and visualizes a Monte Carlo simulation for debt sustainability.
+    With render=False only the numbers are produced and the plotting stack is never imported.
+    rate_model selects the interest rate shocks: 'normal' or a term_structure model.
+    With a batch_size, paths are streamed through quantile sketches (simulate_batched),
+    optionally checkpointed to checkpoint_path; the checkpoint is removed once every
+    batch is done. precision selects the storage of the shocks and simulated paths
+    (see path_store.PathStore); only the columns summarised below are kept, unless
+    every path is archived to archive_path for later queries (see path_archive).
+    shock_model='regime' draws two-regime Markov-switching shocks (regime_switching);
+    in-memory runs then also decompose the fan chart by regime.
+    fiscal_risks=True adds policy costing errors and the fiscal risk register's events
+    to the primary balance (fiscal_risks.FiscalRisks).
+    stock_flow ('baseline' or 'historical') adds a stock-flow adjustment centred there,
+    with the historical volatility and the deterministic sfa_items, to the debt
+    recursion (stock_flow.StockFlow).
     """
     try:
         # Load the baseline dataset
@@ -18,106 +350,276 @@ def run_monte_carlo_simulation():
         print("Successfully loaded the baseline analysis results.")
 
         # --- 1. Parameterize Shocks from Historical Data ---
-        hist_df = df[df['Year'] < 2025].copy()
-        hist_df['Nominal GDP Growth'] = hist_df['Nominal GDP'].pct_change()
-        hist_df['Implied Interest Rate'] = hist_df['Debt Interest'] / hist_df['PSND'].shift(1)
-        
-        # Standard deviation of historical shocks
-        gdp_growth_std = hist_df['Nominal GDP Growth'].std()
-        interest_rate_std = hist_df['Implied Interest Rate'].std()
-        primary_balance_std = hist_df['Primary Balance-to-GDP Ratio (%)'].std() / 100 # as fraction of GDP
-
-        print(f"Historical Std Dev (GDP Growth): {gdp_growth_std:.4f}")
-        print(f"Historical Std Dev (Interest Rate): {interest_rate_std:.4f}")
-        print(f"Historical Std Dev (Primary Balance/GDP): {primary_balance_std:.4f}")
+        shock_params = calibrate_shocks(df)
+
+        print(f"Historical Std Dev (GDP Growth): {shock_params['gdp_growth_std']:.4f}")
+        print(f"Historical Std Dev (Interest Rate): {shock_params['interest_rate_std']:.4f}")
+        print(f"Historical Std Dev (Primary Balance/GDP): {shock_params['primary_balance_std']:.4f}")
+        rates = None
+        if rate_model != 'normal':
+            rates = TermStructure(rate_model)
+            print(f"Short-rate model '{rate_model}': kappa = {rates.params['kappa']}, "
+                  f"sigma = {[round(float(sigma), 4) for sigma in rates.params['sigma']]}")
+        regimes = None
+        if shock_model == 'regime':
+            regimes = RegimeSwitching(df=df)
+            print(f"Regime-switching shocks: P(normal -> crisis) = {regimes.params['p_normal_to_crisis']:.3f}, "
+                  f"P(crisis -> crisis) = {regimes.params['p_crisis_to_crisis']:.3f}")
+        risks = None
+        if fiscal_risks:
+            risks = FiscalRisks(df=df)
+            print(f"Fiscal risks: {len(risks.risks)} risk events, expected cost {risks.expected_cost:.2f}% of GDP "
+                  f"(netted off, as the central forecast is a central case; the probability and impact "
+                  f"scales are assumptions, see fiscal_risks.py); "
+                  f"costing error std dev in {FORECAST_YEARS[-1]}: "
+                  + ', '.join(f"{component} {std * 100:.2f}%" for component, std in risks.component_std.iloc[-1].items()))
+        sfa = None
+        if stock_flow is not None:
+            sfa = StockFlow(df=df, centre=stock_flow, items=sfa_items)
+            print(f"Stock-flow adjustment: {stock_flow} centre, mean {np.mean(sfa.centre) * 100:.2f}% of GDP, "
+                  f"std dev {sfa.params['sfa_std'] * 100:.2f}% of GDP"
+                  + (f"; items {', '.join(sfa.item_names)}: {sfa.items.sum() / 1000:.1f}bn in total" if sfa.item_names else ''))
 
         # --- 2. Run Simulation ---
-        n_sims = 10000
-        forecast_years = range(2025, 2030)
-        
-        # Store results
-        sim_results = np.zeros((len(forecast_years), n_sims))
-
-        baseline_forecast = df[df['Year'] >= 2025].set_index('Year')
-
-        for n in range(n_sims):
-            # Create a copy of the forecast to modify in this simulation run
-            sim_df = df.copy().set_index('Year')
-            
-            for i, year in enumerate(forecast_years):
-                prev_year = year - 1
-
-                # Generate random shocks
-                gdp_shock = np.random.normal(0, gdp_growth_std)
-                ir_shock = np.random.normal(0, interest_rate_std)
-                pb_shock = np.random.normal(0, primary_balance_std)
-
-                # Apply shocks
-                sim_gdp_growth = sim_df.loc[year, 'Nominal GDP'] / sim_df.loc[prev_year, 'Nominal GDP'] - 1 + gdp_shock
-                sim_df.loc[year, 'Nominal GDP'] = sim_df.loc[prev_year, 'Nominal GDP'] * (1 + sim_gdp_growth)
-
-                sim_implied_ir = sim_df.loc[year, 'Debt Interest'] / sim_df.loc[prev_year, 'PSND'] + ir_shock
-                sim_df.loc[year, 'Debt Interest'] = sim_df.loc[prev_year, 'PSND'] * sim_implied_ir
-
-                sim_primary_balance = (baseline_forecast.loc[year, 'Primary Balance-to-GDP Ratio (%)'] / 100 + pb_shock) * sim_df.loc[year, 'Nominal GDP'] * 1000
-                
-                # Recalculate dynamics
-                sim_psnb = sim_primary_balance + sim_df.loc[year, 'Debt Interest']
-                sim_psnd = sim_df.loc[prev_year, 'PSND'] + sim_psnb
-                sim_df.loc[year, 'PSND'] = sim_psnd
-                
-                debt_to_gdp = (sim_psnd / (sim_df.loc[year, 'Nominal GDP'] * 10))
-                sim_df.loc[year, 'Debt-to-GDP Ratio (%)'] = debt_to_gdp
-                
-                # Store result
-                sim_results[i, n] = debt_to_gdp
+        receipts = ReceiptsProjection()
+        archive = (ArchiveWriter(archive_path, FORECAST_YEARS, cluster_by='Debt-to-GDP Ratio (%)')
+                   if archive_path else None)
+        with stage('mc_batch', paths=n_sims):
+            if batch_size is None:
+                rng = np.random.default_rng(seed)
+                shocks = draw_shocks(shock_params, len(FORECAST_YEARS), n_sims, rng, rates=rates,
+                                     dtype=shock_dtype(precision), regimes=regimes, risks=risks, stock_flow=sfa)
+                paths = simulate_paths(df, shocks, receipts=receipts, rates=rates, precision=precision,
+                                       columns=None if archive else ['Debt-to-GDP Ratio (%)',
+                                                                     'Debt Affordability Ratio (%)',
+                                                                     'Gilt Issuance Cost'], stock_flow=sfa)
+            else:
+                sketches = simulate_batched(df, shock_params, n_sims, batch_size, seed=seed, receipts=receipts,
+                                            rates=rates, checkpoint_path=checkpoint_path,
+                                            checkpoint_every=checkpoint_every, precision=precision,
+                                            archive=archive, regimes=regimes, risks=risks,
+                                            stock_flow=sfa)
 
         print(f"Completed {n_sims} simulations.")
+        if batch_size is None:
+            shock_bytes = sum(shock.nbytes for shock in shocks.values())
+            print(f"Path storage ({precision}): {(paths.nbytes + shock_bytes) / 1e6:.1f} MB for paths and shocks")
 
         # --- 3. Process and Visualize Results ---
-        percentiles = np.percentile(sim_results, [5, 25, 50, 75, 95], axis=1)
-        percentile_df = pd.DataFrame(percentiles.T, index=forecast_years, columns=['P5', 'P25', 'P50 (Median)', 'P75', 'P95'])
-        
-        visualize_fan_chart(df, percentile_df)
-        
+        if batch_size is None:
+            percentile_df = summarize_percentiles(paths['Debt-to-GDP Ratio (%)'])
+
+            # Joint debt interest / revenue ratio from the same paths
+            affordability_df = summarize_percentiles(paths['Debt Affordability Ratio (%)']).join(
+                summarize_exceedance(paths['Debt Affordability Ratio (%)'], AFFORDABILITY_THRESHOLDS))
+        else:
+            debt, affordability = sketches['debt'], sketches['affordability']
+            percentile_df = pd.DataFrame(debt.quantiles(PERCENTILES), index=FORECAST_YEARS, columns=PERCENTILE_COLUMNS)
+            affordability_df = pd.DataFrame(affordability.quantiles(PERCENTILES), index=FORECAST_YEARS,
+                                            columns=PERCENTILE_COLUMNS).join(
+                pd.DataFrame(affordability.exceedance(), index=FORECAST_YEARS,
+                             columns=[f'P(> {threshold}%)' for threshold in AFFORDABILITY_THRESHOLDS]))
+            print(f"Debt-to-GDP ratio in {FORECAST_YEARS[-1]}: mean {debt.mean()[-1]:.2f}%, std {debt.std()[-1]:.2f}ppt")
+        for threshold in AFFORDABILITY_THRESHOLDS:
+            print(f"P(debt interest > {threshold}% of revenue in {FORECAST_YEARS[-1]}): "
+                  f"{affordability_df.loc[FORECAST_YEARS[-1], f'P(> {threshold}%)']:.1%}")
+
+        regime_df = None
+        if regimes is not None and batch_size is None:
+            regime_df = summarize_regimes(paths['Debt-to-GDP Ratio (%)'], shocks['crisis'])
+            print(f"Paths hit by a crisis by {FORECAST_YEARS[-1]}: {regime_df['Crisis-Hit Share (%)'].iloc[-1]:.1f}%, "
+                  f"making up {regime_df['Crisis-Hit Share of Tail above P95 (%)'].iloc[-1]:.1f}% of the tail above P95")
+
+        if risks is not None and batch_size is None:
+            risk_cost = shocks['risk_events'].sum(axis=0) * 100
+            print(f"Paths with a crystallised fiscal risk by {FORECAST_YEARS[-1]}: {np.mean(risk_cost > 0):.1%}, "
+                  f"mean cost {risk_cost.mean():.2f}% of GDP")
+
+        if render:
+            visualize_fan_chart(df, percentile_df, n_sims)
+            visualize_affordability_fan_chart(affordability_df, n_sims)
+            if regime_df is not None:
+                visualize_regime_fan_chart(df, regime_df, n_sims)
+
         # --- 4. Save Results ---
         mc_output_path = 'data/processed/monte_carlo_percentiles.csv'
         percentile_df.to_csv(mc_output_path)
         print(f"Monte Carlo percentile results saved to {mc_output_path}")
 
+        affordability_df.to_csv(mc_affordability_output_path)
+        print(f"Monte Carlo affordability results saved to {mc_affordability_output_path}")
+
+        atomic_write_json({'n_sims': n_sims, 'seed': seed, 'rate_model': rate_model, 'shock_model': shock_model,
+                           'fiscal_risks': fiscal_risks, 'stock_flow': stock_flow, 'sfa_items': list(sfa_items),
+                           'precision': precision, 'batch_size': batch_size}, mc_run_output_path)
+
+        if rates is not None and batch_size is None:
+            gilt_rates = (rates.baseline_yields.loc[list(FORECAST_YEARS)].values[:, None] + shocks['gilt']) * 100
+            gilt_df = summarize_percentiles(gilt_rates).add_prefix('Gilt Rate (%) ').join(
+                summarize_percentiles(paths['Gilt Issuance Cost']).add_prefix('Gilt Issuance Cost '))
+            gilt_df.to_csv(mc_gilt_output_path)
+            print(f"Monte Carlo gilt rate and issuance cost results saved to {mc_gilt_output_path}")
+
+        if regime_df is not None:
+            regime_df.to_csv(mc_regime_output_path)
+            print(f"Monte Carlo regime decomposition saved to {mc_regime_output_path}")
+
+        if archive is not None:
+            with stage('mc_archive'):
+                if batch_size is None:
+                    archive.append(paths)
+                    archive.close()
+                else:
+                    archive.close(n_chunks=-(-n_sims // batch_size))
 
     except Exception as e:
         print(f"An error occurred during Monte Carlo simulation: {e}")
+        mark_failed(e)
 
-def visualize_fan_chart(baseline_df, percentile_df):
+@instrument('plot_render[fan_chart]')
+def visualize_fan_chart(baseline_df, percentile_df, n_sims=10000):
     """
     Generates and saves a fan chart of the Monte Carlo simulation results.
     """
+    plt, sns = load_pyplot()
+
     plt.figure(figsize=(14, 8))
     sns.set_theme(style="whitegrid")
-    
+
     years = percentile_df.index
-    
+
     # Plot shaded percentile bands
     plt.fill_between(years, percentile_df['P5'], percentile_df['P95'], color='b', alpha=0.1, label='90% Confidence Interval')
     plt.fill_between(years, percentile_df['P25'], percentile_df['P75'], color='b', alpha=0.2, label='50% Confidence Interval')
-    
+
     # Plot median and baseline
     plt.plot(years, percentile_df['P50 (Median)'], 'b-', marker='o', label='Median Simulation')
     baseline_plot_df = baseline_df[baseline_df['Year'] >= 2024]
     plt.plot(baseline_plot_df['Year'], baseline_plot_df['Debt-to-GDP Ratio (%)'], 'r--', marker='o', label='OBR Baseline Forecast')
 
-    plt.title('Monte Carlo Simulation of UK Debt-to-GDP Ratio (10,000 Simulations)', fontsize=16)
+    plt.title(f'Monte Carlo Simulation of UK Debt-to-GDP Ratio ({n_sims:,} Simulations)', fontsize=16)
     plt.xlabel('Year', fontsize=12)
     plt.ylabel('Debt-to-GDP Ratio (%)', fontsize=12)
     plt.legend()
     plt.grid(True, which='both', linestyle='-', linewidth=0.5)
-    
+
     plot_path = os.path.join(plots_dir, 'monte_carlo_fan_chart.png')
     plt.savefig(plot_path)
     print(f"Fan chart saved to {plot_path}")
     plt.close()
 
+@instrument('plot_render[affordability_fan_chart]')
+def visualize_affordability_fan_chart(affordability_df, n_sims=10000):
+    """
+    Generates and saves a fan chart of the simulated debt affordability ratio,
+    with the probability of exceeding each threshold annotated per year.
+    """
+    plt, sns = load_pyplot()
+
+    plt.figure(figsize=(14, 8))
+    sns.set_theme(style="whitegrid")
+
+    years = affordability_df.index
+
+    plt.fill_between(years, affordability_df['P5'], affordability_df['P95'], color='purple', alpha=0.1, label='90% Confidence Interval')
+    plt.fill_between(years, affordability_df['P25'], affordability_df['P75'], color='purple', alpha=0.2, label='50% Confidence Interval')
+    plt.plot(years, affordability_df['P50 (Median)'], color='purple', marker='o', label='Median Simulation')
+
+    # Mark the 10% threshold and the probability of breaching it
+    plt.axhline(y=10, color='r', linestyle='--', label='10% of Revenue')
+    for year in years:
+        plt.annotate(f"P(>10%): {affordability_df.loc[year, 'P(> 10%)']:.0%}",
+                     xy=(year, affordability_df.loc[year, 'P95']), xytext=(0, 8),
+                     textcoords='offset points', ha='center', fontsize=10)
+
+    plt.title(f'Monte Carlo Simulation of UK Debt Affordability ({n_sims:,} Simulations)', fontsize=16)
+    plt.xlabel('Year', fontsize=12)
+    plt.ylabel('Interest Payments / Revenue (%)', fontsize=12)
+    plt.xticks(years)
+    plt.legend()
+    plt.grid(True, which='both', linestyle='-', linewidth=0.5)
+
+    plot_path = os.path.join(plots_dir, 'monte_carlo_affordability_fan_chart.png')
+    plt.savefig(plot_path)
+    print(f"Affordability fan chart saved to {plot_path}")
+    plt.close()
+
+@instrument('plot_render[regime_fan_chart]')
+def visualize_regime_fan_chart(baseline_df, regime_df, n_sims=10000):
+    """
+    Generates and saves the debt ratio fan chart split by regime history (paths
+    without and with a crisis so far), next to the share of the paths and of the
+    tail above P95 coming from crisis-hit paths.
+    """
+    plt, sns = load_pyplot()
+
+    fig, (ax_fan, ax_tail) = plt.subplots(1, 2, figsize=(18, 8), gridspec_kw={'width_ratios': [2, 1]})
+    sns.set_theme(style="whitegrid")
+
+    years = regime_df.index
+    for label, color in [('No Crisis', 'b'), ('Crisis-Hit', 'r')]:
+        ax_fan.fill_between(years, regime_df[f'{label} P5'], regime_df[f'{label} P95'], color=color, alpha=0.15,
+                            label=f'{label} Paths: 90% Interval')
+        ax_fan.plot(years, regime_df[f'{label} P50'], color=color, marker='o', label=f'{label} Paths: Median')
+    baseline_plot_df = baseline_df[baseline_df['Year'].isin(years)]
+    ax_fan.plot(baseline_plot_df['Year'], baseline_plot_df['Debt-to-GDP Ratio (%)'], 'k--', marker='o', label='OBR Baseline Forecast')
+    ax_fan.set_title(f'Debt-to-GDP Ratio by Regime History ({n_sims:,} Simulations)', fontsize=14)
+    ax_fan.set_xlabel('Year', fontsize=12)
+    ax_fan.set_ylabel('Debt-to-GDP Ratio (%)', fontsize=12)
+    ax_fan.set_xticks(years)
+    ax_fan.legend()
+
+    positions = np.arange(len(years))
+    ax_tail.bar(positions - 0.2, regime_df['Crisis-Hit Share (%)'], width=0.4, color='r', alpha=0.4, label='Share of All Paths')
+    ax_tail.bar(positions + 0.2, regime_df['Crisis-Hit Share of Tail above P95 (%)'], width=0.4, color='r', alpha=0.8,
+                label='Share of Paths above P95')
+    ax_tail.set_title('Crisis-Hit Paths', fontsize=14)
+    ax_tail.set_xticks(positions)
+    ax_tail.set_xticklabels(years)
+    ax_tail.set_ylabel('%', fontsize=12)
+    ax_tail.set_ylim(0, 100)
+    ax_tail.legend()
+
+    fig.tight_layout()
+    plot_path = os.path.join(plots_dir, 'monte_carlo_regime_fan_chart.png')
+    plt.savefig(plot_path)
+    print(f"Regime fan chart saved to {plot_path}")
+    plt.close()
+
 
 if __name__ == '__main__':
-    run_monte_carlo_simulation()
+    parser = argparse.ArgumentParser(description='Run the Monte Carlo debt simulation.')
+    parser.add_argument('--sims', type=int, default=10000, help='Number of simulated paths.')
+    parser.add_argument('--seed', type=int, default=None, help='Random seed for reproducible runs.')
+    parser.add_argument('--no-plots', action='store_true', help='Compute only; do not import matplotlib.')
+    parser.add_argument('--rate-model', choices=RATE_MODEL_CHOICES, default='normal',
+                        help='Interest rate shocks: i.i.d. normal or a short-rate term structure model.')
+    parser.add_argument('--shock-model', choices=SHOCK_MODEL_CHOICES, default='normal',
+                        help='Shocks: one normal regime or two-regime (normal/crisis) Markov switching.')
+    parser.add_argument('--fiscal-risks', action='store_true',
+                        help='Add policy costing errors and fiscal risk register events (see fiscal_risks.py).')
+    parser.add_argument('--stock-flow', choices=SFA_CENTRES, default=None,
+                        help='Add a stock-flow adjustment to the debt recursion, centred on the baseline '
+                             "forecast's or the historical mean (see stock_flow.py).")
+    parser.add_argument('--sfa-items', nargs='*', choices=list(SFA_ITEMS), default=(),
+                        help='Deterministic stock-flow items to add (requires --stock-flow).')
+    parser.add_argument('--batch-size', type=int, default=None,
+                        help='Stream paths in batches of this size through quantile sketches.')
+    parser.add_argument('--checkpoint', nargs='?', const=MC_CHECKPOINT_PATH, default=None,
+                        help='Checkpoint batched runs here and resume from it (requires --batch-size).')
+    parser.add_argument('--checkpoint-every', type=int, default=1, help='Batches between checkpoints.')
+    parser.add_argument('--precision', choices=list(PRECISIONS), default='float64',
+                        help='Storage of shocks and paths: float64, float32 or int32 fixed point (bp32).')
+    parser.add_argument('--archive', nargs='?', const=MC_ARCHIVE_DIR, default=None,
+                        help='Also archive every path here for conditional queries (see path_archive.py).')
+    args = parser.parse_args()
+    if args.checkpoint and args.batch_size is None:
+        parser.error('--checkpoint requires --batch-size')
+    if args.sfa_items and args.stock_flow is None:
+        parser.error('--sfa-items requires --stock-flow')
+    run_monte_carlo_simulation(n_sims=args.sims, seed=args.seed, render=not args.no_plots, rate_model=args.rate_model,
+                               batch_size=args.batch_size, checkpoint_path=args.checkpoint,
+                               checkpoint_every=args.checkpoint_every, precision=args.precision,
+                               archive_path=args.archive, shock_model=args.shock_model,
+                               fiscal_risks=args.fiscal_risks, stock_flow=args.stock_flow,
+                               sfa_items=args.sfa_items)
@@ -0,0 +1,174 @@
+import pandas as pd
+import argparse
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+
+from atomic_io import atomic_write_csv, atomic_write_json
+
+# --- Configuration ---
+CSV_FILE_PATH = 'data/processed/obr_data.csv'
+LEDGER_FILE_PATH = 'data/processed/obr_data_patches.json'
+
+# --- Unit Normalisation ---
+# Every series in obr_data.csv is stored in £ millions, except Nominal GDP (£ billions).
+# Patch values are declared in their source unit and normalised on application.
+UNIT_SCALES = {
+    'millions': 1,
+    'billions': 1000,
+}
+PERCENT_OF_GDP = 'percent_of_gdp'
+
+# --- Patch Set ---
+# Each patch sets absolute values for one column, so re-applying a patch never
+# compounds (unlike the old in-place scale correction).
+PATCHES = {
+    'psnb_historical': {
+        # Public Sector Net Borrowing for 2007/08 to 2022/23, mapped to 2008-2023
+        'column': 'PSNB',
+        'unit': 'millions',
+        'values': {
+            2008: 47125, 2009: 119372, 2010: 159906, 2011: 141786, 2012: 121290,
+            2013: 123911, 2014: 102465, 2015: 96867, 2016: 81516, 2017: 54804,
+            2018: 58916, 2019: 44267, 2020: 61453, 2021: 312942, 2022: 121091,
+            2023: 139213
+        }
+    },
+    'psnb_projections': {
+        'column': 'PSNB',
+        'unit': 'billions',
+        'values': {
+            2024: 137.3, 2025: 117.7, 2026: 97.2, 2027: 80.2, 2028: 77.4, 2029: 74.0
+        }
+    },
+    'debt_interest_historical': {
+        'column': 'Debt Interest',
+        'unit': 'millions',
+        'values': {
+            2008: 34895, 2009: 24431, 2010: 39324, 2011: 45004, 2012: 37969,
+            2013: 38472, 2014: 37588, 2015: 33041, 2016: 35659, 2017: 42487,
+            2018: 42094, 2019: 36845, 2020: 25132, 2021: 47552, 2022: 114670,
+            2023: 111300  # Placeholder until the 2023 outturn is confirmed
+        }
+    },
+    'debt_interest_projections': {
+        'column': 'Debt Interest',
+        'unit': 'billions',
+        'values': {
+            2024: 87.5, 2025: 101.5, 2026: 104.8, 2027: 113.4, 2028: 121.1, 2029: 129.3
+        }
+    },
+    'psnd_projections': {
+        # Public sector net debt for 2023-24 to 2028-29, mapped to 2024-2029.
+        # 2030 (96.1%) is skipped as there is no Nominal GDP for that year.
+        'column': 'PSND',
+        'unit': PERCENT_OF_GDP,
+        'values': {
+            2024: 95.5, 2025: 95.9, 2026: 95.1, 2027: 95.8, 2028: 96.1, 2029: 96.3
+        }
+    },
+}
+
+
+def patch_digest(patch):
+    """Returns a stable content hash of a patch specification."""
+    payload = json.dumps(patch, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def file_digest(path):
+    """Returns the SHA-256 of a file, or None if it does not exist."""
+    if not os.path.exists(path):
+        return None
+    sha = hashlib.sha256()
+    with open(path, 'rb') as handle:
+        for block in iter(lambda: handle.read(1 << 20), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def load_ledger(ledger_path=LEDGER_FILE_PATH):
+    """Loads the record of applied patches."""
+    if not os.path.exists(ledger_path):
+        return {'file_sha256': None, 'patches': {}}
+    with open(ledger_path) as handle:
+        return json.load(handle)
+
+
+def normalise_values(df, patch):
+    """
+    Converts a patch's values to the storage unit of its column (£ millions).
+    Returns a Series indexed by Year containing only the years present in df.
+    """
+    values = pd.Series(patch['values'], dtype=float)
+    values = values[values.index.isin(df.index)]
+    unit = patch['unit']
+
+    if unit == PERCENT_OF_GDP:
+        # PSND as % of GDP -> £ millions (GDP is in £ billions)
+        gdp = df.loc[values.index, 'Nominal GDP']
+        missing = gdp.isna()
+        if missing.any():
+            print(f"Warning: No Nominal GDP for {list(values.index[missing])}, skipping those years.")
+        return ((values / 100) * gdp * 1000)[~missing]
+
+    if unit not in UNIT_SCALES:
+        raise ValueError(f"Unknown unit '{unit}'")
+    return values * UNIT_SCALES[unit]
+
+
+def apply_patches(patch_ids=None, csv_path=CSV_FILE_PATH, ledger_path=LEDGER_FILE_PATH, force=False):
+    """
+    Applies a set of series patches to obr_data.csv in a single read/write pass.
+
+    Patches already recorded in the ledger against the current file contents are
+    skipped without reading the CSV. The data file and the ledger are written
+    atomically, so an interrupted run leaves the previous version intact.
+    """
+    patch_ids = list(PATCHES) if patch_ids is None else list(patch_ids)
+    unknown = [pid for pid in patch_ids if pid not in PATCHES]
+    if unknown:
+        raise KeyError(f"Unknown patch(es): {unknown}")
+
+    ledger = load_ledger(ledger_path)
+    current_sha = file_digest(csv_path)
+    if current_sha is None:
+        print(f"Error: The file {csv_path} was not found.")
+        return None
+
+    digests = {pid: patch_digest(PATCHES[pid]) for pid in patch_ids}
+    ledger_is_current = ledger.get('file_sha256') == current_sha
+    pending = [
+        pid for pid in patch_ids
+        if force or not ledger_is_current or ledger['patches'].get(pid, {}).get('digest') != digests[pid]
+    ]
+    if not pending:
+        print(f"All requested patches already applied to {csv_path}.")
+        return None
+
+    df = pd.read_csv(csv_path, index_col='Year')
+    for pid in pending:
+        patch = PATCHES[pid]
+        values = normalise_values(df, patch)
+        df.loc[values.index, patch['column']] = values
+        print(f"Applied patch '{pid}' to '{patch['column']}' for {len(values)} years.")
+
+    atomic_write_csv(df, csv_path)
+
+    # Patches recorded against an older file version are no longer guaranteed to hold
+    recorded = ledger['patches'] if ledger_is_current else {}
+    applied_at = datetime.now(timezone.utc).isoformat()
+    for pid in pending:
+        recorded[pid] = {'digest': digests[pid], 'column': PATCHES[pid]['column'], 'applied_at': applied_at}
+    atomic_write_json({'file_sha256': file_digest(csv_path), 'patches': recorded}, ledger_path)
+    print(f"Successfully applied {len(pending)} patch(es) to {csv_path}.")
+    return df
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Apply series patches to obr_data.csv.')
+    parser.add_argument('patches', nargs='*', help='Patch ids to apply (default: all).')
+    parser.add_argument('--force', action='store_true', help='Re-apply patches even if recorded in the ledger.')
+    args = parser.parse_args()
+    apply_patches(args.patches or None, force=args.force)
@@ -0,0 +1,186 @@
+import pandas as pd
+import numpy as np
+import argparse
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import monte_carlo_simulation as mc
+from dsa_analysis import compute_analysis
+import stress_tests
+from stock_flow import SFA_CENTRES, StockFlow
+from vintage_store import SERIES, load_vintage
+from atomic_io import atomic_write_csv
+from instrumentation import instrument, stage, mark_failed
+
+# One CSV per country (or fiscal dataset) with the obr_data.csv schema, named after it
+PANEL_DIR = 'data/panel'
+panel_analysis_output_path = 'data/processed/panel_analysis_results.csv'
+panel_stress_output_path = 'data/processed/panel_stress_results.csv'
+panel_mc_output_path = 'data/processed/panel_monte_carlo_percentiles.csv'
+
+FORECAST_YEARS = list(mc.FORECAST_YEARS)
+# Stress scenarios of stress_tests: (implied interest rate shock, nominal GDP growth shock)
+PANEL_SCENARIOS = {
+    'Interest_Rate_Shock': (0.01, 0.0),
+    'GDP_Growth_Shock': (0.0, -0.01),
+}
+STRESS_COLUMNS = ['Nominal GDP', 'Debt Interest', 'Primary Balance', 'PSNB', 'PSND', 'Debt-to-GDP Ratio (%)']
+
+
+def load_panel(paths=None, panel_dir=PANEL_DIR, vintages=()):
+    """
+    Reads the panel's datasets into {name: DataFrame}. paths are CSV files, optionally
+    given as 'NAME=path' (default name: the file name); without any, every CSV in
+    panel_dir is read. Vintages from the vintage store join the panel under their name.
+    Every dataset needs the obr_data.csv columns, in the same units.
+    """
+    if not paths and not vintages:
+        paths = sorted(glob.glob(os.path.join(panel_dir, '*.csv')))
+    datasets = {}
+    for path in paths or []:
+        name, _, file_path = path.rpartition('=') if '=' in path else ('', '', path)
+        datasets[name or os.path.splitext(os.path.basename(file_path))[0]] = pd.read_csv(file_path)
+    for vintage in vintages:
+        datasets[vintage] = load_vintage(vintage)
+    for name, df in datasets.items():
+        missing = [column for column in ['Year'] + SERIES if column not in df.columns]
+        if missing:
+            raise ValueError(f"Dataset '{name}' lacks the column(s) {', '.join(missing)}.")
+    return datasets
+
+
+def stack_panel(analysis_df, countries, years):
+    """
+    Each column of the stacked analysis as an array of shape (len(years), n_countries),
+    in the order of countries, with the years under 'Year': the panel form of a
+    baseline for stress_tests.project_scenarios and monte_carlo_simulation.simulate_paths.
+    """
+    missing = [country for country in countries
+               if not set(years) <= set(analysis_df.loc[analysis_df['Country'] == country, 'Year'])]
+    if missing:
+        raise ValueError(f"Dataset(s) {', '.join(missing)} do not cover {years[0]}-{years[-1]}.")
+    wide = analysis_df.pivot(index='Year', columns='Country')
+    panel = {column: wide[column].loc[years, countries].values
+             for column in SERIES + ['Primary Balance', 'Primary Balance-to-GDP Ratio (%)']}
+    panel['Year'] = np.array(years)
+    return panel
+
+
+@instrument('panel_shard')
+def run_shard(datasets, n_paths, seeds, stock_flow=None, forecast_years=FORECAST_YEARS):
+    """
+    Runs the deterministic, stress and Monte Carlo DSA of a shard of the panel as
+    stacked arrays. Each country draws its shocks from its own seed and calibration,
+    so its results do not depend on the shard it is in. stock_flow ('baseline' or
+    'historical') keeps each country's own stock-flow adjustment, centred there, in
+    the stress and simulated debt paths (the EFO's deterministic items are UK-only).
+    Returns (analysis, stress, percentiles) DataFrames in long form with a Country column.
+    """
+    countries = list(datasets)
+    analysis_df = compute_analysis(pd.concat([df.assign(Country=name) for name, df in datasets.items()],
+                                             ignore_index=True))
+    years = [forecast_years[0] - 1] + list(forecast_years)
+    panel = stack_panel(analysis_df, countries, years)
+    flows, sfa = [None] * len(countries), None
+    if stock_flow is not None:
+        flows = [StockFlow(df=analysis_df[analysis_df['Country'] == country], centre=stock_flow,
+                           forecast_years=forecast_years, last_history_year=years[0]) for country in countries]
+        sfa = StockFlow.stack(flows)
+
+    # --- Stress Scenarios (country x scenario x year), next to each dataset's own baseline ---
+    ir_shock, growth_shock = np.array(list(PANEL_SCENARIOS.values())).T
+    stressed = stress_tests.project_scenarios(panel, ir_shock=ir_shock, growth_shock=growth_shock,
+                                              start_year=forecast_years[0],
+                                              stock_flow=sfa)
+    baseline_df = analysis_df[analysis_df['Year'].isin(forecast_years)].assign(Scenario='Baseline')
+    frames = []
+    for c, country in enumerate(countries):
+        frames.append(baseline_df.loc[baseline_df['Country'] == country, ['Country', 'Scenario', 'Year'] + STRESS_COLUMNS])
+        frames += [pd.DataFrame({'Country': country, 'Scenario': scenario, 'Year': forecast_years,
+                                 **{name: stressed[name][c, s] for name in STRESS_COLUMNS}})
+                   for s, scenario in enumerate(PANEL_SCENARIOS)]
+    stress_df = pd.concat(frames, ignore_index=True)
+
+    # --- Monte Carlo (country x path x year) ---
+    draws = []
+    for c, (country, seed_seq) in enumerate(zip(countries, seeds)):
+        country_df = analysis_df[analysis_df['Country'] == country]
+        shock_params = mc.calibrate_shocks(country_df, last_history_year=years[0])
+        draws.append(mc.draw_shocks(shock_params, len(forecast_years), n_paths, np.random.default_rng(seed_seq),
+                                    stock_flow=flows[c]))
+    shocks = {key: np.stack([draw[key] for draw in draws], axis=1) for key in draws[0]}
+    ratio = mc.simulate_paths(panel, shocks, forecast_years, columns=['Debt-to-GDP Ratio (%)'],
+                              stock_flow=sfa)['Debt-to-GDP Ratio (%)']
+    percentiles = np.percentile(ratio, mc.PERCENTILES, axis=2)
+    percentile_df = pd.concat([
+        pd.DataFrame(percentiles[:, :, c].T, columns=mc.PERCENTILE_COLUMNS).assign(Country=country, Year=forecast_years)
+        for c, country in enumerate(countries)], ignore_index=True)[['Country', 'Year'] + mc.PERCENTILE_COLUMNS]
+    return analysis_df, stress_df, percentile_df
+
+
+def _shard_job(job):
+    """Unpacks one shard job (runs in a worker process)."""
+    return run_shard(*job)
+
+
+def run_panel(datasets, n_paths=10000, seed=None, max_workers=None, stock_flow=None):
+    """
+    Runs the DSA for every dataset of the panel, sharded by country across processes
+    (max_workers=1 runs in this process), and writes each analysis for all countries
+    together. stock_flow keeps each country's stock-flow adjustment (see run_shard).
+    Returns (analysis, stress, percentiles) DataFrames.
+    """
+    try:
+        countries = list(datasets)
+        print(f"Panel of {len(countries)} datasets: {', '.join(countries)}")
+        seeds = dict(zip(countries, np.random.SeedSequence(seed).spawn(len(countries))))
+        n_shards = min(len(countries), max_workers or os.cpu_count() or 1)
+        jobs = [({country: datasets[country] for country in shard}, n_paths, [seeds[country] for country in shard], stock_flow)
+                for shard in np.array_split(np.array(countries, dtype=object), n_shards)]
+
+        with stage('panel_batch', paths=n_paths * len(countries)):
+            if n_shards == 1:
+                results = [_shard_job(job) for job in jobs]
+            else:
+                with ProcessPoolExecutor(max_workers=n_shards) as executor:
+                    results = list(executor.map(_shard_job, jobs))
+        analysis_df, stress_df, percentile_df = (pd.concat(frames, ignore_index=True) for frames in zip(*results))
+        print(f"Completed the panel DSA in {n_shards} shard(s), {n_paths:,} paths per country.")
+
+        end = FORECAST_YEARS[-1]
+        summary = stress_df[stress_df['Year'] == end].pivot(index='Country', columns='Scenario',
+                                                            values='Debt-to-GDP Ratio (%)')[['Baseline'] + list(PANEL_SCENARIOS)]
+        summary = summary.join(percentile_df[percentile_df['Year'] == end].set_index('Country')[
+            ['P50 (Median)', 'P95']].add_prefix('MC '))
+        print(f"\nDebt-to-GDP ratio in {end} (%):")
+        print(summary.loc[countries].round(1).to_string())
+
+        atomic_write_csv(analysis_df, panel_analysis_output_path, index=False)
+        atomic_write_csv(stress_df, panel_stress_output_path, index=False)
+        atomic_write_csv(percentile_df, panel_mc_output_path, index=False)
+        print(f"Panel results saved to {panel_analysis_output_path}, {panel_stress_output_path} "
+              f"and {panel_mc_output_path}")
+        return analysis_df, stress_df, percentile_df
+
+    except Exception as e:
+        print(f"An error occurred during the panel analysis: {e}")
+        mark_failed(e)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run the DSA for a panel of countries or fiscal datasets.')
+    parser.add_argument('datasets', nargs='*', help=f'CSV files as path or NAME=path (default: every CSV in {PANEL_DIR}).')
+    parser.add_argument('--panel-dir', default=PANEL_DIR, help='Directory of the panel CSVs.')
+    parser.add_argument('--vintages', nargs='*', default=(), help='Vintages from the vintage store to add to the panel.')
+    parser.add_argument('--sims', type=int, default=10000, help='Number of simulated paths per country.')
+    parser.add_argument('--seed', type=int, default=None, help='Random seed for reproducible runs.')
+    parser.add_argument('--workers', type=int, default=None, help='Number of worker processes (1 = no parallelism).')
+    parser.add_argument('--stock-flow', choices=SFA_CENTRES, default=None,
+                        help="Keep each dataset's stock-flow adjustment in the debt recursion, centred on its "
+                             "baseline forecast's or its historical mean (see stock_flow.py).")
+    args = parser.parse_args()
+    datasets = load_panel(args.datasets, args.panel_dir, args.vintages)
+    if not datasets:
+        parser.error(f'no datasets given and none found in {args.panel_dir}')
+    run_panel(datasets, n_paths=args.sims, seed=args.seed, max_workers=args.workers, stock_flow=args.stock_flow)
@@ -0,0 +1,223 @@
+import pandas as pd
+import numpy as np
+import argparse
+import io
+import json
+import os
+import re
+import shutil
+
+from atomic_io import atomic_write_bytes, atomic_write_npy
+from instrumentation import instrument
+
+# Default location and chunk size of the Monte Carlo path archive
+MC_ARCHIVE_DIR = 'data/processed/monte_carlo_archive'
+ARCHIVE_CHUNK_SIZE = 65536
+INDEX_FILE = 'index.npz'
+# Quantile checkpoints kept per chunk, column and year; the first and last are the min and max
+CHECKPOINT_LEVELS = np.linspace(0, 100, 11)
+
+
+def column_file(column):
+    """File name of a column in each chunk, e.g. 'debt_to_gdp_ratio.npy'."""
+    return re.sub(r'[^a-z0-9]+', '_', column.lower()).strip('_') + '.npy'
+
+
+def _chunk_dir(path, chunk):
+    return os.path.join(path, f'chunk_{chunk:05d}')
+
+
+class ArchiveWriter:
+    """
+    Writes simulated paths to disk in chunked columnar form: one directory per chunk of
+    paths and one .npy file per column, of shape (n_years, chunk paths), so a year of a
+    chunk is a contiguous row. Columns are stored at the precision of the PathStore
+    they come from. Each chunk also gets its quantile checkpoints per column and year,
+    which close() gathers into the archive index.
+
+    Paths are exchangeable, so when a whole run is split into chunks they are first
+    ordered by the last year of cluster_by. Chunks then hold similar paths and, as
+    debt ratios are persistent, their min/max let queries skip most chunks.
+    """
+
+    def __init__(self, path=MC_ARCHIVE_DIR, years=None, chunk_size=ARCHIVE_CHUNK_SIZE, cluster_by=None):
+        self.path = path
+        self.years = [int(year) for year in years]
+        self.chunk_size = chunk_size
+        self.cluster_by = cluster_by
+        self.next_chunk = 0
+        self.layout = None
+
+    def _write_chunk(self, chunk, buffers, decoded):
+        directory = _chunk_dir(self.path, chunk)
+        for column, buffer in buffers.items():
+            atomic_write_npy(np.ascontiguousarray(buffer), os.path.join(directory, column_file(column)))
+        checkpoints = np.stack([np.percentile(values, CHECKPOINT_LEVELS, axis=1).T for values in decoded])
+        atomic_write_npy(checkpoints, os.path.join(directory, 'checkpoints.npy'))
+
+    def append(self, paths, chunk=None):
+        """
+        Archives a PathStore. With an explicit chunk number (e.g. a batch of
+        simulate_batched) it is written as that one chunk; otherwise it is split into
+        chunks of chunk_size paths numbered after the last ones written.
+        """
+        if self.layout is None:
+            self.layout = {'columns': list(paths), 'precision': paths.precision,
+                           'scales': [paths.scales.get(column) for column in paths]}
+        n_sims = next(iter(paths.buffers.values())).shape[1]
+        if chunk is not None:
+            self._write_chunk(chunk, paths.buffers, [paths[column] for column in paths])
+            self.next_chunk = max(self.next_chunk, chunk + 1)
+            return
+        order = np.arange(n_sims)
+        if self.cluster_by in paths:
+            order = np.argsort(paths[self.cluster_by][-1], kind='stable')
+        for start in range(0, n_sims, self.chunk_size):
+            window = order[start:start + self.chunk_size]
+            self._write_chunk(self.next_chunk, {column: buffer[:, window] for column, buffer in paths.buffers.items()},
+                              [paths[column][:, window] for column in paths])
+            self.next_chunk += 1
+
+    def close(self, n_chunks=None):
+        """
+        Writes the index of chunks 0..n_chunks-1 (default: all written) and removes
+        chunks left over from an earlier, larger archive in the same place.
+        """
+        n_chunks = self.next_chunk if n_chunks is None else n_chunks
+        sizes, checkpoints = [], []
+        first_column = column_file(self.layout['columns'][0])
+        for chunk in range(n_chunks):
+            directory = _chunk_dir(self.path, chunk)
+            sizes.append(np.load(os.path.join(directory, first_column), mmap_mode='r').shape[1])
+            checkpoints.append(np.load(os.path.join(directory, 'checkpoints.npy')))
+        for name in os.listdir(self.path):
+            match = re.match(r'^chunk_(\d+)$', name)
+            if match and int(match.group(1)) >= n_chunks:
+                shutil.rmtree(os.path.join(self.path, name))
+
+        config = dict(self.layout, years=self.years, levels=list(CHECKPOINT_LEVELS))
+        buffer = io.BytesIO()
+        np.savez(buffer, config=np.array(json.dumps(config)), sizes=np.array(sizes, dtype=np.int64),
+                 checkpoints=np.stack(checkpoints))
+        atomic_write_bytes(buffer.getvalue(), os.path.join(self.path, INDEX_FILE))
+        print(f"Archived {sum(sizes):,} paths in {n_chunks} chunks to {self.path}")
+
+
+class PathArchive:
+    """
+    Reads an archive written by ArchiveWriter. Conditions are first checked against the
+    per-chunk min/max, so chunks that cannot match are never opened, and chunks where
+    every path matches are not read at all; the remaining rows are read through memory
+    maps. checkpoints[chunk, column, year] holds the chunk's sorted quantile checkpoints.
+    """
+
+    def __init__(self, path=MC_ARCHIVE_DIR):
+        with np.load(os.path.join(path, INDEX_FILE)) as index:
+            config = json.loads(str(index['config']))
+            self.sizes = index['sizes']
+            self.checkpoints = index['checkpoints']
+        self.path = path
+        self.columns = config['columns']
+        self.years = config['years']
+        self.precision = config['precision']
+        self.scales = dict(zip(self.columns, config['scales']))
+        self.offsets = np.concatenate([[0], np.cumsum(self.sizes)])
+        self.chunks_read = set()
+
+    @property
+    def n_paths(self):
+        return int(self.offsets[-1])
+
+    def _position(self, column, year):
+        return self.columns.index(column), self.years.index(int(year))
+
+    def _row(self, chunk, column, year):
+        """Year `year` of `column` in one chunk, undecoded, as a row of a memory map."""
+        self.chunks_read.add(chunk)
+        data = np.load(os.path.join(_chunk_dir(self.path, chunk), column_file(column)), mmap_mode='r')
+        return data[self._position(column, year)[1]]
+
+    def _decode(self, column, raw):
+        scale = self.scales[column]
+        return raw / scale if scale else np.asarray(raw, dtype=np.float64)
+
+    def _bounds(self, column, year):
+        """Min and max of every chunk, shape (n_chunks,) each."""
+        j, i = self._position(column, year)
+        return self.checkpoints[:, j, i, 0], self.checkpoints[:, j, i, -1]
+
+    def estimate_count(self, column, year, above=None, below=None):
+        """
+        Bounds on the number of paths with above < value <= below, from the quantile
+        checkpoints alone (no chunk is read).
+        """
+        j, i = self._position(column, year)
+        levels = self.checkpoints[:, j, i, :]
+        fractions = np.diff(np.asarray(CHECKPOINT_LEVELS)) / 100
+        low = -np.inf if above is None else above
+        high = np.inf if below is None else below
+        # A slice between two checkpoints surely matches if it lies inside the range,
+        # and possibly matches if it overlaps it
+        inside = (levels[:, :-1] > low) & (levels[:, 1:] <= high)
+        overlap = (levels[:, 1:] > low) & (levels[:, :-1] <= high)
+        sure = np.floor((inside * fractions).sum(axis=1) * self.sizes)
+        possible = np.ceil((overlap * fractions).sum(axis=1) * self.sizes)
+        return int(sure.sum()), int(np.minimum(possible, self.sizes).sum())
+
+    @instrument('archive_select')
+    def select(self, column, year, above=None, below=None):
+        """Indices of the paths with above < value <= below in `year`."""
+        low = -np.inf if above is None else above
+        high = np.inf if below is None else below
+        minimum, maximum = self._bounds(column, year)
+        selected = []
+        for chunk in np.flatnonzero((maximum > low) & (minimum <= high)):
+            if minimum[chunk] > low and maximum[chunk] <= high:
+                selected.append(np.arange(self.offsets[chunk], self.offsets[chunk + 1]))
+                continue
+            values = self._decode(column, self._row(chunk, column, year))
+            selected.append(self.offsets[chunk] + np.flatnonzero((values > low) & (values <= high)))
+        return np.concatenate(selected) if selected else np.empty(0, dtype=np.int64)
+
+    @instrument('archive_values')
+    def values(self, column, year, paths=None):
+        """Values of `column` in `year` for the given path indices (default: every path)."""
+        if paths is None:
+            paths = np.arange(self.n_paths)
+        chunks = np.searchsorted(self.offsets, paths, side='right') - 1
+        result = np.empty(len(paths))
+        for chunk in np.unique(chunks):
+            mask = chunks == chunk
+            raw = self._row(chunk, column, year)[paths[mask] - self.offsets[chunk]]
+            result[mask] = self._decode(column, raw)
+        return result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Query the Monte Carlo path archive, e.g. the 2029 debt ratio '
+                                                 'of the paths where the 2027 debt ratio exceeds 100%.')
+    parser.add_argument('--archive', default=MC_ARCHIVE_DIR, help='Archive directory.')
+    parser.add_argument('--column', default='Debt-to-GDP Ratio (%)', help='Column of the condition.')
+    parser.add_argument('--year', type=int, required=True, help='Year of the condition.')
+    parser.add_argument('--above', type=float, default=None, help='Keep paths above this value.')
+    parser.add_argument('--below', type=float, default=None, help='Keep paths at or below this value.')
+    parser.add_argument('--target-column', default=None, help='Column to report (default: the condition column).')
+    parser.add_argument('--target-year', type=int, required=True, help='Year to report.')
+    args = parser.parse_args()
+
+    archive = PathArchive(args.archive)
+    target_column = args.target_column or args.column
+    for column in (args.column, target_column):
+        if column not in archive.columns:
+            parser.error(f"unknown column '{column}'; the archive holds: {', '.join(archive.columns)}")
+
+    low, high = archive.estimate_count(args.column, args.year, args.above, args.below)
+    print(f"Checkpoint estimate: between {low:,} and {high:,} of {archive.n_paths:,} paths match.")
+    paths = archive.select(args.column, args.year, args.above, args.below)
+    print(f"{len(paths):,} paths match ({len(paths) / archive.n_paths:.1%}), "
+          f"reading {len(archive.chunks_read)} of {len(archive.sizes)} chunks.")
+    if len(paths):
+        values = archive.values(target_column, args.target_year, paths)
+        summary = pd.Series(np.percentile(values, [5, 25, 50, 75, 95]), index=['P5', 'P25', 'P50 (Median)', 'P75', 'P95'])
+        print(f"\n{target_column} in {args.target_year} on those paths (mean {values.mean():.2f}):")
+        print(summary.round(2).to_string())
@@ -0,0 +1,10 @@
+def load_pyplot():
+    """
+    Imports matplotlib (on the non-interactive Agg backend) and seaborn on demand,
+    so compute-only runs never pay for the plotting stack.
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    return plt, sns
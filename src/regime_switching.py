@@ -0,0 +1,136 @@
+import pandas as pd
+import numpy as np
+import argparse
+
+from instrumentation import instrument
+
+# File path for the analysis results
+analysis_file_path = 'data/processed/dsa_analysis_results.csv'
+
+# Years with a fall in nominal GDP (2009 and 2020) are the crisis regime
+CRISIS_GROWTH_THRESHOLD = 0.0
+# Pseudo-count added to each transition: two crises cannot pin down persistence alone
+TRANSITION_PRIOR = 1.0
+REGIME_NAMES = ['Normal', 'Crisis']
+
+
+def historical_regimes(df, last_history_year=2024):
+    """
+    The historical growth, implied interest rate and primary balance ratio series
+    ('gdp', 'ir', 'pb', as fractions) with each year's regime (True = crisis).
+    """
+    hist_df = df[df['Year'] <= last_history_year].set_index('Year')
+    series = pd.DataFrame({
+        'gdp': hist_df['Nominal GDP'].pct_change(),
+        'ir': hist_df['Debt Interest'] / hist_df['PSND'].shift(1),
+        'pb': hist_df['Primary Balance-to-GDP Ratio (%)'] / 100,
+    }).dropna()
+    series['crisis'] = series['gdp'] < CRISIS_GROWTH_THRESHOLD
+    return series
+
+
+@instrument('calibrate_regimes')
+def calibrate_regimes(df, last_history_year=2024, prior=TRANSITION_PRIOR):
+    """
+    Calibrates the two-regime model on the historical series: the transition
+    probabilities from the regime sequence (with `prior` pseudo-counts per transition),
+    each regime's shock std devs, and the crisis-regime shift of each variable's mean
+    relative to normal years. Normal-regime shocks have zero mean, so normal paths
+    stay centred on the baseline forecast.
+    """
+    series = historical_regimes(df, last_history_year)
+    crisis = series['crisis'].values
+    previous, current = crisis[:-1], crisis[1:]
+    p_normal_to_crisis = (np.sum(~previous & current) + prior) / (np.sum(~previous) + 2 * prior)
+    p_crisis_to_crisis = (np.sum(previous & current) + prior) / (np.sum(previous) + 2 * prior)
+
+    normal, stressed = series[~series['crisis']], series[series['crisis']]
+    params = {'p_normal_to_crisis': p_normal_to_crisis, 'p_crisis_to_crisis': p_crisis_to_crisis}
+    for key in ['gdp', 'ir', 'pb']:
+        params[f'{key}_std'] = [normal[key].std(), stressed[key].std()]
+        params[f'{key}_crisis_shift'] = stressed[key].mean() - normal[key].mean()
+    return params
+
+
+class RegimeSwitching:
+    """
+    Two-regime (normal/crisis) Markov-switching shocks to growth, the implied interest
+    rate and the primary balance.
+
+    Regime paths are simulated for all paths at once, one vectorized step per year;
+    every path starts from the normal regime in the jump-off year. Within a regime the
+    shocks are normal with that regime's std devs, and crisis years add the calibrated
+    shift to their means.
+    """
+
+    def __init__(self, params=None, df=None):
+        if params is None:
+            params = calibrate_regimes(pd.read_csv(analysis_file_path) if df is None else df)
+        self.params = params
+        self.transition = np.array([
+            [1 - params['p_normal_to_crisis'], params['p_normal_to_crisis']],
+            [1 - params['p_crisis_to_crisis'], params['p_crisis_to_crisis']],
+        ])
+
+    @property
+    def crisis_probability(self):
+        """Long-run share of crisis years (stationary distribution of the chain)."""
+        p, q = self.params['p_normal_to_crisis'], self.params['p_crisis_to_crisis']
+        return p / (1 - q + p)
+
+    @instrument('regime_paths')
+    def simulate_regimes(self, n_years, n_sims, rng):
+        """Crisis indicators for every (year, path), shape (n_years, n_sims)."""
+        uniforms = rng.random(size=(n_years, n_sims))
+        crisis = np.empty((n_years, n_sims), dtype=bool)
+        previous = np.zeros(n_sims, dtype=bool)
+        for i in range(n_years):
+            threshold = np.where(previous, self.params['p_crisis_to_crisis'], self.params['p_normal_to_crisis'])
+            crisis[i] = previous = uniforms[i] < threshold
+        return crisis
+
+    def shock_params(self, shock_params, crisis):
+        """shock_params with each std dev replaced by its regime's, per (year, path)."""
+        def by_regime(key):
+            normal_std, crisis_std = self.params[f'{key}_std']
+            return np.where(crisis, crisis_std, normal_std)
+
+        return dict(shock_params, gdp_growth_std=by_regime('gdp'), interest_rate_std=by_regime('ir'),
+                    primary_balance_std=by_regime('pb'))
+
+    def rate_innovations(self, innovations, crisis):
+        """
+        Standard normal rate innovations (as driving a term structure model) with the
+        crisis regime applied in units of the normal-regime std dev: crisis years are
+        scaled by the ratio of the regimes' std devs and shifted by the crisis mean
+        shift, so normal years keep the term structure's own calibration.
+        """
+        normal_std, crisis_std = self.params['ir_std']
+        scale = np.where(crisis, crisis_std / normal_std, 1.0)
+        return innovations * scale + crisis * (self.params['ir_crisis_shift'] / normal_std)
+
+    def shift(self, shocks, crisis):
+        """Adds the crisis-regime mean shifts, in place, to the shocks present in `shocks`."""
+        for key in ['gdp', 'ir', 'pb']:
+            if key in shocks:
+                shocks[key] += crisis * self.params[f'{key}_crisis_shift']
+        return shocks
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Calibrate the two-regime shock model and show its regime paths.')
+    parser.add_argument('--sims', type=int, default=10000, help='Number of simulated paths.')
+    parser.add_argument('--seed', type=int, default=None, help='Random seed for reproducible runs.')
+    args = parser.parse_args()
+
+    df = pd.read_csv(analysis_file_path)
+    series = historical_regimes(df)
+    print(f"Crisis years: {', '.join(str(year) for year in series.index[series['crisis']])}")
+    regimes = RegimeSwitching(df=df)
+    print(pd.DataFrame(regimes.transition, index=REGIME_NAMES, columns=REGIME_NAMES).round(3))
+    for key in ['gdp', 'ir', 'pb']:
+        print(f"{key}: std {[round(float(std), 4) for std in regimes.params[f'{key}_std']]}, "
+              f"crisis shift {regimes.params[f'{key}_crisis_shift']:+.4f}")
+    crisis = regimes.simulate_regimes(5, args.sims, np.random.default_rng(args.seed))
+    print(f"Simulated crisis share per year: {np.round(crisis.mean(axis=1), 3).tolist()} "
+          f"(long run {regimes.crisis_probability:.3f})")
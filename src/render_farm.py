@@ -0,0 +1,271 @@
+import pandas as pd
+import argparse
+import hashlib
+import importlib
+import inspect
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from atomic_io import atomic_write_json
+
+# File paths
+processed_data_dir = 'data/processed'
+plots_dir = 'plots'
+analysis_file_path = os.path.join(processed_data_dir, 'dsa_analysis_results.csv')
+full_analysis_file_path = os.path.join(processed_data_dir, 'dsa_full_analysis.csv')
+decomposition_file_path = os.path.join(processed_data_dir, 'debt_decomposition_results.csv')
+mc_percentiles_file_path = os.path.join(processed_data_dir, 'monte_carlo_percentiles.csv')
+mc_affordability_file_path = os.path.join(processed_data_dir, 'monte_carlo_affordability.csv')
+sobol_file_path = os.path.join(processed_data_dir, 'sobol_indices.csv')
+mc_decomposition_file_path = os.path.join(processed_data_dir, 'monte_carlo_decomposition_bands.csv')
+# Run settings saved next to the Monte Carlo outputs (number of paths for the titles)
+mc_run_file_path = os.path.join(processed_data_dir, 'monte_carlo_run.json')
+mc_decomposition_run_file_path = os.path.join(processed_data_dir, 'monte_carlo_decomposition_run.json')
+mc_regimes_file_path = os.path.join(processed_data_dir, 'monte_carlo_regimes.csv')
+backtest_coverage_file_path = os.path.join(processed_data_dir, 'backtest_coverage.csv')
+RENDER_MANIFEST_PATH = os.path.join(plots_dir, '.render_manifest.json')
+
+
+class FigureInputs:
+    """
+    Loads each pipeline output at most once and builds the arguments of every figure job.
+    """
+
+    def __init__(self):
+        self._cache = {}
+
+    def _csv(self, path, **kwargs):
+        if path not in self._cache:
+            self._cache[path] = pd.read_csv(path, **kwargs)
+        return self._cache[path]
+
+    def _n_sims(self, path):
+        if path not in self._cache:
+            with open(path) as handle:
+                self._cache[path] = json.load(handle)
+        return self._cache[path]['n_sims']
+
+    def fan_chart(self):
+        return (self._csv(analysis_file_path), self._csv(mc_percentiles_file_path, index_col=0),
+                self._n_sims(mc_run_file_path))
+
+    def regime_fan_chart(self):
+        return (self._csv(analysis_file_path), self._csv(mc_regimes_file_path, index_col=0),
+                self._n_sims(mc_run_file_path))
+
+    def affordability_fan_chart(self):
+        return (self._csv(mc_affordability_file_path, index_col=0), self._n_sims(mc_run_file_path))
+
+    def debt_decomposition(self):
+        return (self._csv(decomposition_file_path),)
+
+    def stochastic_decomposition(self):
+        return (self._csv(mc_decomposition_file_path), self._n_sims(mc_decomposition_run_file_path))
+
+    def stress_scenarios(self):
+        # The scenarios as run_stress_tests saved them (with its stock-flow settings),
+        # the same source as the report's stress table
+        import stress_tests
+        if stress_tests.stress_test_output_path not in self._cache:
+            self._cache[stress_tests.stress_test_output_path] = stress_tests.load_stress_results()
+        return self._cache[stress_tests.stress_test_output_path]
+
+    def debt_affordability(self):
+        return (self._csv(full_analysis_file_path),)
+
+    def revenue_composition(self):
+        import revenue_analysis
+        gdp_map = self._csv(full_analysis_file_path).set_index('Year')['Nominal GDP']
+        return (revenue_analysis.build_revenue_composition(gdp_map),)
+
+    def revenue_composition_gdp(self):
+        import revenue_composition
+        return (revenue_composition.build_revenue_composition(),)
+
+    def sobol_indices(self):
+        return (self._csv(sobol_file_path),)
+
+    def backtest_coverage(self):
+        return (self._csv(backtest_coverage_file_path),)
+
+    def debt_to_gdp(self):
+        return (self._csv(analysis_file_path),)
+
+    def primary_balance(self):
+        return (self._csv(analysis_file_path),)
+
+
+# --- Figure Jobs ---
+# Each job names the rendering function and the FigureInputs method building its arguments.
+FIGURE_JOBS = {
+    'fan_chart': {
+        'output': 'monte_carlo_fan_chart.png',
+        'module': 'monte_carlo_simulation',
+        'function': 'visualize_fan_chart',
+    },
+    'regime_fan_chart': {
+        'output': 'monte_carlo_regime_fan_chart.png',
+        'module': 'monte_carlo_simulation',
+        'function': 'visualize_regime_fan_chart',
+    },
+    'affordability_fan_chart': {
+        'output': 'monte_carlo_affordability_fan_chart.png',
+        'module': 'monte_carlo_simulation',
+        'function': 'visualize_affordability_fan_chart',
+    },
+    'debt_decomposition': {
+        'output': 'debt_decomposition.png',
+        'module': 'debt_decomposition',
+        'function': 'visualize_decomposition',
+    },
+    'stochastic_decomposition': {
+        'output': 'monte_carlo_debt_decomposition.png',
+        'module': 'debt_decomposition',
+        'function': 'visualize_stochastic_decomposition',
+    },
+    'stress_scenarios': {
+        'output': 'stress_test_scenarios.png',
+        'module': 'stress_tests',
+        'function': 'visualize_scenarios',
+    },
+    'debt_affordability': {
+        'output': 'debt_affordability_ratio.png',
+        'module': 'debt_affordability',
+        'function': 'visualize_affordability',
+    },
+    'revenue_composition': {
+        'output': 'revenue_composition_analysis.png',
+        'module': 'revenue_analysis',
+        'function': 'visualize_composition',
+    },
+    'revenue_composition_gdp': {
+        'output': 'revenue_composition.png',
+        'module': 'revenue_composition',
+        'function': 'visualize_composition',
+    },
+    'sobol_indices': {
+        'output': 'sobol_indices.png',
+        'module': 'sensitivity_analysis',
+        'function': 'visualize_sobol_indices',
+    },
+    'backtest_coverage': {
+        'output': 'backtest_coverage.png',
+        'module': 'backtest',
+        'function': 'visualize_backtest_coverage',
+    },
+    'debt_to_gdp': {
+        'output': 'debt_to_gdp_ratio.png',
+        'module': 'visualize_analysis',
+        'function': 'visualize_debt_ratio',
+    },
+    'primary_balance': {
+        'output': 'primary_balance_to_gdp_ratio.png',
+        'module': 'visualize_analysis',
+        'function': 'visualize_primary_balance',
+    },
+}
+
+
+def input_hash(job, args):
+    """
+    Hashes a job's input data together with the source of its rendering function,
+    so a figure is re-rendered when either its data or its styling changes.
+    """
+    sha = hashlib.sha256()
+    func = getattr(importlib.import_module(job['module']), job['function'])
+    sha.update(inspect.getsource(func).encode('utf-8'))
+    for arg in args:
+        if isinstance(arg, (pd.DataFrame, pd.Series)):
+            labels = list(arg.columns) if isinstance(arg, pd.DataFrame) else [arg.name]
+            sha.update(repr(labels).encode('utf-8'))
+            sha.update(pd.util.hash_pandas_object(arg, index=True).values.tobytes())
+        else:
+            sha.update(repr(arg).encode('utf-8'))
+    return sha.hexdigest()
+
+
+def _init_worker():
+    """Imports the plotting stack once per worker, on the Agg backend."""
+    from plotting import load_pyplot
+    load_pyplot()
+
+
+def _render(module, function, args):
+    """Renders one figure (runs in a worker process)."""
+    getattr(importlib.import_module(module), function)(*args)
+
+
+def load_manifest(manifest_path=RENDER_MANIFEST_PATH):
+    """Loads the input hashes of the last successful render of each figure."""
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path) as handle:
+        return json.load(handle)
+
+
+def render_all(job_names=None, force=False, max_workers=None, manifest_path=RENDER_MANIFEST_PATH):
+    """
+    Renders all figure jobs concurrently in a process pool, skipping any figure whose
+    input hash matches its last render. Returns a dict of job name -> status.
+    """
+    job_names = list(FIGURE_JOBS) if job_names is None else list(job_names)
+    manifest = load_manifest(manifest_path)
+    inputs = FigureInputs()
+    statuses = {}
+
+    # --- 1. Collect jobs and skip unchanged figures ---
+    pending = {}
+    for name in job_names:
+        job = FIGURE_JOBS[name]
+        try:
+            args = getattr(inputs, name)()
+        except Exception as e:
+            print(f"Skipping '{name}': could not load inputs ({e})")
+            statuses[name] = 'error'
+            continue
+
+        digest = input_hash(job, args)
+        output_path = os.path.join(plots_dir, job['output'])
+        if not force and manifest.get(name) == digest and os.path.exists(output_path):
+            statuses[name] = 'unchanged'
+            continue
+        pending[name] = (job, args, digest)
+
+    # --- 2. Render changed figures in parallel ---
+    if pending:
+        if not os.path.exists(plots_dir):
+            os.makedirs(plots_dir)
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker) as executor:
+            futures = {
+                executor.submit(_render, job['module'], job['function'], args): name
+                for name, (job, args, digest) in pending.items()
+            }
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    future.result()
+                    manifest[name] = pending[name][2]
+                    statuses[name] = 'rendered'
+                except Exception as e:
+                    print(f"An error occurred while rendering '{name}': {e}")
+                    manifest.pop(name, None)
+                    statuses[name] = 'error'
+
+        atomic_write_json(manifest, manifest_path)
+
+    for name in job_names:
+        print(f"{name}: {statuses[name]}")
+    return statuses
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Render all DSA figures, skipping unchanged ones.')
+    parser.add_argument('jobs', nargs='*', help=f"Figures to render (default: all of {', '.join(FIGURE_JOBS)}).")
+    parser.add_argument('--force', action='store_true', help='Re-render even if the inputs are unchanged.')
+    parser.add_argument('--workers', type=int, default=None, help='Number of worker processes.')
+    args = parser.parse_args()
+    unknown = [name for name in args.jobs if name not in FIGURE_JOBS]
+    if unknown:
+        parser.error(f"unknown figure(s): {', '.join(unknown)}")
+    render_all(args.jobs or None, force=args.force, max_workers=args.workers)
@@ -0,0 +1,352 @@
+import pandas as pd
+import argparse
+import hashlib
+import importlib
+import json
+import os
+import shutil
+import subprocess
+
+import render_farm
+import stress_tests
+from atomic_io import atomic_write_bytes, atomic_write_json
+from instrumentation import stage
+
+# File paths
+processed_data_dir = 'data/processed'
+plots_dir = 'plots'
+report_dir = 'report'
+REPORT_PATH = 'dsa_report.tex'
+analysis_file_path = os.path.join(processed_data_dir, 'dsa_analysis_results.csv')
+mc_percentiles_file_path = os.path.join(processed_data_dir, 'monte_carlo_percentiles.csv')
+stress_test_file_path = stress_tests.stress_test_output_path
+BUILD_MANIFEST_PATH = os.path.join(report_dir, '.build_manifest.json')
+
+FORECAST_YEARS = list(range(2025, 2030))
+# Gaps smaller than these (ppt) are reported as "about the same" in the generated wording
+STRESS_GAP_TOLERANCE = 0.1
+MEDIAN_GAP_TOLERANCE = 0.5
+
+
+def _read_json(path):
+    with open(path) as handle:
+        return json.load(handle)
+
+
+class TableInputs:
+    """
+    Loads each pipeline output at most once and builds the arguments of every table.
+    """
+
+    def __init__(self):
+        self._cache = {}
+
+    def _load(self, path, reader, **kwargs):
+        if path not in self._cache:
+            self._cache[path] = reader(path, **kwargs)
+        return self._cache[path]
+
+    def _analysis(self):
+        return self._load(analysis_file_path, pd.read_csv)
+
+    def _percentiles(self):
+        return self._load(mc_percentiles_file_path, pd.read_csv, index_col=0)
+
+    def _stress(self):
+        # The same saved scenarios as the stress figure (render_farm.FigureInputs), hashed
+        # by content: the workbook's own bytes change on every save
+        return self._load(stress_test_file_path, stress_tests.load_stress_results)
+
+    def baseline(self):
+        return (self._analysis(),)
+
+    def stress(self):
+        return self._stress()
+
+    def monte_carlo(self):
+        return (self._analysis(), self._percentiles())
+
+    def _mc_run(self):
+        return self._load(render_farm.mc_run_file_path, _read_json)
+
+    def numbers(self):
+        return (self._analysis(), self._percentiles()) + self._stress() + (self._mc_run()['n_sims'],)
+
+
+# --- Report Pieces ---
+# Figures are rendered by the render farm and included by a generated fragment; the
+# fragment is rewritten only when the figure's image changes.
+REPORT_FIGURES = {
+    'debt_to_gdp': {'caption': 'UK Debt-to-GDP Ratio (2008-2029)', 'label': 'fig:debt_gdp'},
+    'primary_balance': {'caption': 'UK Primary Balance-to-GDP Ratio (2008-2029)', 'label': 'fig:pb_ratio'},
+    'debt_decomposition': {'caption': 'Decomposition of Annual Change in UK Debt-to-GDP Ratio', 'label': 'fig:debt_decomp'},
+    'stress_scenarios': {'caption': 'Debt-to-GDP Ratio under Stress Test Scenarios', 'label': 'fig:stress_tests'},
+    'fan_chart': {'caption': 'Monte Carlo Simulation Fan Chart for Debt-to-GDP Ratio', 'label': 'fig:mc_fan'},
+}
+
+# Tables name the function writing them and the TableInputs method building its arguments.
+REPORT_TABLES = {
+    'baseline': {'output': 'tab_baseline.tex', 'module': 'report_builder', 'function': 'baseline_table'},
+    'stress': {'output': 'tab_stress.tex', 'module': 'report_builder', 'function': 'stress_table'},
+    'monte_carlo': {'output': 'tab_monte_carlo.tex', 'module': 'report_builder', 'function': 'monte_carlo_table'},
+    'numbers': {'output': 'numbers.tex', 'module': 'report_builder', 'function': 'key_numbers'},
+}
+
+
+def _tabular(df, caption, label, decimals=1):
+    """Formats a DataFrame as a booktabs table, the index as the first column."""
+    columns = [df.index.name or ''] + [str(column) for column in df.columns]
+    lines = [
+        r'\begin{table}[h!]',
+        r'    \centering',
+        f'    \\caption{{{caption}}}',
+        f'    \\label{{{label}}}',
+        f"    \\begin{{tabular}}{{l{'r' * len(df.columns)}}}",
+        r'        \toprule',
+        '        ' + ' & '.join(column.replace('%', r'\%') for column in columns) + r' \\',
+        r'        \midrule',
+    ]
+    for index, row in df.iterrows():
+        # Adding 0.0 turns a rounded -0.0 into 0.0
+        cells = [str(index)] + [f'{round(value, decimals) + 0.0:.{decimals}f}' if pd.notna(value) else '--'
+                                for value in row]
+        lines.append('        ' + ' & '.join(cells) + r' \\')
+    lines += [r'        \bottomrule', r'    \end{tabular}', r'\end{table}', '']
+    return '\n'.join(lines)
+
+
+def _debt_ratio(df, years=FORECAST_YEARS):
+    return df.set_index('Year').loc[years, 'Debt-to-GDP Ratio (%)']
+
+
+def baseline_table(analysis_df):
+    """The OBR baseline debt and primary balance ratios over the forecast."""
+    table = analysis_df.set_index('Year').loc[[2024] + FORECAST_YEARS,
+                                              ['Debt-to-GDP Ratio (%)', 'Primary Balance-to-GDP Ratio (%)']]
+    table.columns = ['Debt (% of GDP)', 'Primary Balance (% of GDP)']
+    return _tabular(table, 'Baseline Fiscal Outlook', 'tab:baseline')
+
+
+def stress_table(baseline_df, ir_shock_df, gdp_shock_df):
+    """Debt ratio of each stress scenario and the gap between the two shocks."""
+    table = pd.DataFrame({
+        'Baseline': _debt_ratio(baseline_df),
+        'Interest Rate Shock': _debt_ratio(ir_shock_df),
+        'GDP Growth Shock': _debt_ratio(gdp_shock_df),
+    })
+    table['Gap, GDP vs Rate Shock (ppt)'] = table['GDP Growth Shock'] - table['Interest Rate Shock']
+    return _tabular(table, 'Debt-to-GDP Ratio under Stress Test Scenarios (\\%)', 'tab:stress_tests')
+
+
+def monte_carlo_table(analysis_df, percentiles_df):
+    """Fan chart percentiles of the simulated debt ratio against the baseline."""
+    table = percentiles_df.loc[FORECAST_YEARS].copy()
+    table.insert(0, 'Baseline', _debt_ratio(analysis_df).values)
+    table.index.name = 'Year'
+    return _tabular(table, 'Monte Carlo Percentiles of the Debt-to-GDP Ratio (\\%)', 'tab:mc_percentiles')
+
+
+def stress_wording(gap):
+    """
+    Sentences comparing the two stress scenarios, from the end-year gap (GDP growth
+    shock less interest rate shock, ppt): (report text, abstract).
+    """
+    if abs(gap) < STRESS_GAP_TOLERANCE:
+        return ('The GDP growth and interest rate shocks have almost the same effect on the debt ratio: '
+                'the debt path is about as sensitive to a sustained 1 percentage point fall in nominal growth '
+                'as to a 1 percentage point rise in the effective interest rate.',
+                'The stress tests indicate that the UK\'s debt trajectory is about equally vulnerable to shocks '
+                'in nominal GDP growth and in interest rates.')
+    larger, smaller = ('GDP growth', 'interest rate') if gap > 0 else ('interest rate', 'GDP growth')
+    return (f'The {larger} shock has a larger, compounding effect on the debt ratio than the {smaller} shock: '
+            f'by the end of the forecast it leaves the debt ratio {abs(gap):.1f} percentage points higher.',
+            f'The stress tests indicate that the UK\'s debt trajectory is more vulnerable to shocks in '
+            f'{"nominal GDP growth" if gap > 0 else "interest rates"} than in '
+            f'{"interest rates" if gap > 0 else "nominal GDP growth"}.')
+
+
+def median_wording(gap):
+    """
+    Sentences comparing the Monte Carlo median with the baseline, from the end-year
+    gap (median less baseline, ppt): (bullet text, abstract, conclusion).
+    """
+    if gap >= MEDIAN_GAP_TOLERANCE:
+        return ('The median simulation path (50th percentile) ends above the OBR\'s baseline forecast. This '
+                'suggests that, when accounting for historical volatility, it is more likely than not that the '
+                'debt ratio will end up higher than the OBR\'s deterministic projection.',
+                'The median stochastic outcome projects a higher debt ratio than the OBR\'s baseline, '
+                'underscoring the importance of probabilistic analysis in assessing fiscal risks.',
+                'The median stochastic outcome is worse than the OBR\'s baseline, suggesting the official '
+                'forecast may be better viewed as a central scenario in a distribution with a long tail of '
+                'adverse possibilities.')
+    if gap <= -MEDIAN_GAP_TOLERANCE:
+        return ('The median simulation path (50th percentile) ends below the OBR\'s baseline forecast. The '
+                'shocks are centred on zero, so the gap mostly reflects the simulated debt recursion (which, '
+                'unlike the OBR forecast, has no stock-flow adjustment unless one is enabled) rather than a more '
+                'favourable outlook.',
+                'The median stochastic outcome ends below the OBR\'s baseline, largely because the simulated '
+                'debt recursion leaves out the stock-flow adjustment; the risks lie in the spread of outcomes '
+                'rather than in the central case.',
+                'The median stochastic outcome is no worse than the OBR\'s baseline; the risk lies in the '
+                'width and skew of the distribution, with a long tail of adverse possibilities.')
+    return ('The median simulation path (50th percentile) stays close to the OBR\'s baseline forecast, so the '
+            'risks lie in the spread of outcomes rather than in the central case.',
+            'The median stochastic outcome is close to the OBR\'s baseline; the risks lie in the spread of '
+            'outcomes, underscoring the importance of probabilistic analysis in assessing fiscal risks.',
+            'The median stochastic outcome is close to the OBR\'s baseline, but the distribution around it '
+            'has a long tail of adverse possibilities.')
+
+
+def key_numbers(analysis_df, percentiles_df, baseline_df, ir_shock_df, gdp_shock_df, n_sims):
+    """
+    LaTeX macros for the figures quoted in the report text, and the comparative
+    wording around them (see stress_wording and median_wording).
+    """
+    end = FORECAST_YEARS[-1]
+    stress_gap = (_debt_ratio(gdp_shock_df, [end]) - _debt_ratio(ir_shock_df, [end])).iloc[0]
+    median_gap = percentiles_df.loc[end, 'P50 (Median)'] - _debt_ratio(analysis_df, [end]).iloc[0]
+    stress_finding, stress_abstract = stress_wording(stress_gap)
+    median_finding, median_abstract, median_conclusion = median_wording(median_gap)
+    numbers = {
+        'ForecastEndYear': f'{end}',
+        'McSims': f'{n_sims:,}',
+        'BaselineDebtEnd': f"{_debt_ratio(analysis_df, [end]).iloc[0]:.1f}",
+        'McMedianEnd': f"{percentiles_df.loc[end, 'P50 (Median)']:.1f}",
+        'McPFiveEnd': f"{percentiles_df.loc[end, 'P5']:.1f}",
+        'McPNinetyFiveEnd': f"{percentiles_df.loc[end, 'P95']:.1f}",
+        'StressGapEnd': f"{round(stress_gap, 1) + 0.0:.1f}",
+        'StressFinding': stress_finding,
+        'StressAbstract': stress_abstract,
+        'McMedianFinding': median_finding,
+        'McMedianAbstract': median_abstract,
+        'McMedianConclusion': median_conclusion,
+    }
+    return '\n'.join(f'\\newcommand{{\\{name}}}{{{value}}}' for name, value in numbers.items()) + '\n'
+
+
+def figure_fragment(name):
+    """The figure environment including one rendered plot."""
+    figure = REPORT_FIGURES[name]
+    output = render_farm.FIGURE_JOBS[name]['output']
+    return '\n'.join([
+        r'\begin{figure}[h!]',
+        r'    \centering',
+        f'    \\includegraphics[width=\\textwidth]{{{plots_dir}/{output}}}',
+        f"    \\caption{{{figure['caption']}}}",
+        f"    \\label{{{figure['label']}}}",
+        r'\end{figure}',
+        '',
+    ])
+
+
+def _file_hash(path):
+    with open(path, 'rb') as handle:
+        return hashlib.sha256(handle.read()).hexdigest()
+
+
+def _write_piece(text, path):
+    atomic_write_bytes(text.encode('utf-8'), path)
+
+
+def compile_report(report_path=REPORT_PATH):
+    """
+    Compiles the report with latexmk (which reruns only as often as the aux files
+    need), or pdflatex twice. Returns False if no LaTeX compiler is installed.
+    """
+    if shutil.which('latexmk'):
+        commands = [['latexmk', '-pdf', '-interaction=nonstopmode', '-halt-on-error', report_path]]
+    elif shutil.which('pdflatex'):
+        commands = [['pdflatex', '-interaction=nonstopmode', '-halt-on-error', report_path]] * 2
+    else:
+        return False
+    for command in commands:
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+    return True
+
+
+def build_report(force=False, compile=True, max_workers=None, manifest_path=BUILD_MANIFEST_PATH):
+    """
+    Regenerates the report's figures, tables and quoted numbers from the pipeline
+    outputs. Each piece is hashed against its inputs and rebuilt only if they changed,
+    and the report is recompiled only if a piece or the report source changed.
+    Returns a dict of piece name -> status.
+    """
+    try:
+        manifest = {} if force else render_farm.load_manifest(manifest_path)
+        statuses = {}
+        if not os.path.exists(report_dir):
+            os.makedirs(report_dir)
+
+        # --- 1. Figures (the render farm skips unchanged plots) ---
+        with stage('report_figures'):
+            rendered = render_farm.render_all(list(REPORT_FIGURES), force=force, max_workers=max_workers)
+        for name in REPORT_FIGURES:
+            path = os.path.join(report_dir, f'fig_{name}.tex')
+            image = os.path.join(plots_dir, render_farm.FIGURE_JOBS[name]['output'])
+            if rendered[name] == 'error' or not os.path.exists(image):
+                statuses[f'fig_{name}'] = 'error'
+                continue
+            text = figure_fragment(name)
+            digest = hashlib.sha256((_file_hash(image) + text).encode('utf-8')).hexdigest()
+            if manifest.get(f'fig_{name}') == digest and os.path.exists(path):
+                statuses[f'fig_{name}'] = 'unchanged'
+                continue
+            _write_piece(text, path)
+            manifest[f'fig_{name}'] = digest
+            statuses[f'fig_{name}'] = 'rebuilt'
+
+        # --- 2. Tables and Quoted Numbers ---
+        inputs = TableInputs()
+        with stage('report_tables'):
+            for name, job in REPORT_TABLES.items():
+                path = os.path.join(report_dir, job['output'])
+                try:
+                    args = getattr(inputs, name)()
+                except Exception as e:
+                    print(f"An error occurred while loading the inputs of table '{name}': {e}")
+                    statuses[name] = 'error'
+                    continue
+                digest = render_farm.input_hash(job, args)
+                if manifest.get(name) == digest and os.path.exists(path):
+                    statuses[name] = 'unchanged'
+                    continue
+                _write_piece(getattr(importlib.import_module(job['module']), job['function'])(*args), path)
+                manifest[name] = digest
+                statuses[name] = 'rebuilt'
+        atomic_write_json(manifest, manifest_path)
+
+        # --- 3. Recompile if Anything Changed ---
+        document = hashlib.sha256(json.dumps(
+            {'source': _file_hash(REPORT_PATH), **{k: v for k, v in manifest.items() if k != 'document'}},
+            sort_keys=True).encode('utf-8')).hexdigest()
+        pdf_path = os.path.splitext(REPORT_PATH)[0] + '.pdf'
+        if not compile:
+            statuses['document'] = 'skipped'
+        elif manifest.get('document') == document and os.path.exists(pdf_path):
+            statuses['document'] = 'unchanged'
+        else:
+            with stage('report_compile'):
+                compiled = compile_report(REPORT_PATH)
+            if compiled:
+                manifest['document'] = document
+                statuses['document'] = 'rebuilt'
+            else:
+                print("No LaTeX compiler (latexmk or pdflatex) found; report sources are up to date but not compiled.")
+                statuses['document'] = 'skipped'
+            atomic_write_json(manifest, manifest_path)
+
+        for name, status in statuses.items():
+            print(f"{name}: {status}")
+        return statuses
+
+    except Exception as e:
+        print(f"An error occurred while building the report: {e}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Rebuild the report figures, tables and PDF whose inputs changed.')
+    parser.add_argument('--force', action='store_true', help='Rebuild every piece even if its inputs are unchanged.')
+    parser.add_argument('--no-compile', action='store_true', help='Regenerate the LaTeX sources only.')
+    parser.add_argument('--workers', type=int, default=None, help='Number of figure rendering processes.')
+    args = parser.parse_args()
+    build_report(force=args.force, compile=not args.no_compile, max_workers=args.workers)
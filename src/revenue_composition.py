@@ -1,34 +1,50 @@
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
+import argparse
 import os
 
+from plotting import load_pyplot
+from instrumentation import instrument, mark_failed
+from revenue_engine import load_receipts_history
+
 # Directory for plots and processed data
 plots_dir = 'plots'
 processed_data_dir = 'data/processed'
 
-def analyze_revenue_composition():
+# Column names of the historical public finances database
+HISTORY_NAMES = {
+    'Personal Taxes': 'Total personal taxes',
+    'Business Taxes': 'Total business taxes',
+    'Consumption Taxes': 'Total consumption taxes',
+    'Total Receipts': 'Public Sector Current Receipts',
+}
+
+@instrument('revenue_composition_gdp')
+def build_revenue_composition():
+    """
+    Builds the historical revenue composition DataFrame (% of GDP) from the
+    historical public finances database, as ingested by the revenue engine.
+    """
+    history = load_receipts_history()
+    columns = {f'{group} (% of GDP)': name for group, name in HISTORY_NAMES.items()}
+    df = history[['Year'] + list(columns)].rename(columns=columns)
+    
+    # Calculate 'Other Revenue' as the residual
+    df['Other Revenue'] = df['Public Sector Current Receipts'] - df['Total personal taxes'] - df['Total business taxes'] - df['Total consumption taxes']
+    return df
+
+def analyze_revenue_composition(render=True):
     """
     Analyzes and visualizes the composition of UK government revenue as a % of GDP.
+    With render=False only the numbers are produced and the plotting stack is never imported.
     """
     try:
         # --- 1. Create DataFrame from provided historical data ---
-        revenue_data = {
-            'Year': range(2008, 2024),
-            'Total personal taxes': [16.3, 15.9, 15.8, 15.6, 15.3, 15.1, 15.1, 15.2, 15.6, 15.5, 15.8, 15.6, 17.1, 17.4, 17.9],
-            'Total business taxes': [3.9, 4.0, 4.1, 4.1, 3.9, 3.8, 3.9, 3.8, 4.1, 4.0, 4.0, 3.6, 3.4, 4.1, 4.3],
-            'Total consumption taxes': [9.2, 9.4, 10.1, 10.7, 10.5, 10.6, 10.6, 10.6, 10.5, 10.4, 10.5, 10.2, 9.7, 10.4, 10.5],
-            'Public Sector Current Receipts': [35.9, 36.1, 37.0, 37.4, 36.9, 36.8, 36.8, 36.9, 37.4, 37.1, 37.4, 36.7, 38.1, 39.3, 40.3]
-        }
-        df = pd.DataFrame(revenue_data)
-        
-        # Calculate 'Other Revenue' as the residual
-        df['Other Revenue'] = df['Public Sector Current Receipts'] - df['Total personal taxes'] - df['Total business taxes'] - df['Total consumption taxes']
-        
+        df = build_revenue_composition()
         print("Successfully created revenue composition DataFrame.")
 
         # --- 2. Visualize the Composition ---
-        visualize_composition(df)
+        if render:
+            visualize_composition(df)
 
         # --- 3. Save the data ---
         output_path = os.path.join(processed_data_dir, 'revenue_composition_gdp.csv')
@@ -37,11 +53,15 @@ def analyze_revenue_composition():
 
     except Exception as e:
         print(f"An error occurred during revenue composition analysis: {e}")
+        mark_failed(e)
 
+@instrument('plot_render[revenue_composition_gdp]')
 def visualize_composition(df):
     """
     Generates a stacked area chart of revenue composition.
     """
+    plt, sns = load_pyplot()
+
     plt.figure(figsize=(14, 8))
     sns.set_theme(style="whitegrid")
     
@@ -68,4 +88,7 @@ def visualize_composition(df):
     plt.close()
 
 if __name__ == '__main__':
-    analyze_revenue_composition()
+    parser = argparse.ArgumentParser(description='Analyze historical revenue composition.')
+    parser.add_argument('--no-plots', action='store_true', help='Compute only; do not import matplotlib.')
+    args = parser.parse_args()
+    analyze_revenue_composition(render=not args.no_plots)
@@ -0,0 +1,280 @@
+import pandas as pd
+import numpy as np
+import argparse
+import functools
+import os
+import re
+
+from atomic_io import atomic_write_csv
+from instrumentation import instrument
+
+# --- Configuration ---
+DATA_PATH = 'data/raw'
+PROCESSED_PATH = 'data/processed'
+RECEIPTS_FILE = os.path.join(DATA_PATH, 'Receipts_Detailed_forecast_tables_March_2025.xlsx')
+RECEIPTS_SHEET = '3.9' # Current receipts (on a cash basis), £ billion
+HISTORY_FILE = os.path.join(DATA_PATH, 'Historical-public-finances-database.xlsx')
+HISTORY_SHEETS = {'£m': 'Receipts (£m)', '% of GDP': 'Receipts (per cent of GDP)'}
+RECEIPTS_BY_HEAD_PATH = os.path.join(PROCESSED_PATH, 'receipts_by_head.csv')
+RECEIPTS_HISTORY_PATH = os.path.join(PROCESSED_PATH, 'receipts_history.csv')
+
+FIRST_HISTORY_YEAR = 2008
+TOTAL_RECEIPTS_HEAD = 'Current receipts'
+GROUPS = ['Personal Taxes', 'Business Taxes', 'Consumption Taxes', 'Other Revenue']
+HISTORY_COLUMNS = {
+    'Total personal taxes': 'Personal Taxes',
+    'Total business taxes': 'Business Taxes',
+    'Total consumption taxes': 'Consumption Taxes',
+    'Public Sector Current Receipts': 'Total Receipts',
+}
+
+# Grouping of the table 3.9 tax heads, following the historical public finances database.
+# Heads not listed here are 'Other Revenue'.
+HEAD_GROUPS = {
+    'Income tax (gross of tax credits)': 'Personal Taxes',
+    'National insurance contributions': 'Personal Taxes',
+    'Capital gains tax': 'Personal Taxes',
+    'Inheritance tax': 'Personal Taxes',
+    'Corporation tax': 'Business Taxes',
+    'Petroleum revenue tax': 'Business Taxes',
+    'Business rates': 'Business Taxes',
+    'Bank levy': 'Business Taxes',
+    'Bank surcharge': 'Business Taxes',
+    'Digital services tax': 'Business Taxes',
+    'Diverted profits tax': 'Business Taxes',
+    'Apprenticeship levy': 'Business Taxes',
+    'Residential property developer tax': 'Business Taxes',
+    'Energy profits levy': 'Business Taxes',
+    'Electricity generators levy': 'Business Taxes',
+    'Value added tax': 'Consumption Taxes',
+    'Fuel duties': 'Consumption Taxes',
+    'Stamp duty land tax': 'Consumption Taxes',
+    'Annual tax on enveloped dwellings': 'Consumption Taxes',
+    'Stamp taxes on shares': 'Consumption Taxes',
+    'Tobacco duties': 'Consumption Taxes',
+    'Spirits duties': 'Consumption Taxes',
+    'Wine duties': 'Consumption Taxes',
+    'Beer and cider duties': 'Consumption Taxes',
+    'Air passenger duty': 'Consumption Taxes',
+    'Insurance premium tax': 'Consumption Taxes',
+    'Climate change levy': 'Consumption Taxes',
+    'Landfill tax': 'Consumption Taxes',
+    'Aggregates levy': 'Consumption Taxes',
+    'Betting and gaming duties': 'Consumption Taxes',
+    'Customs duties': 'Consumption Taxes',
+    'Soft drinks industry levy': 'Consumption Taxes',
+    'Plastic packaging tax': 'Consumption Taxes',
+    'Vaping tax': 'Consumption Taxes',
+    'Carbon border adjustment mechanism': 'Consumption Taxes',
+}
+
+# Elasticity of each head to nominal GDP relative to the OBR forecast. Progressive and
+# asset-based taxes respond more than one-for-one; per-unit duties, council tax, business
+# rates and non-tax receipts are largely set independently of current-year GDP.
+DEFAULT_ELASTICITY = 1.0
+GDP_ELASTICITIES = {
+    'Income tax (gross of tax credits)': 1.4,
+    'Capital gains tax': 1.5,
+    'Stamp duty land tax': 1.5,
+    'Corporation tax': 1.2,
+    'Fuel duties': 0.5,
+    'Tobacco duties': 0.5,
+    'Spirits duties': 0.5,
+    'Wine duties': 0.5,
+    'Beer and cider duties': 0.5,
+    'Air passenger duty': 0.5,
+    'Business rates': 0.0,
+    'Council tax': 0.0,
+    'VAT refunds': 0.0,
+    'Interest and dividends': 0.0,
+    'Gross operating surplus': 0.0,
+}
+
+
+def _clean_label(label):
+    """Strips footnote markers, e.g. 'Income tax (gross of tax credits)1'."""
+    return re.sub(r'\d+$', '', str(label)).strip()
+
+
+def _year(label):
+    """Maps a fiscal year label such as '2024-25' to its first calendar year."""
+    match = re.match(r'^(\d{4})-\d{2}', str(label))
+    return int(match.group(1)) if match else None
+
+
+def parse_receipts_table(sheet_df):
+    """
+    Parses table 3.9 into a long DataFrame of receipts (£m) by tax head and year.
+    Only top-level heads are kept ('of which' breakdowns and the Total HMRC subtotal
+    are dropped); the 'Current receipts' total is kept for reconciliation.
+    """
+    header_row = next(i for i, row in sheet_df.iterrows() if any(_year(cell) for cell in row))
+    year_columns = {j: _year(cell) for j, cell in sheet_df.iloc[header_row].items() if _year(cell)}
+
+    rows = []
+    for _, row in sheet_df.iloc[header_row + 1:].iterrows():
+        label = row.iloc[1]
+        if not isinstance(label, str) or label.strip() in ('', 'of which:'):
+            continue
+        head = _clean_label(label)
+        if head.startswith('Memo') or head.startswith('Note'):
+            break
+        if head == 'Total HMRC':
+            continue
+        for j, year in year_columns.items():
+            value = pd.to_numeric(row.iloc[j], errors='coerce')
+            if pd.notna(value):
+                rows.append({'Year': year, 'Head': head, 'Group': HEAD_GROUPS.get(head, 'Other Revenue'),
+                             'Receipts (£m)': round(value * 1000, 6)})
+    heads_df = pd.DataFrame(rows)
+    heads_df.loc[heads_df['Head'] == TOTAL_RECEIPTS_HEAD, 'Group'] = 'Total'
+    return heads_df
+
+
+def parse_history_sheet(sheet_df, unit, first_year=FIRST_HISTORY_YEAR):
+    """
+    Extracts the receipts group totals from a historical public finances database sheet.
+    """
+    header_row = next(i for i, row in sheet_df.iterrows() if 'Total personal taxes' in row.values)
+    columns = {j: HISTORY_COLUMNS[label] for j, label in sheet_df.iloc[header_row].items()
+               if label in HISTORY_COLUMNS}
+
+    history = sheet_df.iloc[header_row + 1:, [0] + list(columns)].copy()
+    history.columns = ['Year'] + [f'{name} ({unit})' for name in columns.values()]
+    history['Year'] = history['Year'].map(_year)
+    history = history.dropna(subset=['Year'])
+    history = history[history['Year'] >= first_year]
+    history = history.apply(pd.to_numeric, errors='coerce').round(6)
+    history['Year'] = history['Year'].astype(int)
+    return history.reset_index(drop=True)
+
+
+@instrument('receipts_ingest')
+def ingest_receipts():
+    """
+    Parses the receipts workbooks once and stores the results in data/processed.
+    Returns (receipts_by_head, receipts_history).
+    """
+    from robust_data_extraction import read_sheet
+
+    heads_df = parse_receipts_table(read_sheet(RECEIPTS_FILE, RECEIPTS_SHEET))
+
+    history_df = None
+    for unit, sheet in HISTORY_SHEETS.items():
+        # The database sheets are padded to the full Excel width; only the first columns hold data
+        sheet_df = pd.read_excel(HISTORY_FILE, sheet_name=sheet, header=None, usecols=range(30))
+        parsed = parse_history_sheet(sheet_df, unit)
+        history_df = parsed if history_df is None else history_df.merge(parsed, on='Year')
+
+    atomic_write_csv(heads_df, RECEIPTS_BY_HEAD_PATH, index=False)
+    atomic_write_csv(history_df, RECEIPTS_HISTORY_PATH, index=False)
+    print(f"Receipts by tax head saved to {RECEIPTS_BY_HEAD_PATH}")
+    print(f"Historical receipts saved to {RECEIPTS_HISTORY_PATH}")
+    return heads_df, history_df
+
+
+@functools.lru_cache(maxsize=8)
+def _read_csv_cached(path, mtime):
+    return pd.read_csv(path)
+
+
+def _load_processed(path):
+    """
+    Reads an ingested receipts file, ingesting the workbooks first if it does not exist
+    yet (run with --refresh after the workbooks change). Cached for the life of the process.
+    """
+    if not os.path.exists(path):
+        ingest_receipts()
+    return _read_csv_cached(path, os.path.getmtime(path)).copy()
+
+
+def load_receipts_by_head():
+    """Receipts (£m) by tax head and year from the latest EFO, in long format."""
+    return _load_processed(RECEIPTS_BY_HEAD_PATH)
+
+
+def load_receipts_history():
+    """Historical receipts group totals, in £m and as a % of GDP, by year."""
+    return _load_processed(RECEIPTS_HISTORY_PATH)
+
+
+def total_receipts():
+    """
+    Public sector current receipts (£m) by year: outturns from the historical database,
+    then the EFO outturn and forecast years.
+    """
+    history = load_receipts_history().set_index('Year')['Total Receipts (£m)']
+    heads_df = load_receipts_by_head()
+    forecast = heads_df[heads_df['Head'] == TOTAL_RECEIPTS_HEAD].set_index('Year')['Receipts (£m)']
+    return pd.concat([history[history.index < forecast.index.min()], forecast]).rename('Total Revenue')
+
+
+def receipts_by_group():
+    """EFO receipts (£m) summed into GROUPS, one row per year."""
+    heads_df = load_receipts_by_head()
+    heads_df = heads_df[heads_df['Group'] != 'Total']
+    grouped = heads_df.pivot_table(index='Year', columns='Group', values='Receipts (£m)', aggfunc='sum')
+    return grouped.reindex(columns=GROUPS, fill_value=0.0)
+
+
+class ReceiptsProjection:
+    """
+    Projects receipts off the EFO baseline as GDP deviates from its forecast.
+
+    Each head moves with (GDP / baseline GDP) ** elasticity. Heads sharing an
+    elasticity are summed in advance, so a projection costs one power per distinct
+    elasticity whatever the number of heads, and works on GDP arrays of any shape:
+    scenarios, Monte Carlo paths, or both.
+    """
+
+    def __init__(self, heads_df=None, elasticities=None):
+        heads_df = load_receipts_by_head() if heads_df is None else heads_df
+        heads_df = heads_df[heads_df['Group'] != 'Total'].copy()
+        elasticities = dict(GDP_ELASTICITIES, **(elasticities or {}))
+        heads_df['Elasticity'] = heads_df['Head'].map(elasticities).fillna(DEFAULT_ELASTICITY)
+        # (group, elasticity) blocks of baseline receipts by year
+        self.blocks = heads_df.pivot_table(index='Year', columns=['Group', 'Elasticity'],
+                                           values='Receipts (£m)', aggfunc='sum').fillna(0.0)
+        by_elasticity = self.blocks.T.groupby(level='Elasticity').sum().T
+        self._totals = {year: list(row.items()) for year, row in by_elasticity.iterrows()}
+        self.years = list(self.blocks.index)
+
+    def groups(self, year, gdp, baseline_gdp):
+        """
+        Receipts (£m) of each group in `year`, for nominal GDP `gdp` (any shape, £bn)
+        against the baseline forecast baseline_gdp. Returns {group: array}.
+        """
+        ratio = np.asarray(gdp, dtype=float) / baseline_gdp
+        powers = {}
+        result = {}
+        for (group, elasticity), base in self.blocks.loc[year].items():
+            if elasticity not in powers:
+                powers[elasticity] = 1.0 if elasticity == 0 else (ratio if elasticity == 1 else ratio ** elasticity)
+            result[group] = result.get(group, 0.0) + base * powers[elasticity]
+        return result
+
+    def total(self, year, gdp, baseline_gdp):
+        """Total receipts (£m) in `year`; same arguments as groups()."""
+        ratio = np.asarray(gdp, dtype=float) / baseline_gdp
+        total = 0.0
+        for elasticity, base in self._totals[year]:
+            total = total + base * (1.0 if elasticity == 0 else (ratio if elasticity == 1 else ratio ** elasticity))
+        return total + np.zeros_like(ratio)
+
+    def project(self, gdp, baseline_gdp, years):
+        """
+        Projects total receipts for GDP arrays with years on the first axis, e.g. the
+        (n_years, n_sims) Monte Carlo arrays. baseline_gdp holds one value per year.
+        """
+        gdp = np.asarray(gdp, dtype=float)
+        return np.stack([self.total(year, gdp[i], baseline_gdp[i]) for i, year in enumerate(years)])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Ingest receipts by tax head and show the projection baseline.')
+    parser.add_argument('--refresh', action='store_true', help='Re-parse the receipts workbooks.')
+    args = parser.parse_args()
+    if args.refresh:
+        ingest_receipts()
+    print(receipts_by_group().round(1).to_string())
+    print(total_receipts().round(1).to_string())
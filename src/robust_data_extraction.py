@@ -1,48 +1,67 @@
 import pandas as pd
+import argparse
+import functools
 import os
 import logging
 
+from vintage_store import DEFAULT_VINTAGE, append_vintage
+from instrumentation import instrument, stage
+
 # --- Configuration ---
 LOG_LEVEL = logging.INFO
 DATA_PATH = 'data/raw'
 PROCESSED_PATH = 'data/processed'
 OUTPUT_FILE = os.path.join(PROCESSED_PATH, 'obr_data.csv')
 
-# --- File and Sheet Mapping ---
-FILE_CONFIG = {
-    'gdp': {
-        'file': 'Economy_Detailed_forecast_tables_March_2025.xlsx',
-        'sheet': '1.2',
-        'header_keyword': 'GDP at market prices',
-        'column_index': 14,
-        'data_column_name': 'Nominal GDP'
-    },
-    'debt': {
-        'file': 'Aggregates_Detailed_forecast_tables_March_2025.xlsx',
-        'sheet': '6.2',
-        'header_keyword': 'Public sector net debt',
-        'column_index': 1, 
-        'data_column_name': 'PSND'
-    },
-    'borrowing': {
-        'file': 'Aggregates_Detailed_forecast_tables_March_2025.xlsx',
-        'sheet': '6.2',
-        'header_keyword': 'Public sector net borrowing',
-        'column_index': 1, 
-        'data_column_name': 'PSNB'
-    },
-    'interest': {
-        'file': 'Debt_interest_Detailed_forecast_tables_March_2025.xlsx',
-        'sheet': '3.9',
-        'header_keyword': 'Total public service pensions expenditure',
-        'column_index': 1, 
-        'data_column_name': 'Debt Interest'
+# --- File and Sheet Mapping (one entry per forecast vintage) ---
+VINTAGE_FILE_CONFIG = {
+    'efo_march_2025': {
+        'gdp': {
+            'file': 'Economy_Detailed_forecast_tables_March_2025.xlsx',
+            'sheet': '1.2',
+            'header_keyword': 'GDP at market prices',
+            'column_index': 14,
+            'data_column_name': 'Nominal GDP'
+        },
+        'debt': {
+            'file': 'Aggregates_Detailed_forecast_tables_March_2025.xlsx',
+            'sheet': '6.2',
+            'header_keyword': 'Public sector net debt',
+            'column_index': 1, 
+            'data_column_name': 'PSND'
+        },
+        'borrowing': {
+            'file': 'Aggregates_Detailed_forecast_tables_March_2025.xlsx',
+            'sheet': '6.2',
+            'header_keyword': 'Public sector net borrowing',
+            'column_index': 1, 
+            'data_column_name': 'PSNB'
+        },
+        'interest': {
+            'file': 'Debt_interest_Detailed_forecast_tables_March_2025.xlsx',
+            'sheet': '3.9',
+            'header_keyword': 'Total public service pensions expenditure',
+            'column_index': 1, 
+            'data_column_name': 'Debt Interest'
+        }
     }
 }
+FILE_CONFIG = VINTAGE_FILE_CONFIG[DEFAULT_VINTAGE]
 
 # --- Setup Logging ---
 logging.basicConfig(level=LOG_LEVEL, format='%(asctime)s - %(levelname)s - %(message)s')
 
+@functools.lru_cache(maxsize=32)
+def _read_sheet_cached(file_path, sheet, mtime):
+    return pd.read_excel(file_path, sheet_name=sheet, header=None)
+
+def read_sheet(file_path, sheet):
+    """
+    Reads a worksheet without headers. Parsed sheets are cached for the life of the
+    process (keyed on modification time), so series sharing a sheet parse it once.
+    """
+    return _read_sheet_cached(file_path, sheet, os.path.getmtime(file_path))
+
 def find_header_row(df, keyword):
     """Finds the row number containing the keyword."""
     for i, row in df.iterrows():
@@ -51,20 +70,24 @@ def find_header_row(df, keyword):
                 return i
     return None
 
-def extract_series(data_key):
+@instrument('extract_series')
+def extract_series(data_key, file_config=None):
     """Extracts a single data series based on the configuration."""
-    config = FILE_CONFIG[data_key]
+    config = (file_config or FILE_CONFIG)[data_key]
     file_path = os.path.join(DATA_PATH, config['file'])
     
     logging.info(f"Extracting '{config['data_column_name']}' from {config['file']}/{config['sheet']}")
     
     try:
-        df = pd.read_excel(file_path, sheet_name=config['sheet'], header=None)
+        with stage('workbook_parse') as parse_stage:
+            df = read_sheet(file_path, config['sheet'])
+            parse_stage.rows = len(df)
     except FileNotFoundError:
         logging.error(f"File not found: {file_path}")
         return None
 
-    header_row = find_header_row(df, config['header_keyword'])
+    with stage('header_search', rows=len(df)):
+        header_row = find_header_row(df, config['header_keyword'])
     if header_row is None:
         logging.error(f"Keyword '{config['header_keyword']}' not found in {config['sheet']}.")
         return None
@@ -89,29 +112,41 @@ def extract_series(data_key):
     logging.info(f"Successfully extracted and cleaned '{config['data_column_name']}'.")
     return series_df
 
-def main():
-    """Main function to extract, clean, and merge all data."""
+def main(vintage=DEFAULT_VINTAGE, store=False):
+    """
+    Main function to extract, clean, and merge all data for a forecast vintage.
+    With store=True the result is also added to the vintage store as a new partition.
+    """
     if not os.path.exists(PROCESSED_PATH):
         os.makedirs(PROCESSED_PATH)
+    file_config = VINTAGE_FILE_CONFIG[vintage]
 
     # Extract all data series
-    gdp_df = extract_series('gdp')
-    debt_df = extract_series('debt')
-    borrowing_df = extract_series('borrowing')
-    interest_df = extract_series('interest')
+    gdp_df = extract_series('gdp', file_config)
+    debt_df = extract_series('debt', file_config)
+    borrowing_df = extract_series('borrowing', file_config)
+    interest_df = extract_series('interest', file_config)
 
     # Merge the dataframes
     final_df = pd.concat([gdp_df, debt_df, borrowing_df, interest_df], axis=1)
     final_df.reset_index(inplace=True)
 
-    # Save the final dataframe
-    final_df.to_csv(OUTPUT_FILE, index=False)
-    logging.info(f"All data has been merged and saved to {OUTPUT_FILE}")
+    # Save the final dataframe (obr_data.csv always holds the default vintage)
+    if vintage == DEFAULT_VINTAGE:
+        final_df.to_csv(OUTPUT_FILE, index=False)
+        logging.info(f"All data has been merged and saved to {OUTPUT_FILE}")
     print("\n--- Final Data Preview ---")
     print(final_df.head())
     print("\n--- Data Info ---")
     final_df.info()
 
+    if store:
+        append_vintage(vintage, final_df, source='robust_data_extraction')
+
 
 if __name__ == '__main__':
-    main()
+    parser = argparse.ArgumentParser(description='Extract OBR series for a forecast vintage.')
+    parser.add_argument('--vintage', default=DEFAULT_VINTAGE, choices=sorted(VINTAGE_FILE_CONFIG))
+    parser.add_argument('--store', action='store_true', help='Also add the vintage to the vintage store.')
+    args = parser.parse_args()
+    main(vintage=args.vintage, store=args.store)
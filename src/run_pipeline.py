@@ -0,0 +1,80 @@
+import argparse
+import os
+
+import instrumentation
+from instrumentation import mark_failed, stage
+
+# Output paths for the instrumentation report and profiler dumps
+processed_data_dir = 'data/processed'
+METRICS_PATH = os.path.join(processed_data_dir, 'pipeline_metrics.json')
+PROFILE_PATHS = {
+    'cprofile': os.path.join(processed_data_dir, 'pipeline_profile.prof'),
+    'pyinstrument': os.path.join(processed_data_dir, 'pipeline_profile.html'),
+}
+
+# render_farm figure jobs of the pipeline's stages
+PIPELINE_FIGURES = [
+    'fan_chart', 'affordability_fan_chart', 'stress_scenarios', 'debt_decomposition', 'stochastic_decomposition',
+    'debt_affordability', 'revenue_composition', 'revenue_composition_gdp', 'debt_to_gdp', 'primary_balance',
+]
+
+
+def run_pipeline(render=True, vintage=None, n_sims=10000, seed=None):
+    """
+    Runs every DSA stage in order, recording each one as an instrumented stage.
+    The stages only compute; with render=True their figures are then rendered in one
+    render_farm pass (in parallel, skipping figures whose inputs are unchanged).
+    """
+    import dsa_analysis
+    import monte_carlo_simulation
+    import stress_tests
+    import debt_decomposition
+    import debt_affordability
+    import fiscal_solver
+    import revenue_analysis
+    import revenue_composition
+
+    stages = [
+        ('dsa_analysis', lambda: dsa_analysis.run_analysis(vintage=vintage)),
+        ('monte_carlo', lambda: monte_carlo_simulation.run_monte_carlo_simulation(n_sims=n_sims, seed=seed, render=False)),
+        ('stress_tests', lambda: stress_tests.run_stress_tests(render=False)),
+        ('debt_decomposition', lambda: debt_decomposition.run_debt_decomposition(render=False)),
+        ('stochastic_decomposition', lambda: debt_decomposition.run_stochastic_decomposition(n_sims=n_sims, seed=seed, render=False)),
+        ('fiscal_solver', lambda: fiscal_solver.run_fiscal_solver(n_sims=n_sims, seed=seed)),
+        ('debt_affordability', lambda: debt_affordability.run_affordability_analysis(render=False)),
+        ('revenue_analysis', lambda: revenue_analysis.run_revenue_analysis(render=False)),
+        ('revenue_composition', lambda: revenue_composition.analyze_revenue_composition(render=False)),
+    ]
+    if render:
+        stages.append(('render_figures', render_figures))
+
+    for name, run in stages:
+        with stage(name):
+            run()
+
+
+def render_figures():
+    """Renders the pipeline's figures in one render_farm pass, failing the stage if any figure fails."""
+    import render_farm
+
+    statuses = render_farm.render_all(PIPELINE_FIGURES)
+    failed = [name for name, status in statuses.items() if status == 'error']
+    if failed:
+        mark_failed(RuntimeError(f"could not render {', '.join(failed)}"))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run the full DSA pipeline with per-stage instrumentation.')
+    parser.add_argument('--no-plots', action='store_true', help='Compute only; do not import matplotlib.')
+    parser.add_argument('--vintage', help='Forecast vintage from the vintage store (default: obr_data.csv).')
+    parser.add_argument('--sims', type=int, default=10000, help='Number of Monte Carlo paths.')
+    parser.add_argument('--seed', type=int, default=None, help='Random seed for the Monte Carlo simulation.')
+    parser.add_argument('--metrics', default=METRICS_PATH, help='Where to write the JSON stage report.')
+    parser.add_argument('--profile', nargs='?', const='cprofile', choices=sorted(PROFILE_PATHS),
+                        help='Also write a profiler dump (default profiler: cprofile).')
+    args = parser.parse_args()
+
+    profile_path = PROFILE_PATHS.get(args.profile)
+    with instrumentation.collect() as collected, instrumentation.profiled(args.profile, profile_path):
+        run_pipeline(render=not args.no_plots, vintage=args.vintage, n_sims=args.sims, seed=args.seed)
+    instrumentation.emit_json(collected, args.metrics)
@@ -0,0 +1,259 @@
+import pandas as pd
+import numpy as np
+import argparse
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import monte_carlo_simulation
+import stress_tests
+from stock_flow import SFA_CENTRES, SFA_ITEMS, StockFlow
+
+# --- Configuration ---
+analysis_file_path = 'data/processed/dsa_analysis_results.csv'
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+CACHE_SIZE = 1024
+
+# Monte Carlo queries are capped so that each answer fits in the latency budget
+MC_DEFAULT_SIMS = 10000
+MC_MAX_SIMS = 200000
+MC_LATENCY_BUDGET_MS = 250.0
+
+SCENARIO_PARAMS = {
+    'ir_shock': 0.0,
+    'growth_shock': 0.0,
+    'pb_shock': 0.0,
+    'start_year': 2025,
+    'fiscal_sensitivity': stress_tests.FISCAL_SENSITIVITY,
+}
+
+
+class RequestMetrics:
+    """
+    Keeps request counts and recent latencies per endpoint.
+    """
+
+    def __init__(self, window=1000):
+        self._lock = threading.Lock()
+        self._window = window
+        self._latencies = {}
+        self._counts = {}
+
+    def record(self, endpoint, elapsed_ms, status):
+        with self._lock:
+            self._latencies.setdefault(endpoint, deque(maxlen=self._window)).append(elapsed_ms)
+            counts = self._counts.setdefault(endpoint, {'requests': 0, 'errors': 0, 'cache_hits': 0})
+            counts['requests'] += 1
+            if status == 'error':
+                counts['errors'] += 1
+            elif status == 'cached':
+                counts['cache_hits'] += 1
+
+    def snapshot(self):
+        with self._lock:
+            summary = {}
+            for endpoint, latencies in self._latencies.items():
+                values = np.asarray(latencies)
+                summary[endpoint] = dict(self._counts[endpoint],
+                                         mean_ms=float(values.mean()),
+                                         p50_ms=float(np.percentile(values, 50)),
+                                         p95_ms=float(np.percentile(values, 95)),
+                                         max_ms=float(values.max()))
+            return summary
+
+
+class ScenarioService:
+    """
+    Holds the baseline dataset, calibrated shock parameters and a result cache in memory
+    and answers deterministic and Monte Carlo scenario queries.
+    stock_flow ('baseline' or 'historical') keeps a stock-flow adjustment centred there,
+    plus the deterministic sfa_items, in every query's debt recursion (stock_flow.StockFlow).
+    """
+
+    def __init__(self, baseline_df, cache_size=CACHE_SIZE, mc_budget_ms=MC_LATENCY_BUDGET_MS,
+                 stock_flow=None, sfa_items=()):
+        self.baseline_df = baseline_df
+        self.shock_params = monte_carlo_simulation.calibrate_shocks(baseline_df)
+        self.stock_flow = None if stock_flow is None else StockFlow(df=baseline_df, centre=stock_flow, items=sfa_items)
+        self.mc_budget_ms = mc_budget_ms
+        self.metrics = RequestMetrics()
+        self._cache = OrderedDict()
+        self._cache_size = cache_size
+        self._lock = threading.Lock()
+        self.ms_per_path = self._calibrate_mc_cost()
+
+    @classmethod
+    def from_file(cls, path=analysis_file_path, **kwargs):
+        return cls(pd.read_csv(path), **kwargs)
+
+    def _calibrate_mc_cost(self, n_sims=20000):
+        """Times a warm-up simulation to estimate the cost per Monte Carlo path."""
+        start = time.perf_counter()
+        self._simulate(self.baseline_df, n_sims, seed=0)
+        return (time.perf_counter() - start) * 1000 / n_sims
+
+    def _cached(self, key, compute):
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key], True
+        result = compute()
+        with self._lock:
+            self._cache[key] = result
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return result, False
+
+    @staticmethod
+    def _scenario_params(query):
+        unknown = set(query) - set(SCENARIO_PARAMS) - {'n_sims', 'seed'}
+        if unknown:
+            raise ValueError(f"Unknown parameter(s): {sorted(unknown)}")
+        params = {name: type(default)(query.get(name, default)) for name, default in SCENARIO_PARAMS.items()}
+        return params
+
+    def _simulate(self, scenario_df, n_sims, seed):
+        rng = np.random.default_rng(seed)
+        forecast_years = monte_carlo_simulation.FORECAST_YEARS
+        shocks = monte_carlo_simulation.draw_shocks(self.shock_params, len(forecast_years), n_sims, rng,
+                                                    stock_flow=self.stock_flow)
+        paths = monte_carlo_simulation.simulate_paths(scenario_df, shocks, forecast_years, stock_flow=self.stock_flow)
+        return monte_carlo_simulation.summarize_percentiles(paths['Debt-to-GDP Ratio (%)'], forecast_years)
+
+    def deterministic(self, query):
+        """Projects one deterministic scenario, with the zero-shock projection as its baseline."""
+        params = self._scenario_params(query)
+        key = ('deterministic', tuple(sorted(params.items())))
+
+        def compute():
+            # The baseline is the zero-shock projection (scenario 0) through the same
+            # recursion, so the gap to it is the effect of the shocks alone
+            shocks = {name: [0.0, params[name]] for name in ('ir_shock', 'growth_shock', 'pb_shock')}
+            results = stress_tests.project_scenarios(self.baseline_df, start_year=params['start_year'],
+                                                     fiscal_sensitivity=params['fiscal_sensitivity'],
+                                                     stock_flow=self.stock_flow, **shocks)
+            return {
+                'params': params,
+                'years': results['Year'].tolist(),
+                'debt_to_gdp': results['Debt-to-GDP Ratio (%)'][1].round(4).tolist(),
+                'baseline_debt_to_gdp': results['Debt-to-GDP Ratio (%)'][0].round(4).tolist(),
+                'debt_interest': results['Debt Interest'][1].round(1).tolist(),
+            }
+
+        return self._cached(key, compute)
+
+    def monte_carlo(self, query):
+        """
+        Runs a Monte Carlo simulation around a deterministic scenario. The number of paths
+        is reduced if needed so the run fits the latency budget.
+        """
+        params = self._scenario_params(query)
+        requested = min(int(query.get('n_sims', MC_DEFAULT_SIMS)), MC_MAX_SIMS)
+        affordable = max(1000, int(self.mc_budget_ms / self.ms_per_path))
+        n_sims = min(requested, affordable)
+        seed = int(query.get('seed', 0))
+        key = ('monte_carlo', tuple(sorted(params.items())), n_sims, seed)
+
+        def compute():
+            scenario_df = stress_tests.scenario_frame(self.baseline_df, stock_flow=self.stock_flow, **params)
+            percentile_df = self._simulate(scenario_df, n_sims, seed)
+            return {
+                'params': params,
+                'n_sims': n_sims,
+                'n_sims_requested': requested,
+                'seed': seed,
+                'years': [int(year) for year in percentile_df.index],
+                'percentiles': {col: percentile_df[col].round(4).tolist() for col in percentile_df.columns},
+            }
+
+        return self._cached(key, compute)
+
+
+def make_handler(service):
+    """Builds a request handler class bound to a ScenarioService."""
+
+    class ScenarioRequestHandler(BaseHTTPRequestHandler):
+        routes = {
+            ('GET', '/health'): lambda query: ({'status': 'ok'}, False),
+            ('GET', '/metrics'): lambda query: (service.metrics.snapshot(), False),
+            ('GET', '/params'): lambda query: ({k: float(v) for k, v in service.shock_params.items()}, False),
+            ('POST', '/scenario'): service.deterministic,
+            ('POST', '/monte-carlo'): service.monte_carlo,
+        }
+
+        def _handle(self, method):
+            start = time.perf_counter()
+            status = 'ok'
+            route = self.routes.get((method, self.path.split('?')[0]))
+            try:
+                if route is None:
+                    code, body = 404, {'error': f"No route for {method} {self.path}"}
+                    status = 'error'
+                else:
+                    length = int(self.headers.get('Content-Length') or 0)
+                    query = json.loads(self.rfile.read(length) or b'{}') if method == 'POST' else {}
+                    result, cached = route(query)
+                    status = 'cached' if cached else 'ok'
+                    code, body = 200, dict(result, cached=cached) if method == 'POST' else result
+            except (ValueError, TypeError, KeyError) as e:
+                code, body, status = 400, {'error': str(e)}, 'error'
+            except Exception as e:
+                code, body, status = 500, {'error': f"An error occurred: {e}"}, 'error'
+
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            if method == 'POST':
+                body['elapsed_ms'] = round(elapsed_ms, 3)
+            service.metrics.record(self.path.split('?')[0] if route else 'unknown', elapsed_ms, status)
+
+            payload = json.dumps(body).encode('utf-8')
+            self.send_response(code)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            self._handle('GET')
+
+        def do_POST(self):
+            self._handle('POST')
+
+        def log_message(self, format, *args):
+            # Timings are reported through /metrics instead of per-request log lines
+            pass
+
+    return ScenarioRequestHandler
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, mc_budget_ms=MC_LATENCY_BUDGET_MS, stock_flow=None, sfa_items=()):
+    """Starts the scenario service and blocks until interrupted."""
+    service = ScenarioService.from_file(mc_budget_ms=mc_budget_ms, stock_flow=stock_flow, sfa_items=sfa_items)
+    print(f"Loaded baseline and calibrated shocks ({service.ms_per_path * 1000:.2f} us per Monte Carlo path).")
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    print(f"Scenario service listening on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Shutting down scenario service.")
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local HTTP/JSON service for DSA scenario queries.')
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--mc-budget-ms', type=float, default=MC_LATENCY_BUDGET_MS,
+                        help='Latency budget for Monte Carlo queries in milliseconds.')
+    parser.add_argument('--stock-flow', choices=SFA_CENTRES, default=None,
+                        help='Keep a stock-flow adjustment in the debt recursion, centred on the baseline '
+                             "forecast's or the historical mean (see stock_flow.py).")
+    parser.add_argument('--sfa-items', nargs='*', choices=list(SFA_ITEMS), default=(),
+                        help='Deterministic stock-flow items to add (requires --stock-flow).')
+    args = parser.parse_args()
+    if args.sfa_items and args.stock_flow is None:
+        parser.error('--sfa-items requires --stock-flow')
+    serve(args.host, args.port, args.mc_budget_ms, args.stock_flow, args.sfa_items)
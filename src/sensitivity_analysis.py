@@ -0,0 +1,241 @@
+import pandas as pd
+import numpy as np
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import monte_carlo_simulation as mc
+from stress_tests import FISCAL_SENSITIVITY
+from checkpoint import data_hash, resume, save_checkpoint
+from plotting import load_pyplot
+from instrumentation import instrument, stage, mark_failed
+
+# File paths
+analysis_file_path = 'data/processed/dsa_analysis_results.csv'
+sobol_output_path = 'data/processed/sobol_indices.csv'
+SOBOL_CHECKPOINT_PATH = 'data/processed/sobol_checkpoint.npz'
+plots_dir = 'plots'
+
+CHUNK_SIZE = 50_000 # model evaluations per worker task
+N_BOOTSTRAP = 200
+
+# Groups of per-year shock innovations, each treated as a single factor
+SHOCK_FACTORS = {'gdp_shocks': 'gdp', 'ir_shocks': 'ir', 'pb_shocks': 'pb'}
+
+
+def factor_ranges(shock_params):
+    """
+    Uniform ranges of the model parameters: shock std devs within +/-50% of their
+    historical calibration, pairwise shock correlations in [-0.5, 0.5] and the fiscal
+    sensitivity between zero and twice the stress test value.
+    """
+    ranges = {key: (0.5 * shock_params[key], 1.5 * shock_params[key])
+              for key in ['gdp_growth_std', 'interest_rate_std', 'primary_balance_std']}
+    ranges.update({key: (-0.5, 0.5) for key in mc.SHOCK_CORR_KEYS})
+    ranges['fiscal_sensitivity'] = (0.0, 2 * FISCAL_SENSITIVITY)
+    return ranges
+
+
+def sample_factors(ranges, n_years, n, rng):
+    """
+    Draws one Saltelli base matrix: uniform parameters of shape (n,) and standard
+    normal shock innovations of shape (n_years, n).
+    """
+    sample = {name: rng.uniform(low, high, n) for name, (low, high) in ranges.items()}
+    sample.update({name: rng.standard_normal((n_years, n)) for name in SHOCK_FACTORS})
+    return sample
+
+
+def saltelli_design(A, B, factors):
+    """
+    Stacks A, B and every A_B^i (A with factor i taken from B) along the path axis,
+    so the whole design is evaluated as one batch of N * (k + 2) model runs.
+    """
+    blocks = [A, B] + [dict(A, **{factor: B[factor]}) for factor in factors]
+    return {name: np.concatenate([block[name] for block in blocks], axis=-1) for name in A}
+
+
+def evaluate_model(df, design, horizon_year):
+    """
+    Debt-to-GDP ratio (%) in horizon_year for every row of the design. Each row is one
+    path with its own shock std devs, correlations and fiscal sensitivity.
+    """
+    innovations = {key: design[name] for name, key in SHOCK_FACTORS.items()}
+    shocks = mc.correlate_shocks(innovations, design)
+    paths = mc.simulate_paths(df, shocks, fiscal_sensitivity=design['fiscal_sensitivity'])
+    return paths['Debt-to-GDP Ratio (%)'][list(mc.FORECAST_YEARS).index(horizon_year)]
+
+
+def _evaluate_chunk(df, chunk, horizon_year):
+    """Evaluates one slice of the design (runs in a worker process)."""
+    return evaluate_model(df, chunk, horizon_year)
+
+
+def _chunks(design, chunk_size):
+    n_rows = next(iter(design.values())).shape[-1]
+    for start in range(0, n_rows, chunk_size):
+        yield {name: values[..., start:start + chunk_size] for name, values in design.items()}
+
+
+@instrument('sobol_evaluate')
+def evaluate_design(df, design, horizon_year, max_workers=None, chunk_size=CHUNK_SIZE, resume_from=None,
+                    on_progress=None):
+    """
+    Evaluates the design in vectorized chunks, in parallel across processes.
+    max_workers=1 evaluates in this process.
+
+    resume_from is the (y, done) pair of a checkpoint: chunks marked done are not
+    evaluated again. on_progress(y, done) is called after every completed chunk.
+    """
+    chunks = list(_chunks(design, chunk_size))
+    n_rows = next(iter(design.values())).shape[-1]
+    y, done = resume_from if resume_from is not None else (np.empty(n_rows), np.zeros(len(chunks), dtype=bool))
+    pending = [i for i in range(len(chunks)) if not done[i]]
+
+    def completed(results):
+        for i, values in zip(pending, results):
+            y[i * chunk_size:i * chunk_size + len(values)] = values
+            done[i] = True
+            if on_progress is not None:
+                on_progress(y, done)
+
+    if max_workers == 1 or len(pending) <= 1:
+        completed(evaluate_model(df, chunks[i], horizon_year) for i in pending)
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            completed(executor.map(_evaluate_chunk, [df] * len(pending), [chunks[i] for i in pending],
+                                   [horizon_year] * len(pending)))
+    return y
+
+
+def sobol_indices(y, n, factors, n_bootstrap=N_BOOTSTRAP, rng=None):
+    """
+    First-order (Saltelli 2010) and total (Jansen) Sobol indices from the outputs of a
+    Saltelli design, with bootstrap 95% confidence half-widths.
+    """
+    rng = rng or np.random.default_rng()
+    # Centring does not change the indices but greatly reduces the estimators' variance
+    y = y - y[:2 * n].mean()
+    y_A, y_B = y[:n], y[n:2 * n]
+    y_AB = y[2 * n:].reshape(len(factors), n)
+
+    def estimate(idx):
+        a, b, ab = y_A[idx], y_B[idx], y_AB[:, idx]
+        variance = np.var(np.concatenate([a, b], axis=-1), axis=-1)
+        first = np.mean(b * (ab - a), axis=-1) / variance
+        total = 0.5 * np.mean(np.square(a - ab), axis=-1) / variance
+        return first, total
+
+    first, total = estimate(np.arange(n))
+    boot_first, boot_total = estimate(rng.integers(0, n, size=(n_bootstrap, n)))
+    return pd.DataFrame({
+        'Factor': factors,
+        'S1': first,
+        'S1 95% CI': 1.96 * boot_first.std(axis=-1),
+        'ST': total,
+        'ST 95% CI': 1.96 * boot_total.std(axis=-1),
+    })
+
+
+def run_sensitivity_analysis(n_base=32768, horizon_year=None, seed=None, max_workers=None, render=True,
+                             checkpoint_path=None, checkpoint_every=1):
+    """
+    Computes Sobol indices of the simulated debt-to-GDP ratio in horizon_year with
+    respect to the Monte Carlo inputs, and saves and plots them.
+    With a checkpoint_path the completed model evaluations are saved every
+    checkpoint_every chunks; a restarted run regenerates the same design from the
+    saved seed entropy and only evaluates the missing chunks.
+    """
+    try:
+        df = pd.read_csv(analysis_file_path)
+        print("Successfully loaded the baseline analysis results.")
+        horizon_year = horizon_year or mc.FORECAST_YEARS[-1]
+
+        # --- 1. Saltelli Sampling ---
+        config = {'job': 'sobol', 'n_base': n_base, 'horizon_year': int(horizon_year), 'seed': seed,
+                  'chunk_size': CHUNK_SIZE, 'data': data_hash(df)}
+        root, saved = resume(checkpoint_path, config, seed)
+        rng = np.random.default_rng(root)
+        ranges = factor_ranges(mc.calibrate_shocks(df))
+        factors = list(ranges) + list(SHOCK_FACTORS)
+        n_years = len(mc.FORECAST_YEARS)
+        A = sample_factors(ranges, n_years, n_base, rng)
+        B = sample_factors(ranges, n_years, n_base, rng)
+        design = saltelli_design(A, B, factors)
+        n_runs = n_base * (len(factors) + 2)
+
+        # --- 2. Batched Model Evaluations ---
+        resume_from = None
+        if saved is not None:
+            resume_from = (saved['y'], saved['done'])
+            print(f"Resuming from {checkpoint_path}: {saved['done'].sum()} of {len(saved['done'])} chunks already done.")
+
+        def checkpoint(y, done):
+            if checkpoint_path and (done.sum() % checkpoint_every == 0 or done.all()):
+                save_checkpoint(checkpoint_path, config, root.entropy, y=y, done=done)
+
+        with stage('sobol_batch', paths=n_runs):
+            y = evaluate_design(df, design, horizon_year, max_workers=max_workers, resume_from=resume_from,
+                                on_progress=checkpoint)
+        print(f"Completed {n_runs:,} model evaluations ({len(factors)} factors, N = {n_base:,}).")
+
+        # --- 3. Indices ---
+        indices_df = sobol_indices(y, n_base, factors, rng=rng)
+        print(f"\nSobol indices of the {horizon_year} Debt-to-GDP ratio:")
+        print(indices_df.round(3).to_string(index=False))
+
+        if render:
+            visualize_sobol_indices(indices_df, horizon_year)
+
+        indices_df.to_csv(sobol_output_path, index=False)
+        print(f"Sobol indices saved to {sobol_output_path}")
+
+        if checkpoint_path and os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+
+    except Exception as e:
+        print(f"An error occurred during sensitivity analysis: {e}")
+        mark_failed(e)
+
+
+@instrument('plot_render[sobol_indices]')
+def visualize_sobol_indices(indices_df, horizon_year=2029):
+    """
+    Generates a grouped bar chart of first-order and total Sobol indices.
+    """
+    plt, sns = load_pyplot()
+
+    plt.figure(figsize=(14, 8))
+    sns.set_theme(style="whitegrid")
+
+    positions = np.arange(len(indices_df))
+    plt.bar(positions - 0.2, indices_df['S1'], width=0.4, yerr=indices_df['S1 95% CI'], label='First-order (S1)', color='b')
+    plt.bar(positions + 0.2, indices_df['ST'], width=0.4, yerr=indices_df['ST 95% CI'], label='Total (ST)', color='orange')
+
+    plt.title(f'Sobol Sensitivity Indices of the {horizon_year} Debt-to-GDP Ratio', fontsize=16)
+    plt.xlabel('Model Input', fontsize=12)
+    plt.ylabel('Share of Output Variance', fontsize=12)
+    plt.xticks(positions, indices_df['Factor'], rotation=30, ha='right')
+    plt.legend()
+    plt.tight_layout()
+
+    plot_path = os.path.join(plots_dir, 'sobol_indices.png')
+    plt.savefig(plot_path)
+    print(f"Sobol indices plot saved to {plot_path}")
+    plt.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Global sensitivity analysis (Sobol indices) of the Monte Carlo model.')
+    parser.add_argument('--base-samples', type=int, default=32768, help='Saltelli base sample size N.')
+    parser.add_argument('--horizon-year', type=int, default=None, help='Year of the debt ratio to analyse (default: last forecast year).')
+    parser.add_argument('--seed', type=int, default=None, help='Random seed for reproducible runs.')
+    parser.add_argument('--workers', type=int, default=None, help='Number of worker processes (1 = no parallelism).')
+    parser.add_argument('--no-plots', action='store_true', help='Compute only; do not import matplotlib.')
+    parser.add_argument('--checkpoint', nargs='?', const=SOBOL_CHECKPOINT_PATH, default=None,
+                        help='Checkpoint the model evaluations here and resume from it.')
+    parser.add_argument('--checkpoint-every', type=int, default=1, help='Chunks between checkpoints.')
+    args = parser.parse_args()
+    run_sensitivity_analysis(n_base=args.base_samples, horizon_year=args.horizon_year, seed=args.seed,
+                             max_workers=args.workers, render=not args.no_plots, checkpoint_path=args.checkpoint,
+                             checkpoint_every=args.checkpoint_every)
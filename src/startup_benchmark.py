@@ -0,0 +1,75 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Compute-only workload: import every analysis module and run its numbers in memory.
+# Nothing is written to disk and no plotting function is called.
+COMPUTE_ONLY_RUN = """
+import sys, json
+import pandas as pd
+import monte_carlo_simulation, stress_tests, debt_decomposition, debt_affordability, revenue_analysis, revenue_composition, visualize_analysis
+
+df = pd.read_csv(monte_carlo_simulation.analysis_file_path)
+shock_params = monte_carlo_simulation.calibrate_shocks(df)
+rng = monte_carlo_simulation.np.random.default_rng(0)
+shocks = monte_carlo_simulation.draw_shocks(shock_params, len(monte_carlo_simulation.FORECAST_YEARS), 10000, rng)
+paths = monte_carlo_simulation.simulate_paths(df, shocks)
+monte_carlo_simulation.summarize_percentiles(paths['Debt-to-GDP Ratio (%)'])
+stress_tests.perform_interest_rate_shock(df.copy())
+stress_tests.perform_gdp_growth_shock(df.copy())
+debt_decomposition.compute_debt_decomposition(df)
+affordability_df = debt_affordability.compute_affordability(df)
+revenue_analysis.build_revenue_composition(affordability_df.set_index('Year')['Nominal GDP'])
+revenue_composition.build_revenue_composition()
+
+print(json.dumps({'plotting_loaded': any(m in sys.modules for m in ('matplotlib', 'seaborn'))}))
+"""
+
+def time_cold_start(src_dir):
+    """
+    Runs the compute-only workload in a fresh interpreter and returns (seconds, plotting_loaded).
+    """
+    env = dict(os.environ, PYTHONPATH=src_dir + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, '-c', COMPUTE_ONLY_RUN], env=env,
+                               capture_output=True, text=True, check=True)
+    elapsed = time.perf_counter() - start
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    return elapsed, result['plotting_loaded']
+
+def run_startup_benchmark(repeats=5, budget=1.0):
+    """
+    Measures cold start of a compute-only run and checks it stays within the time budget.
+    Returns True if the benchmark passed.
+    """
+    src_dir = os.path.dirname(os.path.abspath(__file__))
+    timings = []
+    plotting_loaded = False
+    for _ in range(repeats):
+        elapsed, loaded = time_cold_start(src_dir)
+        timings.append(elapsed)
+        plotting_loaded = plotting_loaded or loaded
+
+    median = statistics.median(timings)
+    print(f"Compute-only cold start over {repeats} runs: "
+          f"min {min(timings):.3f}s, median {median:.3f}s, max {max(timings):.3f}s (budget {budget:.2f}s)")
+
+    if plotting_loaded:
+        print("FAIL: matplotlib/seaborn were imported during a compute-only run.")
+        return False
+    if median > budget:
+        print("FAIL: median cold start exceeds the budget.")
+        return False
+    print("PASS")
+    return True
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark cold start of a compute-only run.')
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--budget', type=float, default=1.0, help='Maximum median cold start in seconds.')
+    args = parser.parse_args()
+    sys.exit(0 if run_startup_benchmark(args.repeats, args.budget) else 1)
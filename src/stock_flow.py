@@ -0,0 +1,124 @@
+import pandas as pd
+import numpy as np
+import argparse
+import re
+
+from instrumentation import instrument
+
+# File paths for the analysis results and the EFO tables of deterministic items
+analysis_file_path = 'data/processed/dsa_analysis_results.csv'
+AGGREGATES_FILE = 'data/raw/Aggregates_Detailed_forecast_tables_March_2025.xlsx'
+
+FORECAST_YEARS = range(2025, 2030)
+# Central stock-flow adjustment: the baseline forecast's own (PSND less last year's
+# PSND and this year's PSNB), or the historical mean
+SFA_CENTRES = ['baseline', 'historical']
+# Deterministic items of the March 2025 EFO: sheet, row label and the sign that makes
+# a rise in debt positive (£bn, fiscal years)
+SFA_ITEMS = {
+    'student_loans': ('6.9', 'Net cash outlays', 1.0),
+    'apf_losses': ('6.6', 'Cash transfers from HM Treasury to BoE', -1.0),
+}
+
+
+def sfa_levels(df):
+    """Stock-flow adjustment of every year, £m: the change in PSND not explained by PSNB."""
+    baseline = df.set_index('Year')
+    return baseline['PSND'] - baseline['PSND'].shift(1) - baseline['PSNB']
+
+
+def sfa_ratios(df):
+    """Stock-flow adjustment as a fraction of GDP, the residual of debt_decomposition."""
+    return sfa_levels(df) / (df.set_index('Year')['Nominal GDP'] * 1000)
+
+
+@instrument('calibrate_sfa')
+def calibrate_sfa(df, last_history_year=2024):
+    """Mean and standard deviation of the historical stock-flow adjustment ratio."""
+    history = sfa_ratios(df).loc[:last_history_year].dropna()
+    return {'sfa_mean': history.mean(), 'sfa_std': history.std()}
+
+
+def load_sfa_items(names, years=FORECAST_YEARS):
+    """
+    The deterministic items `names` of SFA_ITEMS, £m per year, from the EFO aggregates
+    tables. Fiscal year 2025-26 is Year 2025; years the table does not cover are zero.
+    """
+    from robust_data_extraction import read_sheet
+
+    items = {}
+    for name in names:
+        sheet, label, sign = SFA_ITEMS[name]
+        sheet_df = read_sheet(AGGREGATES_FILE, sheet)
+        header = next(row for _, row in sheet_df.iterrows()
+                      if any(re.match(r'^\d{4}-\d{2}$', str(cell)) for cell in row))
+        row = next(row for _, row in sheet_df.iterrows() if str(row.iloc[1]).strip() == label)
+        values = {int(str(cell)[:4]): pd.to_numeric(row.iloc[j], errors='coerce')
+                  for j, cell in enumerate(header) if re.match(r'^\d{4}-\d{2}$', str(cell))}
+        items[name] = pd.Series({year: sign * np.nan_to_num(values.get(year, 0.0)) * 1000 for year in years})
+    return items
+
+
+class StockFlow:
+    """
+    Stock-flow adjustment in the debt recursion: PSND_t = PSND_{t-1} + PSNB_t + SFA_t.
+
+    SFA_t is a ratio to the path's GDP, centred on the baseline forecast's own SFA or
+    the historical mean, plus a normal shock with the historical std dev when shocks
+    are drawn, plus optional deterministic items in £m (see SFA_ITEMS). With the
+    baseline centre and no shocks or items, the recursion reproduces the baseline PSND.
+    """
+
+    def __init__(self, df=None, centre='baseline', items=(), forecast_years=FORECAST_YEARS, last_history_year=2024):
+        if centre not in SFA_CENTRES:
+            raise ValueError(f"Unknown SFA centre '{centre}'; expected one of {', '.join(SFA_CENTRES)}.")
+        df = pd.read_csv(analysis_file_path) if df is None else df
+        self.params = calibrate_sfa(df, last_history_year)
+        self.centre_name = centre
+        self.item_names = list(items)
+        self.years = list(forecast_years)
+        if centre == 'baseline':
+            self.centre = sfa_ratios(df).loc[self.years].values
+        else:
+            self.centre = np.full(len(self.years), self.params['sfa_mean'])
+        self.items = sum(load_sfa_items(self.item_names, self.years).values(), pd.Series(0.0, index=self.years)).values
+
+    @classmethod
+    def stack(cls, flows):
+        """
+        The StockFlows of a panel of datasets as one, with centre and items of shape
+        (n_years, n_datasets, 1) to match the arrays of panel_analysis.stack_panel.
+        Shocks are drawn per dataset, with each one's own volatility (see draw).
+        """
+        stacked = cls.__new__(cls)
+        stacked.params = {key: np.array([flow.params[key] for flow in flows]) for key in flows[0].params}
+        stacked.centre_name = flows[0].centre_name
+        stacked.item_names = flows[0].item_names
+        stacked.years = flows[0].years
+        stacked.centre = np.stack([flow.centre for flow in flows], axis=1)[:, :, None]
+        stacked.items = np.stack([flow.items for flow in flows], axis=1)[:, :, None]
+        return stacked
+
+    def level(self, year, gdp, shock=0.0):
+        """SFA in £m of a year, for GDP (£bn) and SFA ratio shocks of any matching shape."""
+        i = self.years.index(year)
+        return (self.centre[i] + shock) * gdp * 1000 + self.items[i]
+
+    def draw(self, n_years, n_sims, rng, dtype=np.float64):
+        """SFA ratio shocks of shape (n_years, n_sims)."""
+        return (self.params['sfa_std'] * rng.standard_normal(size=(n_years, n_sims))).astype(dtype, copy=False)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Calibrate the stock-flow adjustment of the debt recursion.')
+    parser.add_argument('--items', nargs='*', choices=list(SFA_ITEMS), default=list(SFA_ITEMS),
+                        help='Deterministic items to show.')
+    args = parser.parse_args()
+
+    df = pd.read_csv(analysis_file_path)
+    params = calibrate_sfa(df)
+    print(f"Historical SFA: mean {params['sfa_mean'] * 100:.2f}% of GDP, std {params['sfa_std'] * 100:.2f}% of GDP")
+    table = pd.DataFrame({'Baseline SFA (% of GDP)': sfa_ratios(df).loc[list(FORECAST_YEARS)] * 100})
+    for name, values in load_sfa_items(args.items).items():
+        table[f'{name} (£m)'] = values
+    print(table.round(2).to_string())
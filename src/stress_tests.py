@@ -1,60 +1,88 @@
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
+import numpy as np
+import argparse
 import os
 
+from plotting import load_pyplot
+from instrumentation import instrument, mark_failed
+from stock_flow import SFA_CENTRES, SFA_ITEMS, StockFlow
+from dsa_analysis import baseline_arrays
+
 # File path for the analysis results and directory for plots
 analysis_file_path = 'data/processed/dsa_analysis_results.csv'
+stress_test_output_path = 'data/processed/stress_test_results.xlsx'
 plots_dir = 'plots'
+STRESS_SHEETS = ['Baseline', 'Interest_Rate_Shock', 'GDP_Growth_Shock']
+
+# Change in the primary balance per unit change in nominal GDP (0.5% sensitivity)
+FISCAL_SENSITIVITY = 0.005
 
-def run_stress_tests():
+def run_stress_tests(render=True, stock_flow=None, sfa_items=()):
     """
     Performs and visualizes stress tests on UK debt sustainability.
+    With render=False only the numbers are produced and the plotting stack is never imported.
+    stock_flow ('baseline' or 'historical') keeps a stock-flow adjustment centred there,
+    plus the deterministic sfa_items, in the scenarios' debt recursion (stock_flow.StockFlow).
     """
     try:
         # Load the baseline dataset
         baseline_df = pd.read_csv(analysis_file_path)
         print("Successfully loaded the baseline analysis results.")
+        sfa = None
+        if stock_flow is not None:
+            sfa = StockFlow(df=baseline_df, centre=stock_flow, items=sfa_items)
+            print(f"Stock-flow adjustment: {stock_flow} centre, mean {np.mean(sfa.centre) * 100:.2f}% of GDP")
 
         # --- Scenario 1: Interest Rate Shock ---
-        ir_shock_df = perform_interest_rate_shock(baseline_df.copy())
+        ir_shock_df = perform_interest_rate_shock(baseline_df.copy(), stock_flow=sfa)
         print("Completed Interest Rate Shock scenario.")
 
         # --- Scenario 2: GDP Growth Shock ---
-        gdp_shock_df = perform_gdp_growth_shock(baseline_df.copy())
+        gdp_shock_df = perform_gdp_growth_shock(baseline_df.copy(), stock_flow=sfa)
         print("Completed GDP Growth Shock scenario.")
 
         # --- Visualization ---
-        visualize_scenarios(baseline_df, ir_shock_df, gdp_shock_df)
-        print("Stress test visualizations saved.")
+        if render:
+            visualize_scenarios(baseline_df, ir_shock_df, gdp_shock_df)
+            print("Stress test visualizations saved.")
         
         # --- Save Results ---
-        stress_test_output_path = 'data/processed/stress_test_results.xlsx'
         with pd.ExcelWriter(stress_test_output_path) as writer:
-            baseline_df.to_excel(writer, sheet_name='Baseline', index=False)
-            ir_shock_df.to_excel(writer, sheet_name='Interest_Rate_Shock', index=False)
-            gdp_shock_df.to_excel(writer, sheet_name='GDP_Growth_Shock', index=False)
+            for sheet, scenario_df in zip(STRESS_SHEETS, [baseline_df, ir_shock_df, gdp_shock_df]):
+                scenario_df.to_excel(writer, sheet_name=sheet, index=False)
         print(f"All stress test results saved to {stress_test_output_path}")
 
 
-    except FileNotFoundError:
+    except FileNotFoundError as e:
         print(f"Error: The file {analysis_file_path} was not found.")
+        mark_failed(e)
     except Exception as e:
         print(f"An error occurred during stress testing: {e}")
+        mark_failed(e)
 
-def perform_interest_rate_shock(df):
+def load_stress_results(path=stress_test_output_path):
     """
-    Simulates a +1 percentage point shock to interest rates from 2025.
+    The saved baseline, interest rate shock and GDP growth shock DataFrames, so the
+    report table and figure show the scenarios exactly as run_stress_tests saved them.
+    """
+    sheets = pd.read_excel(path, sheet_name=None)
+    return tuple(sheets[name] for name in STRESS_SHEETS)
+
+@instrument('interest_rate_shock')
+def perform_interest_rate_shock(df, shock=0.01, start_year=2025, stock_flow=None):
+    """
+    Simulates a shock to interest rates (default +1 percentage point from 2025).
+    With a stock_flow.StockFlow as stock_flow, PSND also moves by its stock-flow adjustment.
     """
     # Calculate baseline implied interest rate
     df['Implied Interest Rate'] = df['Debt Interest'] / df['PSND'].shift(1)
     
-    # Apply a +0.01 (1 ppt) shock from 2025 onwards
-    shock_period = df['Year'] >= 2025
-    df.loc[shock_period, 'Implied Interest Rate'] += 0.01
+    # Apply the shock (default 0.01, i.e. 1 ppt) from the start year onwards
+    shock_period = df['Year'] >= start_year
+    df.loc[shock_period, 'Implied Interest Rate'] += shock
 
     # Recalculate debt dynamics for the forecast period
-    for year in range(2025, 2030):
+    for year in range(start_year, df['Year'].max() + 1):
         idx = df[df['Year'] == year].index[0]
         prev_idx = df[df['Year'] == year - 1].index[0]
 
@@ -64,51 +92,149 @@ def perform_interest_rate_shock(df):
         # Recalculate PSNB (Primary Balance + new Debt Interest)
         df.loc[idx, 'PSNB'] = df.loc[idx, 'Primary Balance'] + df.loc[idx, 'Debt Interest']
         
-        # Recalculate PSND (Previous PSND + new PSNB)
+        # Recalculate PSND (Previous PSND + new PSNB, plus any stock-flow adjustment)
         df.loc[idx, 'PSND'] = df.loc[prev_idx, 'PSND'] + df.loc[idx, 'PSNB']
+        if stock_flow is not None:
+            df.loc[idx, 'PSND'] += stock_flow.level(year, df.loc[idx, 'Nominal GDP'])
         
         # Recalculate Debt-to-GDP Ratio
         df.loc[idx, 'Debt-to-GDP Ratio (%)'] = (df.loc[idx, 'PSND'] / (df.loc[idx, 'Nominal GDP'] * 10))
         
     return df
 
-def perform_gdp_growth_shock(df):
+@instrument('gdp_growth_shock')
+def perform_gdp_growth_shock(df, shock=0.01, start_year=2025, fiscal_sensitivity=FISCAL_SENSITIVITY,
+                             stock_flow=None):
     """
-    Simulates a -1 percentage point shock to nominal GDP growth from 2025.
+    Simulates a shock to nominal GDP growth (default -1 percentage point from 2025).
+    Debt interest is charged at the baseline implied interest rate on the scenario's
+    own (higher) debt stock.
+    With a stock_flow.StockFlow as stock_flow, PSND also moves by its stock-flow adjustment.
     """
-    # Calculate baseline nominal GDP growth rate
+    # Calculate baseline nominal GDP growth rate and implied interest rate
     df['Nominal GDP Growth'] = df['Nominal GDP'].pct_change()
+    df['Implied Interest Rate'] = df['Debt Interest'] / df['PSND'].shift(1)
     
-    # Apply a -0.01 (1 ppt) shock to growth from 2025 onwards
-    shock_period = df['Year'] >= 2025
-    df.loc[shock_period, 'Nominal GDP Growth'] -= 0.01
+    # Apply the shock (default 0.01, i.e. 1 ppt lower growth) from the start year onwards
+    shock_period = df['Year'] >= start_year
+    df.loc[shock_period, 'Nominal GDP Growth'] -= shock
 
     # Recalculate GDP and debt dynamics
-    for year in range(2025, 2030):
+    for year in range(start_year, df['Year'].max() + 1):
         idx = df[df['Year'] == year].index[0]
         prev_idx = df[df['Year'] == year - 1].index[0]
 
         # Recalculate Nominal GDP
+        baseline_gdp = df.loc[idx, 'Nominal GDP']
         df.loc[idx, 'Nominal GDP'] = df.loc[prev_idx, 'Nominal GDP'] * (1 + df.loc[idx, 'Nominal GDP Growth'])
         
-        # Recalculate Primary Balance based on fiscal sensitivity (0.5% of GDP)
-        gdp_diff = (df.loc[idx, 'Nominal GDP'] - df[df['Year'] == year]['Nominal GDP'].iloc[0]) * 1_000_000_000
-        primary_balance_shock = gdp_diff * 0.005 # 0.5% sensitivity
+        # Recalculate Primary Balance based on fiscal sensitivity (0.5% of GDP).
+        # 'Primary Balance' is PSNB less interest, so a GDP shortfall raises it.
+        gdp_diff = (baseline_gdp - df.loc[idx, 'Nominal GDP']) * 1_000_000_000
+        primary_balance_shock = gdp_diff * fiscal_sensitivity
         df.loc[idx, 'Primary Balance'] += primary_balance_shock / 1_000_000 # convert back to millions
         
-        # Recalculate PSNB and PSND
+        # Recalculate Debt Interest, PSNB and PSND
+        df.loc[idx, 'Debt Interest'] = df.loc[prev_idx, 'PSND'] * df.loc[idx, 'Implied Interest Rate']
         df.loc[idx, 'PSNB'] = df.loc[idx, 'Primary Balance'] + df.loc[idx, 'Debt Interest']
         df.loc[idx, 'PSND'] = df.loc[prev_idx, 'PSND'] + df.loc[idx, 'PSNB']
+        if stock_flow is not None:
+            df.loc[idx, 'PSND'] += stock_flow.level(year, df.loc[idx, 'Nominal GDP'])
         
         # Recalculate Debt-to-GDP Ratio
         df.loc[idx, 'Debt-to-GDP Ratio (%)'] = (df.loc[idx, 'PSND'] / (df.loc[idx, 'Nominal GDP'] * 10))
         
     return df
 
+@instrument('project_scenarios')
+def project_scenarios(baseline_df, ir_shock=0.0, growth_shock=0.0, pb_shock=0.0, start_year=2025,
+                      fiscal_sensitivity=FISCAL_SENSITIVITY, receipts=None, stock_flow=None):
+    """
+    Projects many deterministic scenarios at once.
+
+    Each shock is a scalar or a 1-D array with one entry per scenario, applied from
+    start_year onwards: ir_shock is added to the implied interest rate, growth_shock
+    to nominal GDP growth (negative = slower growth) and pb_shock to the Primary
+    Balance-to-GDP ratio as a fraction of GDP (positive = more borrowing). Debt
+    interest is always charged on the scenario's own debt stock, and the primary
+    balance responds to the GDP gap through the fiscal sensitivity, as in the
+    single-scenario functions above. If a revenue_engine.ReceiptsProjection is passed
+    as receipts, 'Total Revenue' (£m) is projected from each scenario's GDP as well.
+    With a stock_flow.StockFlow as stock_flow, each scenario's debt also moves by the
+    stock-flow adjustment on its own GDP.
+
+    Returns a dict with 'Year' (n_years,) and arrays of shape (n_scenarios, n_years).
+    baseline_df may also be a panel of datasets (panel_analysis.stack_panel), which
+    projects every scenario for every dataset: arrays then have shape
+    (n_datasets, n_scenarios, n_years).
+    """
+    years = np.arange(start_year, int(np.max(baseline_df['Year'])) + 1)
+    base = baseline_arrays(baseline_df, np.arange(start_year - 1, years[-1] + 1),
+                           ['Nominal GDP', 'PSND', 'Debt Interest', 'Primary Balance'])
+    ir_shock, growth_shock, pb_shock = np.broadcast_arrays(
+        np.atleast_1d(np.asarray(ir_shock, dtype=float)),
+        np.atleast_1d(np.asarray(growth_shock, dtype=float)),
+        np.atleast_1d(np.asarray(pb_shock, dtype=float)))
+    shape = np.broadcast_shapes(base['Nominal GDP'][0].shape, ir_shock.shape)
+
+    base_gdp = base['Nominal GDP']
+    prev_gdp = np.broadcast_to(base_gdp[0], shape).astype(float)
+    prev_psnd = np.broadcast_to(base['PSND'][0], shape).astype(float)
+
+    columns = ['Nominal GDP', 'Debt Interest', 'Primary Balance', 'PSNB', 'PSND', 'Debt-to-GDP Ratio (%)']
+    if receipts is not None:
+        columns.append('Total Revenue')
+    results = {name: np.empty(shape + (len(years),)) for name in columns}
+
+    for i, year in enumerate(years):
+        t = i + 1 # row of `base` (row 0 is the jump-off year)
+        gdp = prev_gdp * (1 + (base_gdp[t] / base_gdp[t - 1] - 1) + growth_shock)
+        interest = prev_psnd * (base['Debt Interest'][t] / base['PSND'][t - 1] + ir_shock)
+
+        # Primary balance reacts to the GDP shortfall (GDP in billions, balances in millions)
+        primary_balance = (base['Primary Balance'][t]
+                           + (base_gdp[t] - gdp) * 1000 * fiscal_sensitivity
+                           + pb_shock * gdp * 1000)
+
+        psnb = primary_balance + interest
+        psnd = prev_psnd + psnb
+        if stock_flow is not None:
+            psnd = psnd + stock_flow.level(year, gdp)
+
+        results['Nominal GDP'][..., i] = gdp
+        results['Debt Interest'][..., i] = interest
+        results['Primary Balance'][..., i] = primary_balance
+        results['PSNB'][..., i] = psnb
+        results['PSND'][..., i] = psnd
+        results['Debt-to-GDP Ratio (%)'][..., i] = psnd / (gdp * 10)
+        if receipts is not None:
+            results['Total Revenue'][..., i] = receipts.total(year, gdp, base_gdp[t])
+
+        prev_gdp, prev_psnd = gdp, psnd
+
+    results['Year'] = years
+    return results
+
+def scenario_frame(baseline_df, **shocks):
+    """
+    Returns a copy of the baseline DataFrame with one scenario from project_scenarios applied.
+    """
+    start_year = shocks.get('start_year', 2025)
+    results = project_scenarios(baseline_df, **shocks)
+    df = baseline_df.copy()
+    period = df['Year'] >= start_year
+    for col in ['Nominal GDP', 'Debt Interest', 'Primary Balance', 'PSNB', 'PSND', 'Debt-to-GDP Ratio (%)']:
+        df.loc[period, col] = results[col][0]
+    df['Primary Balance-to-GDP Ratio (%)'] = df['Primary Balance'] / (df['Nominal GDP'] * 10)
+    return df
+
+@instrument('plot_render[stress_scenarios]')
 def visualize_scenarios(baseline_df, ir_shock_df, gdp_shock_df):
     """
     Generates a plot comparing the Debt-to-GDP ratio across scenarios.
     """
+    plt, sns = load_pyplot()
+
     plt.figure(figsize=(12, 8))
     sns.set_theme(style="whitegrid")
 
@@ -128,4 +254,14 @@ def visualize_scenarios(baseline_df, ir_shock_df, gdp_shock_df):
     plt.close()
 
 if __name__ == '__main__':
-    run_stress_tests()
+    parser = argparse.ArgumentParser(description='Run the debt stress test scenarios.')
+    parser.add_argument('--no-plots', action='store_true', help='Compute only; do not import matplotlib.')
+    parser.add_argument('--stock-flow', choices=SFA_CENTRES, default=None,
+                        help='Keep a stock-flow adjustment in the debt recursion, centred on the baseline '
+                             "forecast's or the historical mean (see stock_flow.py).")
+    parser.add_argument('--sfa-items', nargs='*', choices=list(SFA_ITEMS), default=(),
+                        help='Deterministic stock-flow items to add (requires --stock-flow).')
+    args = parser.parse_args()
+    if args.sfa_items and args.stock_flow is None:
+        parser.error('--sfa-items requires --stock-flow')
+    run_stress_tests(render=not args.no_plots, stock_flow=args.stock_flow, sfa_items=args.sfa_items)
@@ -0,0 +1,123 @@
+import pandas as pd
+import numpy as np
+import argparse
+
+from instrumentation import instrument
+
+# Gaussian short-rate models: mean-reversion speeds, volatilities and, for two factors,
+# the correlation of their innovations. Volatilities are rescaled to the history of
+# gilt rates by calibrate_rate_model.
+RATE_MODELS = {
+    'vasicek': {'kappa': [0.15], 'sigma': [0.01], 'rho': 0.0},
+    'two_factor': {'kappa': [0.05, 0.6], 'sigma': [0.008, 0.012], 'rho': -0.5}, # level and slope factors
+}
+ISSUANCE_MATURITY = 12.0  # years, weighted average maturity of gilt issuance
+REFINANCING_SHARE = 0.07  # share of the stock redeemed each year, about 1 / average maturity
+BASELINE_VINTAGE = 'March 2025'
+
+
+def yield_loadings(kappa, maturity=ISSUANCE_MATURITY):
+    """
+    Sensitivity of the zero-coupon yield at `maturity` to each short-rate factor,
+    B(tau) / tau with B(tau) = (1 - exp(-kappa * tau)) / kappa.
+    """
+    kappa = np.asarray(kappa, dtype=float)
+    return (1 - np.exp(-kappa * maturity)) / (kappa * maturity)
+
+
+def step_std(kappa, sigma):
+    """Std dev of the exact one-year Ornstein-Uhlenbeck transition of each factor."""
+    kappa = np.asarray(kappa, dtype=float)
+    return np.asarray(sigma, dtype=float) * np.sqrt((1 - np.exp(-2 * kappa)) / (2 * kappa))
+
+
+def transition_weights(kappa, n_years):
+    """
+    Lower-triangular weights W[t, j] = exp(-kappa * (t - j)) for j <= t, so that a
+    factor started at zero is W @ innovations for every path at once.
+    """
+    lags = np.arange(n_years)[:, None] - np.arange(n_years)[None, :]
+    return np.where(lags >= 0, np.exp(-kappa * np.maximum(lags, 0)), 0.0)
+
+
+def calibrate_rate_model(model, gilt_rates, maturity=ISSUANCE_MATURITY):
+    """
+    Scales the factor volatilities of `model` so that the one-year change in the
+    issuance yield has the std dev of the annual changes in gilt_rates (in %).
+    """
+    params = dict(RATE_MODELS[model])
+    loadings = yield_loadings(params['kappa'], maturity) * step_std(params['kappa'], params['sigma'])
+    if len(loadings) == 1:
+        model_std = loadings[0]
+    else:
+        model_std = np.sqrt(np.sum(np.square(loadings)) + 2 * params['rho'] * loadings[0] * loadings[1])
+    target_std = np.std(np.diff(np.asarray(gilt_rates, dtype=float)), ddof=1) / 100
+    params['sigma'] = list(np.asarray(params['sigma']) * target_std / model_std)
+    return params
+
+
+class TermStructure:
+    """
+    Issuance gilt yields driven by a one- or two-factor Gaussian short-rate model.
+
+    Factors start at zero in the jump-off year, so yields deviate from the baseline
+    conditioning path (the OBR gilt rate assumption) only through simulated shocks.
+    Each year only the share of the debt stock refinanced or newly issued reprices
+    at the simulated gilt yield, which gives the effective interest rate on the
+    stock its slow, mean-reverting response.
+    """
+
+    def __init__(self, model='vasicek', params=None, baseline_yields=None, maturity=ISSUANCE_MATURITY,
+                 refinancing_share=REFINANCING_SHARE, vintage=BASELINE_VINTAGE):
+        if params is None or baseline_yields is None:
+            from historical_forecasts import OUTTURN, load_forecasts, vintage_table
+            forecasts_df = load_forecasts()
+            rates = ['Gilt Rate (%)']
+            if params is None:
+                params = calibrate_rate_model(model, vintage_table(forecasts_df, OUTTURN, rates)['Gilt Rate (%)'].dropna(), maturity)
+            if baseline_yields is None:
+                baseline_yields = vintage_table(forecasts_df, vintage, rates)['Gilt Rate (%)'].dropna() / 100
+
+        self.model = model
+        self.params = params
+        self.kappa = np.asarray(params['kappa'], dtype=float)
+        self.loadings = yield_loadings(self.kappa, maturity) * step_std(self.kappa, params['sigma'])
+        self.baseline_yields = pd.Series(baseline_yields)
+        self.refinancing_share = refinancing_share
+
+    @instrument('term_structure_paths')
+    def yield_deviations(self, innovations, rng):
+        """
+        Deviations of the issuance yield from baseline (fractions) for every
+        (year, path), shape of `innovations`. `innovations` are the standard normal
+        innovations of the first factor; a second factor draws its own from rng,
+        correlated through rho. Uses the exact discretisation of each factor.
+        """
+        n_years = innovations.shape[0]
+        z = innovations
+        deviations = self.loadings[0] * (transition_weights(self.kappa[0], n_years) @ z)
+        if len(self.kappa) > 1:
+            rho = self.params['rho']
+            z = rho * z + np.sqrt(1 - rho ** 2) * rng.standard_normal(size=innovations.shape)
+            deviations += self.loadings[1] * (transition_weights(self.kappa[1], n_years) @ z)
+        return deviations
+
+    def baseline_yield(self, year):
+        """Baseline issuance yield in `year`, as a fraction."""
+        return self.baseline_yields.loc[year]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Show the calibrated short-rate model and its yield fan.')
+    parser.add_argument('--model', choices=sorted(RATE_MODELS), default='vasicek', help='Short-rate model.')
+    parser.add_argument('--sims', type=int, default=10000, help='Number of simulated paths.')
+    parser.add_argument('--seed', type=int, default=None, help='Random seed for reproducible runs.')
+    args = parser.parse_args()
+
+    rates = TermStructure(args.model)
+    print(f"{args.model}: kappa = {rates.params['kappa']}, sigma = {[round(float(s), 5) for s in rates.params['sigma']]}")
+    years = [year for year in rates.baseline_yields.index if year >= 2025]
+    rng = np.random.default_rng(args.seed)
+    deviations = rates.yield_deviations(rng.standard_normal(size=(len(years), args.sims)), rng)
+    yields = (rates.baseline_yields.loc[years].values[:, None] + deviations) * 100
+    print(pd.DataFrame(np.percentile(yields, [5, 50, 95], axis=1).T, index=years, columns=['P5', 'P50', 'P95']).round(2))
@@ -0,0 +1,174 @@
+import pandas as pd
+import numpy as np
+import argparse
+import hashlib
+import io
+import json
+import os
+from datetime import datetime, timezone
+
+from atomic_io import atomic_write_bytes, atomic_write_json
+
+# --- Configuration ---
+STORE_PATH = 'data/processed/vintage_store'
+MANIFEST_PATH = os.path.join(STORE_PATH, 'manifest.json')
+CSV_FILE_PATH = 'data/processed/obr_data.csv'
+
+# Vintage of the data currently in obr_data.csv
+DEFAULT_VINTAGE = 'efo_march_2025'
+
+# Series in the order they appear in obr_data.csv
+SERIES = ['Nominal GDP', 'PSND', 'PSNB', 'Debt Interest']
+
+
+def _partition_file(vintage):
+    return f"vintage={vintage}.npz"
+
+
+def load_manifest(store_path=STORE_PATH):
+    """Loads the store manifest listing every partition in append order."""
+    manifest_path = os.path.join(store_path, 'manifest.json')
+    if not os.path.exists(manifest_path):
+        return {'partitions': []}
+    with open(manifest_path) as handle:
+        return json.load(handle)
+
+
+def list_vintages(store_path=STORE_PATH):
+    """Returns the vintages in the store, oldest first."""
+    return [p['vintage'] for p in load_manifest(store_path)['partitions']]
+
+
+def to_long(df):
+    """
+    Converts a wide frame (Year + one column per series) into the store's
+    columnar layout: parallel arrays of series, year and value.
+    """
+    wide = df.set_index('Year') if 'Year' in df.columns else df
+    wide = wide[[col for col in wide.columns if col in SERIES]]
+    long_df = wide.stack().reset_index()
+    long_df.columns = ['year', 'series', 'value']
+    return {
+        'series': long_df['series'].to_numpy(dtype=str),
+        'year': long_df['year'].to_numpy(dtype=np.int32),
+        'value': long_df['value'].to_numpy(dtype=np.float64),
+    }
+
+
+def append_vintage(vintage, df, source=None, store_path=STORE_PATH):
+    """
+    Adds a forecast vintage to the store as a new partition.
+
+    The store is append-only: existing partitions are never rewritten, and adding
+    a vintage that already exists raises a ValueError.
+    """
+    manifest = load_manifest(store_path)
+    if vintage in [p['vintage'] for p in manifest['partitions']]:
+        raise ValueError(f"Vintage '{vintage}' already exists in the store.")
+
+    columns = to_long(df)
+    buffer = io.BytesIO()
+    np.savez(buffer, **columns)
+    payload = buffer.getvalue()
+
+    file_name = _partition_file(vintage)
+    atomic_write_bytes(payload, os.path.join(store_path, file_name))
+
+    manifest['partitions'].append({
+        'vintage': vintage,
+        'file': file_name,
+        'rows': int(len(columns['value'])),
+        'sha256': hashlib.sha256(payload).hexdigest(),
+        'source': source,
+        'created_at': datetime.now(timezone.utc).isoformat(),
+    })
+    atomic_write_json(manifest, os.path.join(store_path, 'manifest.json'))
+    print(f"Added vintage '{vintage}' ({len(columns['value'])} rows) to {store_path}.")
+
+
+def load_long(vintages=None, series=None, store_path=STORE_PATH):
+    """
+    Loads partitions as one long frame with columns vintage, series, year, value.
+    Only the requested vintages' partitions are read.
+    """
+    partitions = load_manifest(store_path)['partitions']
+    if vintages is not None:
+        missing = set(vintages) - {p['vintage'] for p in partitions}
+        if missing:
+            raise KeyError(f"Unknown vintage(s): {sorted(missing)}")
+        partitions = [p for p in partitions if p['vintage'] in vintages]
+
+    frames = []
+    for partition in partitions:
+        with np.load(os.path.join(store_path, partition['file'])) as columns:
+            frame = pd.DataFrame({name: columns[name] for name in ('series', 'year', 'value')})
+        frame.insert(0, 'vintage', partition['vintage'])
+        frames.append(frame)
+
+    if not frames:
+        return pd.DataFrame(columns=['vintage', 'series', 'year', 'value'])
+    long_df = pd.concat(frames, ignore_index=True)
+    if series is not None:
+        long_df = long_df[long_df['series'].isin(series)]
+    return long_df
+
+
+def load_vintage(vintage=DEFAULT_VINTAGE, store_path=STORE_PATH):
+    """
+    Returns a vintage in the same wide layout as obr_data.csv, so any stage of the
+    DSA can run against it.
+    """
+    long_df = load_long([vintage], store_path=store_path)
+    wide = long_df.pivot(index='year', columns='series', values='value')
+    wide = wide.reindex(columns=[col for col in SERIES if col in wide.columns])
+    wide.index.name = 'Year'
+    wide.columns.name = None
+    return wide.reset_index()
+
+
+def diff_vintages(base, other, series=None, store_path=STORE_PATH):
+    """
+    Compares two vintages for every (series, year) in a single vectorized operation.
+    Returns a frame indexed by (series, year) with both values, the difference
+    and the percentage revision.
+    """
+    long_df = load_long([base, other], series=series, store_path=store_path)
+    table = long_df.pivot_table(index=['series', 'year'], columns='vintage', values='value')
+    table = table.reindex(columns=[base, other])
+    table.columns.name = None
+    table['Difference'] = table[other] - table[base]
+    table['Revision (%)'] = table['Difference'] / table[base].abs() * 100
+    return table
+
+
+def ingest_csv(vintage, csv_path=CSV_FILE_PATH, store_path=STORE_PATH):
+    """Adds a vintage from a CSV with the obr_data.csv schema."""
+    df = pd.read_csv(csv_path)
+    append_vintage(vintage, df, source=csv_path, store_path=store_path)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Manage the multi-vintage forecast store.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    ingest_parser = subparsers.add_parser('ingest', help='Add a vintage from a CSV with the obr_data.csv schema.')
+    ingest_parser.add_argument('vintage')
+    ingest_parser.add_argument('--csv', default=CSV_FILE_PATH)
+
+    subparsers.add_parser('list', help='List stored vintages.')
+
+    diff_parser = subparsers.add_parser('diff', help='Compare two vintages.')
+    diff_parser.add_argument('base')
+    diff_parser.add_argument('other')
+
+    args = parser.parse_args()
+    if args.command == 'ingest':
+        try:
+            ingest_csv(args.vintage, args.csv)
+        except (FileNotFoundError, ValueError) as e:
+            print(f"Error: {e}")
+    elif args.command == 'list':
+        for name in list_vintages():
+            print(name)
+    elif args.command == 'diff':
+        print(diff_vintages(args.base, args.other).to_string())